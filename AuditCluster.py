@@ -0,0 +1,478 @@
+import ipaddress
+import os
+import queue
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client as Connect, Listener
+
+from Client import AuditResult, Client
+
+DEFAULT_PORT = 8766
+# 연결 인증 키 환경 변수 (multiprocessing.connection은 메시지를 unpickle하므로 키가 곧 코드 실행 권한)
+AUTHKEY_ENV = "AUDIT_CLUSTER_AUTHKEY"
+HEARTBEAT_INTERVAL = 5
+
+
+def get_authkey():
+    """환경 변수의 인증 키 (없으면 None)"""
+    authkey = os.environ.get(AUTHKEY_ENV)
+    return authkey.encode("utf-8") if authkey else None
+
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def result_from_dict(result):
+    if result.get("shared_with") is not None:
+        result = dict(result, shared_with=tuple(result["shared_with"]))
+    return AuditResult(**result)
+
+
+class _WorkerHandle:
+    def __init__(self, worker_id, connection, slots):
+        self.worker_id = worker_id
+        self.connection = connection
+        self.slots = slots
+        self.in_flight = set()
+        self.last_seen = time.monotonic()
+        self.setup_id = None
+        self.alive = True
+
+
+class Coordinator:
+    """(contract, function) 단위를 TCP로 연결된 워커 프로세스들에 나눠 보내고 결과를 targets 순서로 병합
+
+    워커는 소스 코드를 받아 각자 파싱/추적/검색/LLM 호출을 수행한다.
+    워커 연결이 끊기거나 heartbeat_timeout 동안 응답이 없으면 그 워커가 처리 중이던 단위를
+    다른 워커에 다시 보낸다 (단위별 최대 max_attempts회).
+    연결된 워커가 no_worker_timeout초 동안 하나도 없으면 남은 단위를 "error"로 끝낸다.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, authkey=None, heartbeat_timeout=30, max_attempts=3,
+                 no_worker_timeout=60):
+        authkey = authkey or get_authkey()
+        if authkey is None:
+            if not is_loopback(host):
+                # 다른 머신에서 접속 가능한 포트는 추측할 수 없는 키 없이 열지 않음
+                raise ValueError(f"listening on {host} requires an explicit auth key (set {AUTHKEY_ENV})")
+            authkey = secrets.token_hex(16).encode("utf-8")
+        self.authkey = authkey
+        self.listener = Listener((host, port), authkey=authkey)
+        self.address = self.listener.address
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.no_worker_timeout = no_worker_timeout
+        self.workers = {}
+        self._events = queue.Queue()
+        self._closed = False
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def close(self):
+        self._closed = True
+        for worker in list(self.workers.values()):
+            self._send(worker, ("shutdown",))
+            worker.connection.close()
+        self.listener.close()
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError):
+                if self._closed:
+                    return
+                continue
+            threading.Thread(target=self._reader_loop, args=(connection,), daemon=True).start()
+
+    def _reader_loop(self, connection):
+        worker = None
+        try:
+            message = connection.recv()
+            if message[0] != "hello":
+                connection.close()
+                return
+            _, worker_id, slots = message
+            worker = _WorkerHandle(worker_id, connection, slots)
+            self._events.put(("connected", worker))
+            while True:
+                self._events.put((connection.recv(), worker))
+        except (EOFError, OSError, TypeError):
+            # TypeError: 코디네이터가 응답 없는 워커의 연결을 닫아 recv 도중 핸들이 사라진 경우
+            if worker is not None:
+                self._events.put(("lost", worker))
+
+    def _send(self, worker, message):
+        try:
+            worker.connection.send(message)
+            return True
+        except (OSError, EOFError, ValueError):
+            return False
+
+    def run(self, client, targets, depth=3, check_impact=False, slice_context=False, timeout=None,
+            dedup=True, journal=None, job_id=None, on_result=None, progress_callback=None):
+        """client(소스가 로드된 Client)로 targets를 정리해 워커들에 분배하고 AuditResult 리스트를 반환"""
+        targets = list(targets)
+        if journal is not None:
+            job_id = journal.start_job(job_id, {
+                "targets": targets, "depth": depth, "check_impact": check_impact, "slice_context": slice_context,
+            })
+        if dedup:
+            groups, hashes = client._group_by_fingerprint(targets, depth, check_impact, slice_context)
+        else:
+            groups, hashes = [[index] for index in range(len(targets))], [(None, None)] * len(targets)
+        client.dedup_stats["units"] += len(targets)
+        client.dedup_stats["unique"] += len(groups)
+        members = {group[0]: group for group in groups}
+
+        auditor = client.auditor
+        setup_id = uuid.uuid4().hex
+        setup = ("setup", setup_id, {
+            "sources": self._read_sources(client.manager.contract_paths),
+            "depth": depth, "check_impact": check_impact, "slice_context": slice_context, "timeout": timeout,
+            "auditor": {
+                "model": auditor.model, "max_tokens": auditor.max_tokens, "temperature": auditor.temperature,
+                "top_p": auditor.top_p, "num_samples": auditor.num_samples,
+            },
+        })
+
+        results = [None] * len(targets)
+        pending = deque(group[0] for group in groups)
+        attempts = {}
+        completed = 0
+        idle_since = time.monotonic()
+
+        def finish(index, result):
+            nonlocal completed
+            for member in members[index]:
+                contract_name, function_name = targets[member]
+                fingerprint, trace_hash = hashes[member]
+                if member == index:
+                    results[member] = result._replace(fingerprint=fingerprint or result.fingerprint)
+                else:
+                    results[member] = result._replace(
+                        contract_name=contract_name, function_name=function_name, trace_hash=trace_hash,
+                        fingerprint=fingerprint, shared_with=targets[index],
+                    )
+                if journal is not None:
+                    journal.record(job_id, results[member])
+                completed += 1
+                if on_result:
+                    on_result(results[member])
+                if progress_callback:
+                    progress_callback(completed, len(targets), f"{contract_name}::{function_name} {result.status} ({completed}/{len(targets)})")
+
+        def drop(worker):
+            # 끊긴 워커의 미완료 단위를 큐 앞쪽으로 되돌림
+            worker.alive = False
+            self.workers.pop(worker.worker_id, None)
+            for index in sorted(worker.in_flight, reverse=True):
+                if attempts[index] >= self.max_attempts:
+                    contract_name, function_name = targets[index]
+                    finish(index, AuditResult(contract_name, function_name, "error", None, None, None,
+                                              f"worker lost {attempts[index]} times", 0.0))
+                else:
+                    pending.appendleft(index)
+            worker.in_flight.clear()
+
+        while completed < len(targets):
+            # 여유 슬롯이 있는 워커에 단위 분배
+            for worker in list(self.workers.values()):
+                if worker.setup_id != setup_id:
+                    if not self._send(worker, setup):
+                        drop(worker)
+                        continue
+                    worker.setup_id = setup_id
+                while pending and len(worker.in_flight) < worker.slots:
+                    index = pending.popleft()
+                    attempts[index] = attempts.get(index, 0) + 1
+                    worker.in_flight.add(index)
+                    if not self._send(worker, ("unit", setup_id, index) + targets[index]):
+                        drop(worker)
+                        break
+
+            try:
+                message, worker = self._events.get(timeout=1)
+            except queue.Empty:
+                message = None
+
+            if message == "connected":
+                self.workers[worker.worker_id] = worker
+            elif message == "lost":
+                if worker.alive:
+                    drop(worker)
+            elif message is not None:
+                worker.last_seen = time.monotonic()
+                if message[0] == "result" and message[1] == setup_id and message[2] in worker.in_flight:
+                    worker.in_flight.discard(message[2])
+                    finish(message[2], result_from_dict(message[3]))
+
+            now = time.monotonic()
+            for worker in list(self.workers.values()):
+                if now - worker.last_seen > self.heartbeat_timeout:
+                    worker.connection.close()
+                    drop(worker)
+
+            if self.workers:
+                idle_since = now
+            elif now - idle_since > self.no_worker_timeout:
+                # 워커가 모두 죽었거나 접속하지 않음: 기다리지 않고 남은 단위를 실패로 끝냄
+                while pending:
+                    index = pending.popleft()
+                    contract_name, function_name = targets[index]
+                    finish(index, AuditResult(contract_name, function_name, "error", None, None, None,
+                                              f"no workers connected for {self.no_worker_timeout}s", 0.0))
+
+        return results
+
+    @staticmethod
+    def _read_sources(paths):
+        sources = {}
+        for i, path in enumerate(dict.fromkeys(paths)):
+            with open(path, "r") as f:
+                # 디렉터리가 달라 파일명이 겹쳐도 구분되도록 순번을 붙임
+                sources[f"{i}_{os.path.basename(path)}"] = f.read()
+        return sources
+
+
+class Worker:
+    """코디네이터에 접속해 받은 단위를 slots개까지 동시에 분석하고 결과를 돌려보내는 워커"""
+
+    def __init__(self, address, authkey=None, slots=4, endpoints=None):
+        authkey = authkey or get_authkey()
+        if authkey is None:
+            raise ValueError(f"worker requires the coordinator's auth key (set {AUTHKEY_ENV})")
+        self.address = address
+        self.authkey = authkey
+        self.slots = slots
+        self.endpoints = endpoints
+        self.worker_id = f"{os.uname().nodename}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.client = None
+        self.setup_id = None
+        self.params = None
+        # 현재 작업의 setup이 실패한 이유 (있으면 그 작업의 단위마다 "error" 결과로 응답)
+        self.setup_error = None
+        self._send_lock = threading.Lock()
+        self._auditor = None
+        # 현재 작업의 소스와 파싱 JSON을 담는 임시 디렉터리 (다음 setup이나 종료 시 삭제)
+        self._workdir = None
+
+    def _send(self, connection, message):
+        with self._send_lock:
+            connection.send(message)
+
+    def _heartbeat_loop(self, connection, stop):
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                self._send(connection, ("heartbeat",))
+            except (OSError, EOFError, ValueError):
+                return
+
+    def _setup(self, setup_id, params):
+        # 이전 작업의 Client와 임시 디렉터리는 버리고 auditor(벡터 DB 포함)만 재사용
+        self._cleanup()
+        self._workdir = tempfile.TemporaryDirectory(prefix="audit_worker_")
+        workdir = self._workdir.name
+        paths = []
+        for filename, source in params["sources"].items():
+            path = os.path.join(workdir, filename)
+            with open(path, "w") as f:
+                f.write(source)
+            paths.append(path)
+
+        client = Client(auditor=self._auditor, info_dir=workdir)
+        self._auditor = client.auditor
+        for key, value in params["auditor"].items():
+            setattr(client.auditor, key, value)
+        if self.endpoints:
+            client.set_endpoints(self.endpoints)
+        client.load_contracts(paths)
+
+        self.client, self.setup_id, self.params = client, setup_id, params
+
+    def _cleanup(self):
+        if self._workdir is not None:
+            self._workdir.cleanup()
+            self._workdir = None
+
+    def _fail_setup(self, setup_id, error):
+        self._cleanup()
+        self.client, self.setup_id, self.params = None, setup_id, None
+        self.setup_error = f"worker setup failed: {error!r}"
+
+    def _reply_error(self, connection, setup_id, index, contract_name, function_name):
+        result = AuditResult(contract_name, function_name, "error", None, None, None, self.setup_error, 0.0)
+        self._send(connection, ("result", setup_id, index, result._asdict()))
+
+    def _run_unit(self, connection, setup_id, index, contract_name, function_name):
+        client, params = self.client, self.params
+        result = client._run_audit(
+            contract_name, function_name, params["depth"], params["check_impact"], params["slice_context"], params["timeout"],
+        )
+        try:
+            self._send(connection, ("result", setup_id, index, result._asdict()))
+        except (OSError, EOFError, ValueError):
+            pass
+
+    def serve(self):
+        connection = Connect(self.address, authkey=self.authkey)
+        self._send(connection, ("hello", self.worker_id, self.slots))
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat_loop, args=(connection, stop), daemon=True).start()
+        executor = ThreadPoolExecutor(max_workers=self.slots)
+        try:
+            while True:
+                message = connection.recv()
+                if message[0] == "shutdown":
+                    return
+                if message[0] == "setup":
+                    try:
+                        self.setup_error = None
+                        self._setup(message[1], message[2])
+                    except Exception as e:
+                        # 파싱 실패, 잘못된 엔드포인트 등: 워커는 살려 두고 이 작업의 단위를 실패로 돌려보냄
+                        print(f"setup {message[1]} failed: {e!r}", file=sys.stderr)
+                        self._fail_setup(message[1], e)
+                elif message[0] == "unit" and message[1] == self.setup_id:
+                    if self.setup_error:
+                        self._reply_error(connection, *message[1:])
+                    else:
+                        executor.submit(self._run_unit, connection, *message[1:])
+        except (EOFError, OSError):
+            return
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            connection.close()
+            self._cleanup()
+
+
+def spawn_local_workers(address, authkey, count, slots=4, endpoints=None):
+    """같은 머신에 워커 프로세스를 count개 띄움 (테스트/단일 서버용, 인증 키는 명령행 대신 환경 변수로 전달)"""
+    command = [sys.executable, os.path.abspath(__file__), "worker", "--connect", f"{address[0]}:{address[1]}",
+               "--slots", str(slots)]
+    for endpoint in endpoints or []:
+        command += ["--endpoint", endpoint]
+    # 워커의 진단 출력(print)이 코디네이터 stdout의 JSONL에 섞이지 않도록 stderr로 보냄
+    env = dict(os.environ, **{AUTHKEY_ENV: authkey.decode("utf-8")})
+    return [subprocess.Popen(command, stdout=sys.stderr, env=env) for _ in range(count)]
+
+
+def main(argv=None):
+    import argparse
+    import contextlib
+    import json
+
+    from AuditJournal import AuditJournal
+    from Client import expand_contract_paths, EXIT_FINDINGS, EXIT_INCOMPLETE, EXIT_OK, EXIT_USAGE
+    from SelectionPolicy import POLICIES
+
+    parser = argparse.ArgumentParser(prog="AuditCluster.py", description="Distributed audit coordinator/worker")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    coordinator = subparsers.add_parser("coordinator", help="shard units to workers and print merged results as JSONL")
+    coordinator.add_argument("paths", nargs="+")
+    coordinator.add_argument("--host", default="127.0.0.1")
+    coordinator.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coordinator.add_argument("--depth", type=int, default=3)
+    coordinator.add_argument("--impact", action="store_true")
+    coordinator.add_argument("--slice", action="store_true")
+    coordinator.add_argument("--filter", choices=list(POLICIES), default="all")
+    coordinator.add_argument("--timeout", type=float, default=None)
+    coordinator.add_argument("--samples", type=int, default=5)
+    coordinator.add_argument("--no-dedup", action="store_true")
+    coordinator.add_argument("--journal")
+    coordinator.add_argument("--spawn", type=int, default=0, help="start this many local workers")
+    coordinator.add_argument("--slots", type=int, default=4, help="slots per spawned worker")
+    coordinator.add_argument("--endpoint", action="append", default=[], help="LLM endpoint for spawned workers")
+    coordinator.add_argument("--worker-wait", type=float, default=60,
+                             help="fail the remaining units after this many seconds without any connected worker")
+    coordinator.add_argument("-o", "--output")
+
+    worker = subparsers.add_parser("worker", help="connect to a coordinator and audit the units it sends")
+    worker.add_argument("--connect", default=f"127.0.0.1:{DEFAULT_PORT}", help="coordinator host:port")
+    worker.add_argument("--slots", type=int, default=4, help="units audited at once")
+    worker.add_argument("--endpoint", action="append", default=[], help="LLM API host or completions URL (repeatable)")
+
+    args = parser.parse_args(argv)
+
+    if args.mode == "worker":
+        host, port = args.connect.rsplit(":", 1)
+        try:
+            worker = Worker((host, int(port)), slots=args.slots, endpoints=args.endpoint)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return EXIT_USAGE
+        worker.serve()
+        return EXIT_OK
+
+    paths = expand_contract_paths(args.paths)
+    if not paths:
+        print("no .sol files matched", file=sys.stderr)
+        return EXIT_USAGE
+    if get_authkey() is None and not is_loopback(args.host):
+        print(f"--host {args.host} is reachable from other machines; set {AUTHKEY_ENV} to a secret key "
+              f"on the coordinator and every worker", file=sys.stderr)
+        return EXIT_USAGE
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    processes = []
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            client = Client()
+            client.auditor.set_num_samples(args.samples)
+            client.load_contracts(paths)
+            cluster = Coordinator(args.host, args.port, no_worker_timeout=args.worker_wait)
+            print(f"coordinator listening on {cluster.address[0]}:{cluster.address[1]}", file=sys.stderr)
+            if get_authkey() is None:
+                # 루프백 전용 임시 키: 같은 머신에서 직접 띄우는 워커에 필요
+                print(f"generated auth key for local workers: {AUTHKEY_ENV}={cluster.authkey.decode('utf-8')}",
+                      file=sys.stderr)
+            processes = spawn_local_workers(cluster.address, cluster.authkey, args.spawn, args.slots, args.endpoint)
+
+            def write_result(result):
+                output.write(json.dumps(result._asdict(), ensure_ascii=False, default=str) + "\n")
+                output.flush()
+
+            journal = AuditJournal(args.journal) if args.journal else None
+            try:
+                results = cluster.run(
+                    client, client.get_audit_targets(policy=args.filter), args.depth, args.impact, args.slice,
+                    timeout=args.timeout, dedup=not args.no_dedup, journal=journal, on_result=write_result,
+                )
+            finally:
+                cluster.close()
+                if journal is not None:
+                    journal.close()
+    finally:
+        for process in processes:
+            # 종료하지 않는 워커 때문에 실제 결과나 예외가 가려지지 않도록 기다린 뒤 강제 종료
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        if output is not sys.stdout:
+            output.close()
+
+    statuses = {result.status for result in results}
+    if "vulnerable" in statuses:
+        return EXIT_FINDINGS
+    if statuses - {"secure"}:
+        return EXIT_INCOMPLETE
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+# 재개 시 건너뛰는 완료 상태 (timeout/error/cancelled는 다시 분석)
+COMPLETED_STATUSES = ("secure", "vulnerable")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    created_at  REAL NOT NULL,
+    params      TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    job_id        TEXT NOT NULL,
+    contract_name TEXT NOT NULL,
+    function_name TEXT NOT NULL,
+    trace_hash    TEXT,
+    status        TEXT NOT NULL,
+    decision      TEXT,
+    votes         TEXT,
+    keywords      TEXT,
+    review        TEXT,
+    error         TEXT,
+    elapsed       REAL,
+    completed_at  REAL NOT NULL,
+    PRIMARY KEY (job_id, contract_name, function_name)
+);
+"""
+
+
+class AuditJournal:
+    """(contract, function) 단위 분석 결과를 SQLite에 기록하는 재개 가능한 작업 저널
+
+    WAL 모드에서 단위마다 한 트랜잭션으로 커밋하므로 프로세스가 도중에 종료되어도
+    이미 기록된 결과는 유지되고 저널이 손상되지 않는다.
+    """
+
+    def __init__(self, path="audit_journal.db"):
+        self.path = path
+        # 분석 스레드들이 하나의 연결을 공유하므로 쓰기를 직렬화
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def start_job(self, job_id=None, params=None):
+        """새 작업을 등록하고 job_id를 반환. 이미 있는 job_id면 그대로 재개"""
+        job_id = job_id or uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, created_at, params) VALUES (?, ?, ?)",
+                (job_id, time.time(), json.dumps(params or {})),
+            )
+        return job_id
+
+    def latest_job(self):
+        with self._lock:
+            row = self._conn.execute("SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def list_jobs(self):
+        """[(job_id, created_at, params, 완료된 단위 수)]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT j.job_id, j.created_at, j.params, COUNT(u.status) FROM jobs j "
+                "LEFT JOIN units u ON u.job_id = j.job_id AND u.status IN (?, ?) "
+                "GROUP BY j.job_id ORDER BY j.created_at",
+                COMPLETED_STATUSES,
+            ).fetchall()
+        return [(job_id, created_at, json.loads(params), completed) for job_id, created_at, params, completed in rows]
+
+    def record(self, job_id, result):
+        """AuditResult 하나를 기록 (같은 단위의 이전 기록은 교체)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO units (job_id, contract_name, function_name, trace_hash, status, decision, "
+                "votes, keywords, review, error, elapsed, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, result.contract_name, result.function_name, result.trace_hash, result.status,
+                    result.decision, json.dumps(result.votes), json.dumps(result.keywords), result.review,
+                    result.error, result.elapsed, time.time(),
+                ),
+            )
+
+    def get_completed(self, job_id, contract_name, function_name):
+        """완료된 단위의 기록을 dict로 반환 (없거나 미완료면 None)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT trace_hash, status, decision, votes, keywords, review, error, elapsed FROM units "
+                "WHERE job_id = ? AND contract_name = ? AND function_name = ? AND status IN (?, ?)",
+                (job_id, contract_name, function_name) + COMPLETED_STATUSES,
+            ).fetchone()
+        if row is None:
+            return None
+        trace_hash, status, decision, votes, keywords, review, error, elapsed = row
+        return {
+            "trace_hash": trace_hash,
+            "status": status,
+            "decision": decision,
+            "votes": json.loads(votes) if votes else None,
+            "keywords": json.loads(keywords) if keywords else None,
+            "review": review,
+            "error": error,
+            "elapsed": elapsed,
+        }
+
+    def get_results(self, job_id):
+        """작업에 기록된 모든 단위 [(contract, function, status, decision, review)] (기록 순)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT contract_name, function_name, status, decision, review FROM units "
+                "WHERE job_id = ? ORDER BY completed_at",
+                (job_id,),
+            ).fetchall()
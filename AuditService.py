@@ -0,0 +1,471 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from AuditJournal import AuditJournal
+from Client import Client
+from SelectionPolicy import POLICIES
+import Metrics
+
+# status: "queued" | "running" | "done" | "failed" | "cancelled"
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+SERVICE_JOBS = Metrics.REGISTRY.gauge("audit_service_jobs", "Service jobs by status", ("status",))
+
+
+class AuditJob:
+    def __init__(self, submitter, params):
+        self.job_id = uuid.uuid4().hex
+        self.submitter = submitter
+        self.params = params
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.total = None
+        # 완료 순서대로 쌓이는 함수별 결과 (dict), 스트리밍 대기자는 condition으로 깨움
+        self.results = []
+        self.condition = threading.Condition()
+        self.cancel_requested = False
+
+    def add_result(self, result):
+        with self.condition:
+            self.results.append(result)
+            self.condition.notify_all()
+
+    def finish(self, status, error=None):
+        with self.condition:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self.condition.notify_all()
+
+    def summary(self):
+        counts = {}
+        for result in self.results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return {
+            "job_id": self.job_id,
+            "submitter": self.submitter,
+            "status": self.status,
+            "error": self.error,
+            "total": self.total,
+            "completed": len(self.results),
+            "counts": counts,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class FairQueue:
+    """제출자(팀)별 FIFO 중 가장 오래전에 처리된 제출자의 작업을 먼저 꺼내는 작업 큐
+
+    한 팀이 작업을 많이 넣어도 다른 팀의 작업이 그 뒤에 밀리지 않는다.
+    """
+
+    def __init__(self):
+        self._queues = OrderedDict()
+        # submitter -> 마지막으로 작업을 꺼낸 순번 (처음 보는 제출자가 가장 우선)
+        self._last_served = dict()
+        self._served = 0
+        self._condition = threading.Condition()
+
+    def put(self, submitter, item):
+        with self._condition:
+            self._queues.setdefault(submitter, deque()).append(item)
+            self._condition.notify()
+
+    def get(self):
+        with self._condition:
+            while not self._queues:
+                self._condition.wait()
+            submitter = min(self._queues, key=lambda name: self._last_served.get(name, -1))
+            queue = self._queues[submitter]
+            item = queue.popleft()
+            if not queue:
+                del self._queues[submitter]
+            self._served += 1
+            self._last_served[submitter] = self._served
+            return item
+
+    def remove(self, submitter, item):
+        with self._condition:
+            queue = self._queues.get(submitter)
+            if queue is None or item not in queue:
+                return False
+            queue.remove(item)
+            if not queue:
+                del self._queues[submitter]
+            return True
+
+    def __len__(self):
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+
+class AuditService:
+    """LLM 클라이언트와 벡터 DB, 컨트랙트 로딩 결과를 상주시킨 채 HTTP로 분석 작업을 받는 서비스
+
+    작업마다 별도 ContractManager를 쓰되 같은 소스 파일 집합(경로와 수정 시각)이면
+    이미 로드한 Client를 재사용한다.
+    """
+
+    def __init__(self, endpoints=None, job_slots=2, max_workers=4, journal_path=None, workdir=None, warm_cache_size=8,
+                 max_finished_jobs=100, finished_job_ttl=24 * 3600):
+        self.client = Client()
+        if endpoints:
+            self.client.set_endpoints(endpoints)
+        self.job_slots = job_slots
+        self.max_workers = max_workers
+        self.journal = AuditJournal(journal_path) if journal_path else None
+        self.workdir = workdir or tempfile.mkdtemp(prefix="audit_service_")
+
+        self.jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        # 끝난 작업(결과와 리뷰 본문 포함)은 최대 max_finished_jobs개, finished_job_ttl초까지만 보관
+        # (전체 기록이 필요하면 --journal 사용)
+        self.max_finished_jobs = max_finished_jobs
+        self.finished_job_ttl = finished_job_ttl
+        self.queue = FairQueue()
+        # 소스 집합 키 -> 로드된 Client의 Future (LRU, 같은 키는 한 스레드만 만들고 나머지는 기다림)
+        self._clients = OrderedDict()
+        self._clients_lock = threading.Lock()
+        self.warm_cache_size = warm_cache_size
+        self._threads = []
+
+    def warm_up(self):
+        # 임베딩 모델과 Chroma 컬렉션을 미리 열어 첫 작업의 지연을 없앰
+        try:
+            self.client.auditor.vector_db
+        except Exception as e:
+            print(f"vector DB warm-up failed: {e!r}", file=sys.stderr)
+
+    def start(self):
+        for _ in range(self.job_slots):
+            thread = threading.Thread(target=self._worker_loop, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, params, submitter="default"):
+        paths = params.get("paths")
+        if not paths or not isinstance(paths, list):
+            raise ValueError("'paths' must be a non-empty list of .sol files")
+        missing = [path for path in paths if not os.path.isfile(path)]
+        if missing:
+            raise ValueError(f"files not found: {missing}")
+        if params.get("policy") is not None and params["policy"] not in POLICIES:
+            raise ValueError(f"unknown policy {params['policy']!r}, expected one of {list(POLICIES)}")
+
+        job = AuditJob(submitter, params)
+        with self._jobs_lock:
+            self.jobs[job.job_id] = job
+        self.prune_jobs()
+        self.queue.put(submitter, job)
+        return job
+
+    def prune_jobs(self):
+        """보관 기간이 지났거나 개수 한도를 넘은 끝난 작업을 오래 끝난 순으로 제거하고 제거한 수를 반환"""
+        now = time.time()
+        with self._jobs_lock:
+            finished = sorted(
+                (job for job in self.jobs.values() if job.status in FINISHED_STATUSES and job.finished_at is not None),
+                key=lambda job: job.finished_at,
+            )
+            excess = max(len(finished) - self.max_finished_jobs, 0)
+            expired = [
+                job for i, job in enumerate(finished)
+                if i < excess or now - job.finished_at > self.finished_job_ttl
+            ]
+            for job in expired:
+                del self.jobs[job.job_id]
+        return len(expired)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job.cancel_requested = True
+        if self.queue.remove(job.submitter, job):
+            job.finish("cancelled")
+        return job
+
+    def _source_key(self, paths):
+        key = hashlib.sha256()
+        for path in sorted(os.path.abspath(path) for path in paths):
+            key.update(f"{path}:{os.path.getmtime(path)}\n".encode("utf-8"))
+        return key.hexdigest()
+
+    def _get_client(self, paths):
+        """같은 소스 집합이면 로드된 Client를 재사용 (auditor와 벡터 DB는 모든 작업이 공유)"""
+        key = self._source_key(paths)
+        with self._clients_lock:
+            future = self._clients.get(key)
+            builder = future is None
+            if not builder:
+                self._clients.move_to_end(key)
+            else:
+                future = self._clients[key] = Future()
+                future.set_running_or_notify_cancel()
+                # 만드는 중인 Client는 내보내지 않음 (같은 info_dir에 두 스레드가 쓰지 않도록)
+                for old_key in [old_key for old_key, old in self._clients.items() if old.done()]:
+                    if len(self._clients) <= self.warm_cache_size:
+                        break
+                    del self._clients[old_key]
+        if not builder:
+            return future.result()
+
+        try:
+            info_dir = os.path.join(self.workdir, key[:16])
+            os.makedirs(info_dir, exist_ok=True)
+            client = Client(auditor=self.client.auditor, info_dir=info_dir)
+            client.auditors = self.client.auditors
+            client.load_contracts([os.path.abspath(path) for path in paths])
+        except Exception as e:
+            # 실패한 키는 캐시에서 빼서 다음 작업이 다시 시도하게 하고, 기다리던 작업에도 같은 예외를 전달
+            with self._clients_lock:
+                if self._clients.get(key) is future:
+                    del self._clients[key]
+            future.set_exception(e)
+            raise
+        future.set_result(client)
+        return client
+
+    def _worker_loop(self):
+        while True:
+            job = self.queue.get()
+            if job.cancel_requested:
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job):
+        params = job.params
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            client = self._get_client(params["paths"])
+            targets = client.get_audit_targets(params.get("contracts"), policy=params.get("policy"))
+            job.total = len(targets)
+            results = client.audit_functions(
+                targets,
+                params.get("depth", 3),
+                params.get("check_impact", False),
+                params.get("slice_context", False),
+                max_workers=params.get("max_workers", self.max_workers),
+                timeout=params.get("timeout"),
+                is_cancelled=lambda: job.cancel_requested,
+                journal=self.journal,
+                job_id=job.job_id if self.journal else None,
+                dedup=params.get("dedup", True),
+                on_result=lambda result: job.add_result(result_to_dict(result)),
+            )
+        except Exception as e:
+            job.finish("failed", repr(e))
+            return
+
+        # 취소로 실행되지 않은 함수도 결과 목록에 남김
+        reported = {(result["contract_name"], result["function_name"]) for result in job.results}
+        for result in results:
+            if (result.contract_name, result.function_name) not in reported:
+                job.add_result(result_to_dict(result))
+        job.finish("cancelled" if job.cancel_requested else "done")
+        self.prune_jobs()
+
+    def iter_results(self, job, start=0, poll_interval=15):
+        """start번째 결과부터 새 결과가 생길 때마다 생성, 작업이 끝나면 종료 (poll_interval마다 None으로 keep-alive)"""
+        index = start
+        while True:
+            with job.condition:
+                if index >= len(job.results) and job.status not in FINISHED_STATUSES:
+                    job.condition.wait(poll_interval)
+                results = job.results[index:]
+                finished = job.status in FINISHED_STATUSES
+            if not results and not finished:
+                yield None
+            for result in results:
+                yield result
+            index += len(results)
+            if finished and index >= len(job.results):
+                return
+
+
+def result_to_dict(result):
+    # JSON 직렬화를 위해 튜플(shared_with, keywords 항목)은 리스트로 변환
+    return json.loads(json.dumps(result._asdict(), default=str))
+
+
+class AuditRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST   /jobs                  {"paths": [...], "depth", "check_impact", "slice_context", "policy", "contracts",
+                                   "timeout", "max_workers", "dedup", "submitter"} -> 202 {"job_id"}
+    GET    /jobs                  모든 작업 요약
+    GET    /jobs/<id>?since=N     작업 요약과 N번째 이후 결과 (폴링)
+    GET    /jobs/<id>/stream      결과를 JSONL로 스트리밍하고 작업이 끝나면 연결 종료
+    DELETE /jobs/<id>             작업 취소
+    GET    /health                상태 확인
+    GET    /metrics               Prometheus 텍스트 형식 지표 (Metrics.REGISTRY)
+    """
+
+    service = None
+
+    def log_message(self, format, *args):
+        sys.stderr.write("%s - %s\n" % (self.address_string(), format % args))
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        return parts, parse_qs(url.query)
+
+    def _get_since(self, query):
+        # 잘못된 값이면 400을 보내고 None
+        try:
+            since = int(query.get("since", ["0"])[0])
+        except ValueError:
+            since = -1
+        if since < 0:
+            self._send_json(400, {"error": "'since' must be a non-negative integer"})
+            return None
+        return since
+
+    def _get_job(self, job_id):
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"unknown job {job_id}"})
+        return job
+
+    def do_GET(self):
+        parts, query = self._route()
+        # 새 작업이 없어도 조회 시점에 보관 기간이 지난 작업을 정리
+        self.service.prune_jobs()
+        if parts == ["health"]:
+            self._send_json(200, {"status": "ok", "queued": len(self.service.queue), "jobs": len(self.service.jobs)})
+        elif parts == ["metrics"]:
+            for status in ("queued", "running"):
+                SERVICE_JOBS.set(sum(job.status == status for job in list(self.service.jobs.values())), status=status)
+            payload = Metrics.REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        elif parts == ["jobs"]:
+            self._send_json(200, [job.summary() for job in list(self.service.jobs.values())])
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._get_job(parts[1])
+            since = self._get_since(query) if job is not None else None
+            if since is None:
+                return
+            body = job.summary()
+            body["results"] = job.results[since:]
+            self._send_json(200, body)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "stream":
+            job = self._get_job(parts[1])
+            since = self._get_since(query) if job is not None else None
+            if since is None:
+                return
+            self._stream(job, since)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _stream(self, job, since):
+        # HTTP/1.0 응답이라 연결 종료가 스트림 끝을 의미
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for result in self.service.iter_results(job, since):
+                # 결과가 없는 동안에는 빈 줄로 연결 유지
+                self.wfile.write((json.dumps(result, ensure_ascii=False) if result is not None else "").encode("utf-8") + b"\n")
+                self.wfile.flush()
+            self.wfile.write(json.dumps({"job": job.summary()}).encode("utf-8") + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_POST(self):
+        parts, _ = self._route()
+        if parts != ["jobs"]:
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(params, dict):
+                raise ValueError("request body must be a JSON object")
+            job = self.service.submit(params, str(params.get("submitter", "default")))
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(202, {"job_id": job.job_id, "status": job.status})
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        job = self.service.cancel(parts[1])
+        if job is None:
+            self._send_json(404, {"error": f"unknown job {parts[1]}"})
+            return
+        self._send_json(200, job.summary())
+
+
+def serve(service, host="127.0.0.1", port=8765):
+    handler = type("BoundAuditRequestHandler", (AuditRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    service.start()
+    print(f"audit service listening on http://{host}:{server.server_address[1]}", file=sys.stderr)
+    return server
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="AuditService.py", description="Long-running audit service with an HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--endpoint", action="append", default=[], help="LLM API host or completions URL (repeatable)")
+    parser.add_argument("--job-slots", type=int, default=2, help="jobs running at once (default: 2)")
+    parser.add_argument("-j", "--workers", type=int, default=4, help="functions in flight per job (default: 4)")
+    parser.add_argument("--journal", help="SQLite journal recording every job's results")
+    parser.add_argument("--workdir", help="directory for parsed contract JSON (default: temp dir)")
+    parser.add_argument("--no-warm-up", action="store_true", help="do not preload the embedding model at startup")
+    parser.add_argument("--keep-jobs", type=int, default=100, help="finished jobs kept in memory (default: 100)")
+    parser.add_argument("--job-ttl", type=float, default=24 * 3600,
+                        help="seconds a finished job stays queryable (default: 86400)")
+    args = parser.parse_args(argv)
+
+    service = AuditService(args.endpoint, args.job_slots, args.workers, args.journal, args.workdir,
+                           max_finished_jobs=args.keep_jobs, finished_job_ttl=args.job_ttl)
+    if not args.no_warm_up:
+        service.warm_up()
+    server = serve(service, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
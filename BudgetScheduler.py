@@ -0,0 +1,357 @@
+from Client import AuditResult
+from collections import OrderedDict, namedtuple
+import math
+import re
+import time
+
+# 관측값이 생기기 전 사용하는 추정치
+CHARS_PER_TOKEN = 4
+# 추적 코드 외 프롬프트 고정 부분 (지시문 + 벡터 DB 참고 자료 두 번)
+PROMPT_OVERHEAD_TOKENS = 6000
+DEFAULT_COMPLETION_TOKENS = 1500
+DEFAULT_DECODE_RATE = 20.0  # 요청 하나의 초당 생성 토큰 수
+DEFAULT_PREFILL_RATE = 1000.0  # 요청 하나의 초당 프롬프트 처리 토큰 수
+
+VALUE_TRANSFER_PATTERN = re.compile(
+    r"\.(?:transfer|send|safeTransfer|safeTransferFrom|transferFrom)\s*\(|\.call\s*\{\s*value|msg\.value"
+)
+LOW_LEVEL_CALL_PATTERN = re.compile(r"\.(?:call|delegatecall|staticcall)\s*[({]")
+
+# plan 항목: risk는 높을수록 먼저, prompt_tokens는 깊이별 추정 프롬프트 토큰 {depth: tokens}
+UnitPlan = namedtuple("UnitPlan", ["contract_name", "function_name", "risk", "prompt_tokens"])
+
+
+class BudgetScheduler:
+    """시간(초)/토큰 예산 안에서 전체 분석을 끝내도록 순서와 분석 강도를 조절하는 스케줄러
+
+    단위를 위험도(상태 변수 쓰기, 외부 호출, 자산 이동) 순으로 정렬해 최대 max_workers * 2개씩 실행하고,
+    매 묶음 전에 남은 단위 전체가 남은 예산에 들어가도록 위험도가 낮은 뒤쪽 단위부터 강도를 낮춘다.
+    강도는 (num_samples, depth) 단계로, 샘플 수를 먼저 줄이고(5 -> 3 -> 1) 그다음 추적 깊이를 줄인다.
+    보정 전 추정치는 크게 어긋날 수 있으므로 강도를 낮춰야 하면 먼저 위험도가 가장 높은 단위(최대 max_workers개)를
+    최고 강도로, 그만큼의 예산도 없으면 어차피 낮아질 가장 뒤쪽 단위 하나를 (아무 단위도 들어가지 않으면 가장 앞
+    단위를 가장 낮은 강도로) 실행해 추정치를 보정한다.
+    모든 단위를 가장 낮은 강도로 낮춰도 모자라면 뒤쪽 단위부터 "skipped"로 남긴다.
+    토큰 비용은 추적 코드 크기로, 시간은 프롬프트 처리(prefill) 시간 + 생성 시간으로 추정하고, 실행할 때마다
+    LLMAuditor.get_usage()의 실제 토큰 수와 요청별 시간에서 맞춘 prefill/생성 속도로 보정한다.
+    """
+
+    def __init__(self, client, time_budget=None, token_budget=None, min_samples=1, min_depth=1):
+        self.client = client
+        self.time_budget = time_budget
+        self.token_budget = token_budget
+        self.min_samples = min_samples
+        self.min_depth = min_depth
+        # 실제 사용 토큰 / 추정 토큰 (Secure 조기 종료, 참고 자료 길이 차이를 반영)
+        self.token_ratio = 1.0
+        self.decode_rate = DEFAULT_DECODE_RATE
+        self.prefill_rate = DEFAULT_PREFILL_RATE
+        self.completion_tokens = DEFAULT_COMPLETION_TOKENS
+        self.calibrated = False
+        self.report = None
+
+    def risk_score(self, contract_name, function_name, datas):
+        """추적 묶음 기준 위험도: 자산 이동 3, 외부/저수준 호출 2, 쓰는 상태 변수 수(최대 3), payable 1, 진입 함수 1"""
+        manager = self.client.manager
+        code = "\n".join("\n".join(lines) for value in datas.values() for lines in value)
+        score = 0
+        if VALUE_TRANSFER_PATTERN.search(code):
+            score += 3
+        if manager.get_functions_external_calls(contract_name, function_name) or LOW_LEVEL_CALL_PATTERN.search(code):
+            score += 2
+        score += min(len(manager.get_functions_modified_state_vars(contract_name, function_name) or []), 3)
+        if any(attributes["Mutability"] == "payable" for attributes in manager.get_function_attributes(contract_name, function_name)):
+            score += 1
+        if manager.is_entry_point(contract_name, function_name):
+            score += 1
+        return score
+
+    def _prompt_tokens(self, datas, impacted_function):
+        text = self.client.auditor.formatting_datas(datas, impacted_function)
+        return PROMPT_OVERHEAD_TOKENS + len(text) // CHARS_PER_TOKEN
+
+    def plan(self, targets, depth=3, check_impact=False, slice_context=False):
+        """targets를 위험도 내림차순(같으면 targets 순서) [UnitPlan]으로 정렬 (LLM 호출 없음)"""
+        units = []
+        for index, (contract_name, function_name) in enumerate(targets):
+            prompt_tokens = {}
+            risk = 0
+            for unit_depth in range(depth, self.min_depth - 1, -1):
+                try:
+                    datas, impacted_function, _ = self.client._trace_for_audit(
+                        contract_name, function_name, unit_depth, check_impact, slice_context
+                    )
+                except Exception:
+                    # 추적에 실패한 단위는 실행 시 오류로 기록되도록 최소 비용으로 둠
+                    datas, impacted_function = {}, None
+                if unit_depth == depth:
+                    risk = self.risk_score(contract_name, function_name, datas)
+                prompt_tokens[unit_depth] = self._prompt_tokens(datas, impacted_function)
+            units.append((-risk, index, UnitPlan(contract_name, function_name, risk, prompt_tokens)))
+        return [unit for _, _, unit in sorted(units)]
+
+    def _levels(self, depth):
+        samples = self.client.auditor.num_samples
+        levels = []
+        while samples > self.min_samples:
+            levels.append((samples, depth))
+            samples = max(samples - 2, self.min_samples)
+        levels.append((samples, depth))
+        levels.extend((samples, level_depth) for level_depth in range(depth - 1, self.min_depth - 1, -1))
+        return levels
+
+    def _estimate(self, unit, level):
+        """(토큰, 초) 추정: 샘플마다 프롬프트 + 생성, 시간은 prefill + 생성 (동시 실행은 호출자가 나눔)"""
+        samples, depth = level
+        prompt_tokens = unit.prompt_tokens[depth]
+        tokens = samples * (prompt_tokens + self.completion_tokens) * self.token_ratio
+        seconds = samples * (prompt_tokens / self.prefill_rate + self.completion_tokens / self.decode_rate)
+        return tokens, seconds
+
+    def _assign_levels(self, units, levels, tokens_left, seconds_left, max_workers):
+        """위험도 순 units에 강도(levels 인덱스)를 배정한 리스트
+
+        예산에 들어갈 때까지 가장 뒤쪽(위험도 낮은) 단위를 한 단계씩 낮추고, 더 낮춰도 넘친 쪽(토큰/시간) 비용이
+        줄지 않으면 앞 단위로 넘어간다. 모두 그렇게 낮춰도 모자라면 뒤쪽 단위를 빼므로 리스트가 units보다 짧을 수 있다.
+        """
+        costs = [[self._estimate(unit, level) for level in levels] for unit in units]
+        assigned = [0] * len(units)
+        tokens = sum(cost[0][0] for cost in costs)
+        seconds = sum(cost[0][1] for cost in costs)
+
+        def over():
+            # 넘친 쪽 비용의 인덱스 (0: 토큰, 1: 시간)
+            return ([0] if tokens_left is not None and tokens > tokens_left else []) + (
+                [1] if seconds_left is not None and seconds / max_workers > seconds_left else [])
+
+        def saving_level(position, dimensions):
+            # 넘친 쪽 비용을 1% 넘게 줄이는 다음 강도 (없으면 None: 깊이만 줄여도 시간이 그대로인 경우 등)
+            current = costs[position][assigned[position]]
+            for index in range(assigned[position] + 1, len(levels)):
+                if any(costs[position][index][dimension] < current[dimension] * 0.99 for dimension in dimensions):
+                    return index
+            return None
+
+        count = len(units)
+        position = count - 1
+        while count and over():
+            index = saving_level(position, over()) if position >= 0 else None
+            if index is not None:
+                before, after = costs[position][assigned[position]], costs[position][index]
+                assigned[position] = index
+                tokens += after[0] - before[0]
+                seconds += after[1] - before[1]
+            elif position >= 0:
+                position -= 1
+            else:
+                count -= 1
+                tokens -= costs[count][assigned[count]][0]
+                seconds -= costs[count][assigned[count]][1]
+        return assigned[:count]
+
+    def _calibration_count(self, units, levels, tokens_left, seconds_left, max_workers):
+        # 보정용 첫 묶음으로 최고 강도에서 예산에 들어가는 앞쪽 단위 수 (최대 max_workers개)
+        tokens = seconds = 0.0
+        count = 0
+        for unit in units[:max_workers]:
+            unit_tokens, unit_seconds = self._estimate(unit, levels[0])
+            tokens += unit_tokens
+            seconds = max(seconds, unit_seconds)
+            if (tokens_left is not None and tokens > tokens_left) or (seconds_left is not None and seconds > seconds_left):
+                break
+            count += 1
+        return count
+
+    @staticmethod
+    def _budget_skipped(result):
+        return AuditResult(result.contract_name, result.function_name, "skipped", None, None, None,
+                           "budget exhausted", result.elapsed)
+
+    def _observe(self, usage_before, usage_after, estimated_tokens):
+        completion = usage_after["completion_tokens"] - usage_before["completion_tokens"]
+        prompt = usage_after["prompt_tokens"] - usage_before["prompt_tokens"]
+        requests = usage_after["requests"] - usage_before["requests"]
+        seconds = usage_after["seconds"] - usage_before["seconds"]
+        if requests and seconds > 0:
+            self._fit_rates({key: usage_after[key] - usage_before[key] for key in usage_after})
+            self.completion_tokens = completion / requests or self.completion_tokens
+        if estimated_tokens > 0 and prompt + completion > 0:
+            ratio = (prompt + completion) / estimated_tokens
+            # 첫 관측은 기본 추정치를 대체하고, 이후에는 누적 평균처럼 천천히 따라가도록 이전 비율과 반씩 섞음
+            self.token_ratio = (self.token_ratio + ratio) / 2 if self.calibrated else ratio
+            self.calibrated = True
+
+    def _fit_rates(self, usage):
+        # 요청별 s = p * x + c * y 최소제곱 (x = 1 / prefill_rate, y = 1 / decode_rate), 음수가 되는 항은 0으로 두고 다시 맞춤
+        pp, pc, cc = usage["prompt_sq"], usage["prompt_completion"], usage["completion_sq"]
+        ps, cs = usage["prompt_seconds"], usage["completion_seconds"]
+        determinant = pp * cc - pc * pc
+        if determinant > 1e-9 * pp * cc:
+            x = (ps * cc - pc * cs) / determinant
+            y = (pp * cs - pc * ps) / determinant
+            if x < 0:
+                x, y = 0.0, cs / cc
+            elif y <= 0:
+                x, y = ps / pp, None
+        elif cc:
+            # 요청이 하나이거나 p:c 비율이 모두 같으면 prefill 속도는 그대로 두고 생성 속도만 맞춤
+            y = (usage["seconds"] - usage["prompt_tokens"] / self.prefill_rate) / usage["completion_tokens"]
+            x = None
+            if y <= 0:
+                x, y = 0.0, cs / cc
+        else:
+            return
+        if x is not None:
+            self.prefill_rate = 1 / x if x > 0 else math.inf
+        if y:
+            self.decode_rate = 1 / y
+
+    def run(self, targets, depth=3, check_impact=False, slice_context=False, max_workers=4, journal=None, job_id=None,
+            progress_callback=None, is_cancelled=None, on_result=None):
+        """예산 안에서 targets를 분석하고 targets 순서의 AuditResult 리스트를 반환 (요약은 self.report)"""
+        started = time.monotonic()
+        targets = list(targets)
+        auditors = self.client.auditors
+        full_samples = self.client.auditor.num_samples
+        levels = self._levels(depth)
+        remaining = self.plan(targets, depth, check_impact, slice_context)
+        results = OrderedDict((tuple(target), None) for target in targets)
+        if journal is not None:
+            job_id = journal.start_job(job_id, {
+                "targets": targets, "depth": depth, "check_impact": check_impact, "slice_context": slice_context,
+            })
+
+        report = {
+            "time_budget": self.time_budget,
+            "token_budget": self.token_budget,
+            "order": [(unit.contract_name, unit.function_name, unit.risk) for unit in remaining],
+            "levels": OrderedDict(),
+            "degraded": [],
+            "skipped": [],
+        }
+        tokens_used = 0
+        completed = 0
+        cancelled = False
+        wave_size = max_workers * 2
+        risks = {(unit.contract_name, unit.function_name): unit.risk for unit in remaining}
+        try:
+            while remaining:
+                if is_cancelled and is_cancelled():
+                    cancelled = True
+                    break
+                seconds_left = None if self.time_budget is None else self.time_budget - (time.monotonic() - started)
+                tokens_left = None if self.token_budget is None else self.token_budget - tokens_used
+                assigned = self._assign_levels(remaining, levels, tokens_left, seconds_left, max_workers)
+                if not assigned:
+                    if self.calibrated:
+                        break
+                    assigned = [len(levels) - 1]
+                if not self.calibrated and assigned[0] != 0:
+                    count = self._calibration_count(remaining, levels, tokens_left, seconds_left, max_workers)
+                    if count:
+                        wave, level = remaining[:count], levels[0]
+                        remaining = remaining[count:]
+                    else:
+                        last = len(assigned) - 1
+                        wave, level = [remaining[last]], levels[assigned[last]]
+                        remaining = remaining[:last] + remaining[last + 1:]
+                else:
+                    # 강도는 뒤로 갈수록 같거나 낮으므로 앞에서부터 같은 강도인 단위를 한 묶음으로 실행
+                    count = 1
+                    while count < min(wave_size, len(assigned)) and assigned[count] == assigned[0]:
+                        count += 1
+                    wave, level = remaining[:count], levels[assigned[0]]
+                    remaining = remaining[count:]
+
+                samples, wave_depth = level
+                for auditor in auditors:
+                    auditor.set_num_samples(samples)
+                wave_targets = [(unit.contract_name, unit.function_name) for unit in wave]
+                estimated_tokens = sum(self._estimate(unit, level)[0] for unit in wave) / self.token_ratio
+                usage_before = self.client.auditor.get_usage()
+                deadline = None if self.time_budget is None else started + self.time_budget
+
+                def wave_cancelled():
+                    return (is_cancelled and is_cancelled()) or (deadline is not None and time.monotonic() > deadline)
+
+                def wave_progress(done, total, message):
+                    if progress_callback:
+                        progress_callback(completed + done, len(targets), message)
+
+                wave_results = self.client.audit_functions(
+                    wave_targets, wave_depth, check_impact, slice_context, max_workers=max_workers,
+                    timeout=None if deadline is None else max(deadline - time.monotonic(), 1),
+                    progress_callback=wave_progress, is_cancelled=wave_cancelled, journal=journal, job_id=job_id,
+                    on_result=on_result,
+                )
+                # 묶음 중간에 끊겨 결과가 없는 단위(audit_functions는 on_result를 부르지 않음):
+                # 사용자 취소가 아니면 예산 마감으로 보고 "skipped"로 남김
+                budget_cut = not (is_cancelled and is_cancelled())
+                for index, result in enumerate(wave_results):
+                    if result.status == "cancelled":
+                        if budget_cut:
+                            result = wave_results[index] = self._budget_skipped(result)
+                        if on_result:
+                            on_result(result)
+                usage_after = self.client.auditor.get_usage()
+                tokens_used += (usage_after["prompt_tokens"] + usage_after["completion_tokens"]
+                                - usage_before["prompt_tokens"] - usage_before["completion_tokens"])
+                self._observe(usage_before, usage_after, estimated_tokens)
+
+                completed += len(wave_results)
+                ran = sum(1 for result in wave_results if result.status != "skipped")
+                if ran:
+                    report["levels"][f"samples={samples},depth={wave_depth}"] = (
+                        report["levels"].get(f"samples={samples},depth={wave_depth}", 0) + ran
+                    )
+                for result in wave_results:
+                    results[(result.contract_name, result.function_name)] = result
+                    if result.status == "skipped":
+                        report["skipped"].append((result.contract_name, result.function_name,
+                                                  risks[(result.contract_name, result.function_name)]))
+                    elif (samples, wave_depth) != levels[0]:
+                        report["degraded"].append((result.contract_name, result.function_name, samples, wave_depth))
+        finally:
+            for auditor in auditors:
+                auditor.set_num_samples(full_samples)
+
+        for unit in remaining:
+            if cancelled:
+                result = AuditResult(unit.contract_name, unit.function_name, "cancelled", None, None, None, None, 0.0)
+            else:
+                result = AuditResult(unit.contract_name, unit.function_name, "skipped", None, None, None,
+                                     "budget exhausted", 0.0)
+                report["skipped"].append((unit.contract_name, unit.function_name, unit.risk))
+            results[(unit.contract_name, unit.function_name)] = result
+            if on_result:
+                on_result(result)
+
+        report["elapsed"] = time.monotonic() - started
+        report["tokens_used"] = tokens_used
+        report["decode_rate"] = self.decode_rate
+        report["prefill_rate"] = self.prefill_rate
+        report["token_ratio"] = self.token_ratio
+        self.report = report
+        return list(results.values())
+
+
+def format_budget_report(report):
+    budgets = []
+    if report["time_budget"] is not None:
+        budgets.append(f"{report['time_budget']:g}s")
+    if report["token_budget"] is not None:
+        budgets.append(f"{report['token_budget']} tokens")
+    lines = [
+        f"Budget: {' / '.join(budgets) or 'none'}",
+        f"Spent: {report['elapsed']:.1f}s, {report['tokens_used']} tokens "
+        f"(prefill {report['prefill_rate']:.0f} tok/s, decode {report['decode_rate']:.1f} tok/s, "
+        f"estimate x{report['token_ratio']:.2f})",
+    ]
+    for level, count in report["levels"].items():
+        lines.append(f"  - {level}: {count}")
+    lines.append(f"Degraded: {len(report['degraded'])}")
+    for contract_name, function_name, samples, depth in report["degraded"]:
+        lines.append(f"  - {contract_name}::{function_name} (samples={samples}, depth={depth})")
+    lines.append(f"Skipped: {len(report['skipped'])}")
+    for contract_name, function_name, risk in report["skipped"]:
+        lines.append(f"  - {contract_name}::{function_name} (risk {risk})")
+    return "\n".join(lines)
@@ -0,0 +1,120 @@
+from array import array
+from collections import deque
+
+EDGE_INTERNAL = 0
+EDGE_EXTERNAL = 1
+EDGE_VIEW_PURE = 2
+EDGE_KINDS = ("internal", "external", "view/pure")
+
+
+class CallGraph:
+    """(contract, function) 노드와 internal/external/view-pure 간선으로 구성된 프로젝트 호출 그래프
+
+    간선은 CSR 형태의 인접 배열(offsets/targets/kinds)로 저장하며,
+    호출자 방향 조회를 위해 역방향 인접 배열도 함께 유지한다.
+    """
+
+    def __init__(self, nodes, edges):
+        # nodes: [(contract_name, function_name)], edges: {source_id: [(target_id, kind)]}
+        self.nodes = list(nodes)
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+
+        self._offsets, self._targets, self._kinds = self._compact(
+            len(self.nodes), ((source, target, kind) for source in edges for target, kind in edges[source])
+        )
+        self._reverse_offsets, self._reverse_targets, self._reverse_kinds = self._compact(
+            len(self.nodes), ((target, source, kind) for source in edges for target, kind in edges[source])
+        )
+
+    @staticmethod
+    def _compact(num_nodes, triples):
+        adjacency = [[] for _ in range(num_nodes)]
+        for source, target, kind in triples:
+            adjacency[source].append((target, kind))
+
+        offsets = array("l", [0])
+        targets = array("l")
+        kinds = array("b")
+        for neighbors in adjacency:
+            for target, kind in neighbors:
+                targets.append(target)
+                kinds.append(kind)
+            offsets.append(len(targets))
+        return offsets, targets, kinds
+
+    @classmethod
+    def build(cls, function_names, resolve_callees):
+        """function_names: {contract: 함수 이름들}, resolve_callees(contract, function) -> [(callee_contract, callee_function, kind)]"""
+        nodes = [
+            (contract_name, function_name)
+            for contract_name in function_names
+            for function_name in function_names[contract_name]
+        ]
+        node_ids = {node: i for i, node in enumerate(nodes)}
+
+        edges = {}
+        for node_id, (contract_name, function_name) in enumerate(nodes):
+            seen = set()
+            for callee_contract, callee_function, kind in resolve_callees(contract_name, function_name):
+                target = node_ids.get((callee_contract, callee_function))
+                if target is None or target == node_id or target in seen:
+                    continue
+                seen.add(target)
+                edges.setdefault(node_id, []).append((target, kind))
+
+        return cls(nodes, edges)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def num_edges(self):
+        return len(self._targets)
+
+    def node_id(self, contract_name, function_name):
+        return self.node_ids.get((contract_name, function_name))
+
+    def callee_ids(self, node_id, kinds=None):
+        return self._neighbors(self._offsets, self._targets, self._kinds, node_id, kinds)
+
+    def caller_ids(self, node_id, kinds=None):
+        return self._neighbors(self._reverse_offsets, self._reverse_targets, self._reverse_kinds, node_id, kinds)
+
+    def _neighbors(self, offsets, targets, edge_kinds, node_id, kinds):
+        start, end = offsets[node_id], offsets[node_id + 1]
+        if kinds is None:
+            return [(targets[i], edge_kinds[i]) for i in range(start, end)]
+        return [(targets[i], edge_kinds[i]) for i in range(start, end) if edge_kinds[i] in kinds]
+
+    def callees(self, contract_name, function_name, kinds=None):
+        """직접 호출되는 함수 목록 [(contract, function, edge kind)]"""
+        node_id = self.node_id(contract_name, function_name)
+        if node_id is None:
+            return []
+        return [self.nodes[target] + (EDGE_KINDS[kind],) for target, kind in self.callee_ids(node_id, kinds)]
+
+    def callers(self, contract_name, function_name, kinds=None):
+        """이 함수를 직접 호출하는 함수 목록 [(contract, function, edge kind)]"""
+        node_id = self.node_id(contract_name, function_name)
+        if node_id is None:
+            return []
+        return [self.nodes[source] + (EDGE_KINDS[kind],) for source, kind in self.caller_ids(node_id, kinds)]
+
+    def neighborhood(self, contract_name, function_name, k, reverse=False):
+        """k 홉 이내의 모든 노드와 최단 홉 수 {(contract, function): hops} (시작 노드는 0)"""
+        node_id = self.node_id(contract_name, function_name)
+        if node_id is None:
+            return {}
+
+        neighbors = self.caller_ids if reverse else self.callee_ids
+        hops = {node_id: 0}
+        queue = deque([node_id])
+        while queue:
+            current = queue.popleft()
+            if hops[current] >= k:
+                continue
+            for target, _ in neighbors(current):
+                if target not in hops:
+                    hops[target] = hops[current] + 1
+                    queue.append(target)
+
+        return {self.nodes[i]: hop for i, hop in hops.items()}
@@ -0,0 +1,140 @@
+from utils import *
+from collections import OrderedDict, namedtuple
+import os
+import re
+import subprocess
+
+# kind: "added" | "modified" | "removed"
+FunctionChange = namedtuple("FunctionChange", ["contract_name", "function_name", "kind"])
+
+IDENTIFIER_PATTERN = r"\b{}\b"
+
+
+def _parse_source(contract_code):
+    """소스를 (contract_name, {함수 이름: [오버로드 코드]}, {modifier 이름: 코드}, 함수 밖 선언 줄 집합)으로 분리
+
+    save_to_json과 같은 규칙으로 나누고 빈 줄을 제거해 비교하므로 공백 줄만 바뀐 경우는 변경으로 보지 않는다.
+    """
+    chunks, _, contract_name = initial_separate(contract_code)
+    functions = OrderedDict()
+    modifiers = OrderedDict()
+    declarations = set()
+    for chunk in chunks:
+        lines = [line.rstrip() for line in chunk.split("\n") if line.strip() != ""]
+        chunk_type, name = extract_function_or_modifier_name(lines)
+        if chunk_type == "function":
+            functions.setdefault(name, []).append("\n".join(lines))
+        elif chunk_type == "modifier":
+            modifiers[name] = "\n".join(lines)
+        else:
+            # 컨트랙트 머리부, 상태 변수/구조체 선언, constructor 등
+            declarations.update(line.strip() for line in lines)
+    return contract_name, functions, modifiers, declarations
+
+
+def diff_contract_sources(old_code, new_code):
+    """같은 파일의 이전/현재 소스를 비교해 바뀐 함수 [FunctionChange]를 반환
+
+    함수 본문이 바뀐 경우 외에 붙어 있는 modifier가 바뀐 함수, 선언이 바뀐 상태 변수/구조체를
+    참조하는 함수도 "modified"로 본다. old_code나 new_code가 None이면 파일 추가/삭제로 처리한다.
+    """
+    old = _parse_source(old_code) if old_code is not None else None
+    new = _parse_source(new_code) if new_code is not None else None
+    if old is None and new is None:
+        return []
+    if old is None:
+        return [FunctionChange(new[0], name, "added") for name in new[1]]
+    if new is None:
+        return [FunctionChange(old[0], name, "removed") for name in old[1]]
+
+    old_name, old_functions, old_modifiers, old_declarations = old
+    contract_name, new_functions, new_modifiers, new_declarations = new
+    if old_name != contract_name:
+        # 컨트랙트 이름이 바뀌면 분석 단위가 모두 새로 생긴 것과 같음
+        return ([FunctionChange(old_name, name, "removed") for name in old_functions]
+                + [FunctionChange(contract_name, name, "added") for name in new_functions])
+
+    changed_modifiers = {
+        name for name in set(old_modifiers) | set(new_modifiers) if old_modifiers.get(name) != new_modifiers.get(name)
+    }
+    changed_globals = extract_structs_and_variables("\n".join(old_declarations ^ new_declarations))
+
+    changes = []
+    for name, codes in new_functions.items():
+        if name not in old_functions:
+            changes.append(FunctionChange(contract_name, name, "added"))
+        elif codes != old_functions[name]:
+            changes.append(FunctionChange(contract_name, name, "modified"))
+        elif any(_references(code, changed_modifiers) or _references(code, changed_globals) for code in codes):
+            changes.append(FunctionChange(contract_name, name, "modified"))
+    for name in old_functions:
+        if name not in new_functions:
+            changes.append(FunctionChange(contract_name, name, "removed"))
+    return changes
+
+
+def _references(code, names):
+    return any(re.search(IDENTIFIER_PATTERN.format(re.escape(name)), code) for name in names)
+
+
+def _git(repo_dir, *args):
+    completed = subprocess.run(
+        ["git", "-C", repo_dir] + list(args), capture_output=True, text=True, encoding="utf-8", errors="replace"
+    )
+    if completed.returncode != 0:
+        raise ValueError(f"git {' '.join(args)} failed: {completed.stderr.strip()}")
+    return completed.stdout
+
+
+def _read_revision(repo_root, revision, path):
+    # revision이 None이면 작업 트리의 파일 (없으면 None)
+    if revision is None:
+        full_path = os.path.join(repo_root, path)
+        if not os.path.isfile(full_path):
+            return None
+        with open(full_path, "r") as f:
+            return f.read()
+    try:
+        return _git(repo_root, "show", f"{revision}:{path}")
+    except ValueError:
+        return None
+
+
+def git_changed_files(base, head=None, repo_dir="."):
+    """base와 head(None이면 작업 트리) 사이에 바뀐 .sol 파일 [(이전 경로, 현재 경로)] (저장소 루트 기준, 추가/삭제는 한쪽이 None)"""
+    revisions = [base] if head is None else [base, head]
+    output = _git(repo_dir, "diff", "--name-status", "-M", *revisions, "--", "*.sol")
+    files = []
+    for line in output.splitlines():
+        fields = line.split("\t")
+        status = fields[0][:1]
+        if status == "A":
+            files.append((None, fields[1]))
+        elif status == "D":
+            files.append((fields[1], None))
+        elif status in ("R", "C"):
+            files.append((fields[1], fields[2]))
+        else:
+            files.append((fields[1], fields[1]))
+    return files
+
+
+def detect_git_changes(base, head=None, repo_dir="."):
+    """두 리비전(head가 None이면 base와 작업 트리) 사이에 바뀐 함수 [FunctionChange]"""
+    repo_root = _git(repo_dir, "rev-parse", "--show-toplevel").strip()
+    changes = []
+    for old_path, new_path in git_changed_files(base, head, repo_dir):
+        old_code = _read_revision(repo_root, base, old_path) if old_path else None
+        new_code = _read_revision(repo_root, head, new_path) if new_path else None
+        changes.extend(diff_contract_sources(old_code, new_code))
+    return list(OrderedDict.fromkeys(changes))
+
+
+def detect_file_changes(contract_paths):
+    """비교할 이전 리비전 없이 바뀐 파일 목록만 있을 때: 파일의 모든 함수를 "modified"로 간주"""
+    changes = []
+    for contract_path in contract_paths:
+        with open(contract_path, "r") as f:
+            contract_name, functions, _, _ = _parse_source(f.read())
+        changes.extend(FunctionChange(contract_name, name, "modified") for name in functions)
+    return changes
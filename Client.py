@@ -1,29 +1,148 @@
 from ContractManager import *
 from LLMAuditor import *
 from Tracer import *
+from Slicer import Slicer
 from utils import *
+from AuditJournal import AuditJournal
+from SelectionPolicy import get_policy
+import Profiler
+import Metrics
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# status: "secure" | "vulnerable" | "timeout" | "error" | "cancelled" | "skipped" (BudgetScheduler 예산 초과)
+# votes: 샘플별 판정 집계 {decision: count}, trace_hash: 분석에 사용한 추적 코드의 해시
+# fingerprint: 정규화한 추적 묶음의 해시, shared_with: 같은 지문이라 결과를 공유받은 대표 함수 (contract, function)
+AuditResult = namedtuple(
+    "AuditResult",
+    ["contract_name", "function_name", "status", "decision", "keywords", "review", "error", "elapsed",
+     "votes", "trace_hash", "fingerprint", "shared_with"],
+    defaults=(None, None, None, None),
+)
+
+COMMENT_PATTERN = re.compile(r"//.*?$|/\*.*?\*/", re.MULTILINE | re.DOTALL)
+FUNCTION_NAME_PATTERN = re.compile(r"\bfunction\s+\w+")
 
 class Client:
-    def __init__(self):
-        self.manager = ContractManager()
-        self.auditor = LLMAuditor(model="deepseek-r1-distill-qwen-32b")
+    def __init__(self, auditor=None, info_dir=None):
+        # auditor를 넘기면 설정과 (지연 로딩된) 벡터 DB를 공유 (AuditService의 작업별 Client)
+        self.manager = ContractManager(info_dir=info_dir)
+        self.auditor = auditor or LLMAuditor(model="deepseek-r1-distill-qwen-32b")
+        # 여러 추론 서버에 라운드 로빈으로 분배 (set_endpoints)
+        self.auditors = [self.auditor]
+        self._next_auditor_index = 0
+        self._auditor_lock = threading.Lock()
         self.tracer = Tracer(self.manager)
+        self.slicer = Slicer(self.manager)
+        # 추적은 CPU 작업이라 병렬 실행 시 이 락으로 직렬화 (ContractManager LRU, Tracer 캐시 보호)
+        self._trace_lock = threading.Lock()
+        # 분석 단위 수와 지문 중복 제거 후 실제 LLM에 보낸 단위 수 (누적)
+        self.dedup_stats = {"units": 0, "unique": 0}
+        # 마지막 증분 분석의 단위 수: 전체, 변경 영향, 이전 결과 재사용, 새로 분석
+        self.incremental_stats = {"targets": 0, "affected": 0, "reused": 0, "audited": 0}
+        # 마지막 예산 실행의 BudgetScheduler.report (순서, 강도별 단위 수, degraded, skipped)
+        self.budget_report = None
     
+    def set_endpoints(self, api_ips):
+        """분석 요청을 나눠 보낼 API 서버 목록 설정 (현재 auditor의 설정과 벡터 DB를 공유)"""
+        self.auditors = [self.auditor.with_endpoint(api_ip) for api_ip in api_ips]
+        self.auditor = self.auditors[0]
+
+    def _next_auditor(self):
+        with self._auditor_lock:
+            auditor = self.auditors[self._next_auditor_index % len(self.auditors)]
+            self._next_auditor_index += 1
+        return auditor
+
     def load_contracts(self, contract_paths):
         self.manager.initial_save(contract_paths)
         self.manager.load_contracts_info()
     
-    def analyze_and_review(self, contract_name, function_name, depth, check_impact=False):
-
-        datas, modifieds, modifiers, impacted_function = self.tracer.trace_function_with_depth(contract_name, function_name, depth)
-
-
-        if check_impact:
-            pass
-        else:
-            impacted_function = None
-        
-        decision, keywords = self.auditor.decision_vuln(datas, impacted_function)
+    def analyze_and_review(self, contract_name, function_name, depth, check_impact=False, slice_context=False):
+        _, _, review = self._audit_function(contract_name, function_name, depth, check_impact, slice_context)
+        return review
+
+    def _audit_function(self, contract_name, function_name, depth, check_impact=False, slice_context=False, deadline=None):
+        """(decision, keywords, review)를 반환. deadline(time.monotonic 기준)을 넘기면 리뷰 단계 전에 TimeoutError"""
+        datas, impacted_function, _ = self._trace_for_audit(contract_name, function_name, depth, check_impact, slice_context)
+        decision, keywords, _, review = self._review_traced(datas, impacted_function, deadline)
+        return decision, keywords, review
+
+    def _trace_for_audit(self, contract_name, function_name, depth, check_impact=False, slice_context=False):
+        # span의 자기 시간은 대부분 _trace_lock 대기 시간
+        with Profiler.span("trace_for_audit"), self._trace_lock:
+            hits, misses = self.tracer.cache_stats["hits"], self.tracer.cache_stats["misses"]
+            datas, modifieds, modifiers, impacted_function = self.tracer.trace_function_with_depth(contract_name, function_name, depth)
+            Metrics.TRACE_CACHE.inc(self.tracer.cache_stats["hits"] - hits, result="hit")
+            Metrics.TRACE_CACHE.inc(self.tracer.cache_stats["misses"] - misses, result="miss")
+
+
+            if check_impact:
+                pass
+            else:
+                impacted_function = None
+
+            if slice_context:
+                # 진입 함수의 상태 변수/파라미터와 무관한 문장을 제거해 프롬프트 축소
+                with Profiler.span("slice"):
+                    datas, impacted_function = self.slicer.slice_trace(contract_name, function_name, datas, modifieds, impacted_function)
+        return datas, impacted_function, modifiers
+
+    @staticmethod
+    def _trace_hash(datas, impacted_function):
+        # 추적된 코드가 같으면 같은 해시 (재개 시 코드가 바뀐 함수만 다시 분석)
+        payload = json.dumps([datas, impacted_function], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _fingerprint(datas, impacted_function, modifiers):
+        """추적 묶음(진입 함수 + 의존 함수 + 영향 함수 + 수정자)의 정규화된 지문
+
+        주석과 공백 차이는 무시하고, 의존/영향 함수와 수정자는 순서와 무관하게 비교한다.
+        진입 함수는 이름과 매개변수 이름을 지워 이름만 다른 래퍼/getter가 같은 지문을 갖게 한다.
+        """
+        def normalize(code):
+            return " ".join(COMMENT_PATTERN.sub("", "\n".join(code)).split())
+
+        def normalize_entry(code):
+            text = FUNCTION_NAME_PATTERN.sub("function _", normalize(code), count=1)
+            for i, parameter in enumerate(Slicer.get_parameter_list(code)):
+                # '@'는 Solidity 식별자에 쓸 수 없어 실제 이름과 겹치지 않음
+                text = re.sub(rf"\b{re.escape(parameter)}\b", f"@{i}", text)
+            return text
+
+        entries = [code for value in datas.values() for code in value]
+        codes = [normalize(code) for code in entries[1:]]
+        impacted = impacted_function or {}
+        payload = json.dumps([
+            [normalize_entry(code) for code in entries[:1]],
+            sorted(set(codes)),
+            sorted({normalize(code) for value in impacted.values() for code in value}),
+            sorted({normalize(code) for code in (modifiers or {}).values()}),
+        ], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_dedup_stats(self):
+        units = self.dedup_stats["units"]
+        unique = self.dedup_stats["unique"]
+        return {
+            "units": units,
+            "unique": unique,
+            "shared": units - unique,
+            # 공유받은 단위마다 Self-Consistency decision 호출(num_samples회)을 절약
+            "decision_calls_saved": (units - unique) * self.auditor.num_samples,
+        }
+
+    def _review_traced(self, datas, impacted_function, deadline=None):
+        """(decision, keywords, votes, review)를 반환"""
+        auditor = self._next_auditor()
+        decision, keywords, votes = auditor.decision_vuln_with_votes(datas, impacted_function)
         print(keywords)
         if "Vulnerable" in decision:
             # keywords가 None이 아닌 경우에만 라인 번호 포함하여 처리
@@ -36,79 +155,570 @@ class Client:
                         
                         if isinstance(function_info, list):
 
-                            function_name = function_info[0]
+                            keyword_function = function_info[0]
                             keyword = function_info[1] if len(function_info) > 1 else ""
                             if keyword != "":
-                                keywords_str += f"{function_name} - {keyword} (Code Line: {code_line})\n"
+                                keywords_str += f"{keyword_function} - {keyword} (Code Line: {code_line})\n"
 
             result_str = f"Decision: {decision} | Keywords: {keywords_str}"
             print(result_str)
 
-            review = self.auditor.review_vulnerabilities(datas, impacted_function, result_str)
-            return review
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("exceeded its time budget before review")
+
+            review = auditor.review_vulnerabilities(datas, impacted_function, result_str)
+            return decision, keywords, votes, review
 
         else:
-            return None
+            return decision, keywords, votes, None
     
-    def analyze_all_contracts_and_functions(self, check_impact=False):
-        contracts = self.manager.get_contract_names()
-
-        for contract in contracts:
-            contract_name = contract
-            functions = self.manager.get_contract_info(contract_name)["Functions"]
-            for function in functions:
-                function_name = function["Function Name"]
-                depth = 3
-                review = self.analyze_and_review(contract_name, function_name, depth)
-                if review:
-                    print(f"Contract: {contract_name}, Function: {function_name}")
-                    print(review)
-                    print("========================================")
-
-
-
-
-
-def main():
-    IManager = ContractManager()
-    IAuditor = LLMAuditor()
-    ITracer = Tracer(IManager)
-
-    IManager.initial_save(["LiquidRon.sol", "RonHelper.sol", "LiquidProxy.sol", "ValidatorTracker.sol", "Escrow.sol"])
-    IManager.load_contracts_info()
-
-
-    modifiers = IManager.get_all_modifier_function()
-    datas, modifieds, modifiers, impacted_function = ITracer.trace_function_with_depth("LiquidRon", "harvest",3)
-    # decison, keywords = IAuditor.decision_vuln(datas, modifiers)
-    decision, keywords = IAuditor.decision_vuln(datas, impacted_function)
-
-
-
-    # formatting_datas(datas)
-
-
-
-
-
-    if "Vulnerable" in decision:
-
-
-        if not keywords or keywords == [None]:
-            keywords_str = ""
+    def analyze_entry_points_reaching(self, contract_name, function_name, depth, check_impact=False, max_hops=None):
+        # 내부 헬퍼가 문제로 지목되면 전체 대신 그 함수에 도달 가능한 진입 함수만 분석
+        entry_points = self.tracer.trace_callers(contract_name, function_name, max_hops)
+
+        reviews = {}
+        for (entry_contract, entry_function), hops in entry_points.items():
+            print(f"Entry point: {entry_contract}::{entry_function} ({hops} hops)")
+            review = self.analyze_and_review(entry_contract, entry_function, depth, check_impact)
+            if review:
+                reviews[(entry_contract, entry_function)] = review
+        return reviews
+
+    def get_audit_targets(self, contract_names=None, policy=None):
+        """분석 대상 [(contract, function)] (컨트랙트/함수 선언 순서, 오버로드는 한 번만)
+
+        policy(SelectionPolicy 또는 "all"/"skip-trivial"/"entry-points")로 LLM에 보낼 함수를 거른다.
+        """
+        selected, _ = get_policy(policy).select(self.manager, self._all_targets(contract_names))
+        return selected
+
+    def selection_report(self, contract_names=None, policy="entry-points"):
+        """정책 적용 시 건너뛰는 함수 수와 절약되는 decision 호출 수 (LLM 호출 없이 계산)"""
+        targets = self._all_targets(contract_names)
+        selected, skipped = get_policy(policy).select(self.manager, targets)
+        samples = self.auditor.num_samples
+        return {
+            "policy": policy if isinstance(policy, str) else type(policy).__name__,
+            "total": len(targets),
+            "selected": len(selected),
+            "skipped": {reason: len(functions) for reason, functions in skipped.items()},
+            "skipped_functions": skipped,
+            # Self-Consistency 샘플 수만큼 함수당 decision 호출 발생 (Secure 조기 종료 전 최대치)
+            "decision_calls_before": len(targets) * samples,
+            "decision_calls": len(selected) * samples,
+            "decision_calls_saved": (len(targets) - len(selected)) * samples,
+            "saved_ratio": (len(targets) - len(selected)) / len(targets) if targets else 0.0,
+        }
+
+    def _all_targets(self, contract_names=None):
+        targets = []
+        for contract_name in contract_names or self.manager.get_contract_names():
+            contract_info = self.manager.get_contract_info(contract_name)
+            if not contract_info:
+                continue
+            function_names = dict.fromkeys(function["Function Name"] for function in contract_info["Functions"])
+            targets.extend((contract_name, function_name) for function_name in function_names)
+        return targets
+
+    def _run_audit(self, contract_name, function_name, depth, check_impact, slice_context, timeout, journal=None, job_id=None):
+        with Profiler.span("audit", contract=contract_name, function=function_name, depth=depth) as span:
+            result = self._run_audit_unit(
+                contract_name, function_name, depth, check_impact, slice_context, timeout, journal, job_id
+            )
+            span.set(status=result.status, decision=result.decision)
+        return result
+
+    def _run_audit_unit(self, contract_name, function_name, depth, check_impact, slice_context, timeout, journal=None, job_id=None):
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        trace_hash = None
+        try:
+            datas, impacted_function, _ = self._trace_for_audit(contract_name, function_name, depth, check_impact, slice_context)
+            trace_hash = self._trace_hash(datas, impacted_function)
+            if journal is not None:
+                completed = journal.get_completed(job_id, contract_name, function_name)
+                if completed and completed["trace_hash"] == trace_hash:
+                    return AuditResult(
+                        contract_name, function_name, completed["status"], completed["decision"], completed["keywords"],
+                        completed["review"], completed["error"], completed["elapsed"], completed["votes"], trace_hash,
+                    )
+            decision, keywords, votes, review = self._review_traced(datas, impacted_function, deadline)
+        except TimeoutError as e:
+            result = AuditResult(contract_name, function_name, "timeout", None, None, None, str(e), time.monotonic() - start,
+                                 trace_hash=trace_hash)
+        except Exception as e:
+            result = AuditResult(contract_name, function_name, "error", None, None, None, repr(e), time.monotonic() - start,
+                                 trace_hash=trace_hash)
         else:
-            keywords_str = ", ".join(keywords)  # 리스트를 문자열로 변환
-
-        # 최종 문자열 결합
-        result_str = f"Decision: {decision} | Keywords: {keywords_str}"
-
-        review = IAuditor.review_vulnerabilities(datas, impacted_function, result_str)
-
-
+            status = "vulnerable" if review else "secure"
+            result = AuditResult(contract_name, function_name, status, decision, keywords, review, None,
+                                 time.monotonic() - start, votes, trace_hash)
+        # 저널 기록은 호출자(audit_functions의 finish)가 함: 시간 초과로 버려진 스레드가 나중에 다른 결과를 쓰거나
+        # 이미 닫힌 저널에 쓰지 않도록
+        return result
+
+    def _group_by_fingerprint(self, targets, depth, check_impact, slice_context):
+        # 같은 지문의 targets 인덱스를 묶음 [[대표 인덱스, 나머지...]], 인덱스별 (지문, trace hash)
+        groups = OrderedDict()
+        hashes = []
+        for index, (contract_name, function_name) in enumerate(targets):
+            try:
+                datas, impacted_function, modifiers = self._trace_for_audit(
+                    contract_name, function_name, depth, check_impact, slice_context
+                )
+                fingerprint = self._fingerprint(datas, impacted_function, modifiers)
+                trace_hash = self._trace_hash(datas, impacted_function)
+            except Exception:
+                # 추적에 실패한 함수는 묶지 않고 개별 실행에서 오류로 기록
+                fingerprint, trace_hash = None, None
+            hashes.append((fingerprint, trace_hash))
+            groups.setdefault(fingerprint if fingerprint is not None else ("unique", index), []).append(index)
+        return list(groups.values()), hashes
+
+    def audit_functions(self, targets, depth=3, check_impact=False, slice_context=False, max_workers=4,
+                        timeout=None, progress_callback=None, is_cancelled=None, journal=None, job_id=None,
+                        dedup=True, on_result=None):
+        """targets [(contract, function)]를 최대 max_workers개씩 동시에 분석하고 targets 순서대로 AuditResult 리스트를 반환
+
+        timeout(초)은 함수별 실행 시간 제한으로, 초과한 함수는 "timeout"으로 기록하고 결과를 기다리지 않는다.
+        (스레드는 강제로 중단할 수 없으므로 진행 중인 LLM 요청은 요청 자체의 timeout까지 슬롯을 점유)
+
+        journal(AuditJournal)을 주면 완료된 함수마다 job_id 작업에 기록하고, 같은 job_id로 다시 실행하면
+        추적 코드가 바뀌지 않은 완료 함수는 LLM 호출 없이 기록된 결과를 사용한다.
+
+        dedup=True 이면 추적 묶음의 지문이 같은 함수들은 대표 함수 하나만 분석하고 그 결과를 나머지에 복사한다.
+        (get_dedup_stats()로 절약한 호출 수 확인)
+
+        on_result(AuditResult)는 함수 하나가 끝날 때마다 완료 순서대로 호출된다 (스트리밍 출력용).
+        """
+        targets = list(targets)
+        if journal is not None:
+            job_id = journal.start_job(job_id, {
+                "targets": targets, "depth": depth, "check_impact": check_impact, "slice_context": slice_context,
+            })
+        if dedup:
+            with Profiler.span("dedup", units=len(targets)) as span:
+                groups, hashes = self._group_by_fingerprint(targets, depth, check_impact, slice_context)
+                span.set(unique=len(groups))
+        else:
+            groups, hashes = [[index] for index in range(len(targets))], [(None, None)] * len(targets)
+        self.dedup_stats["units"] += len(targets)
+        self.dedup_stats["unique"] += len(groups)
+        members = {group[0]: group for group in groups}
+
+        results = [None] * len(targets)
+        started = {}
+        pending = {}
+        next_group = 0
+        completed = 0
+
+        def run(index):
+            started[index] = time.monotonic()
+            contract_name, function_name = targets[index]
+            return self._run_audit(contract_name, function_name, depth, check_impact, slice_context, timeout, journal, job_id)
+
+        def finish(index, result):
+            nonlocal completed
+            Metrics.AUDIT_SECONDS.observe(result.elapsed)
+            # 대표 함수의 결과를 같은 지문의 함수들에 복사하고, 반환하는 결과 그대로 저널에 기록
+            for member in members[index]:
+                contract_name, function_name = targets[member]
+                fingerprint, trace_hash = hashes[member]
+                if member == index:
+                    # 호출자 쪽 timeout 결과에는 trace hash가 없으므로 지문 계산 때의 값을 채움
+                    results[member] = result._replace(fingerprint=fingerprint, trace_hash=result.trace_hash or trace_hash)
+                else:
+                    results[member] = result._replace(
+                        contract_name=contract_name, function_name=function_name, trace_hash=trace_hash,
+                        fingerprint=fingerprint, shared_with=targets[index],
+                    )
+                if journal is not None:
+                    journal.record(job_id, results[member])
+                completed += 1
+                Metrics.AUDIT_COMPLETED.inc(status=results[member].status)
+                Metrics.REGISTRY.mark_completion()
+                if member != index:
+                    Metrics.DEDUP_SHARED.inc()
+                if on_result:
+                    on_result(results[member])
+                if progress_callback:
+                    progress_callback(completed, len(targets), f"{contract_name}::{function_name} {result.status} ({completed}/{len(targets)})")
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        # 여러 작업(AuditService)이 동시에 실행될 수 있어 게이지는 set 대신 증감으로 갱신
+        Metrics.AUDIT_QUEUE_DEPTH.inc(len(groups))
+        try:
+            while next_group < len(groups) or pending:
+                if is_cancelled and is_cancelled():
+                    break
+                while next_group < len(groups) and len(pending) < max_workers:
+                    index = groups[next_group][0]
+                    pending[executor.submit(run, index)] = index
+                    next_group += 1
+                    Metrics.AUDIT_QUEUE_DEPTH.dec()
+                    Metrics.AUDIT_IN_FLIGHT.inc()
+
+                done, _ = wait(pending, timeout=1 if timeout is not None or is_cancelled else None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    Metrics.AUDIT_IN_FLIGHT.dec()
+                    finish(pending.pop(future), future.result())
+
+                if timeout is not None:
+                    now = time.monotonic()
+                    for future, index in list(pending.items()):
+                        if index in started and now - started[index] > timeout:
+                            del pending[future]
+                            Metrics.AUDIT_IN_FLIGHT.dec()
+                            contract_name, function_name = targets[index]
+                            finish(index, AuditResult(contract_name, function_name, "timeout", None, None, None,
+                                                      f"exceeded {timeout}s", now - started[index]))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            Metrics.AUDIT_QUEUE_DEPTH.dec(len(groups) - next_group)
+            Metrics.AUDIT_IN_FLIGHT.dec(len(pending))
+
+        for index, result in enumerate(results):
+            if result is None:
+                contract_name, function_name = targets[index]
+                results[index] = AuditResult(contract_name, function_name, "cancelled", None, None, None, None, 0.0)
+        return results
+
+    def analyze_all_contracts_and_functions(self, check_impact=False, depth=3, max_workers=4, timeout=None,
+                                            journal=None, job_id=None, policy=None, time_budget=None, token_budget=None):
+        """time_budget(초)이나 token_budget을 주면 BudgetScheduler로 위험도 순 실행, 강도 조절, 건너뛰기 (요약은 self.budget_report)"""
+        targets = self.get_audit_targets(policy=policy)
+        if time_budget is not None or token_budget is not None:
+            from BudgetScheduler import BudgetScheduler
+
+            scheduler = BudgetScheduler(self, time_budget, token_budget)
+            results = scheduler.run(targets, depth, check_impact, max_workers=max_workers, journal=journal, job_id=job_id)
+            self.budget_report = scheduler.report
+            return results
+        return self.audit_functions(targets, depth, check_impact, max_workers=max_workers, timeout=timeout,
+                                    journal=journal, job_id=job_id)
+
+    def resume_job(self, journal, job_id=None, max_workers=4, timeout=None, progress_callback=None, is_cancelled=None,
+                   on_result=None):
+        """저널에 기록된 작업(기본: 가장 최근 작업)을 같은 설정으로 이어서 실행"""
+        job_id = job_id or journal.latest_job()
+        if job_id is None:
+            return []
+        params = next(params for _job_id, _, params, _ in journal.list_jobs() if _job_id == job_id)
+        targets = [tuple(target) for target in params["targets"]]
+        return self.audit_functions(
+            targets, params["depth"], params["check_impact"], params["slice_context"], max_workers=max_workers,
+            timeout=timeout, progress_callback=progress_callback, is_cancelled=is_cancelled, journal=journal, job_id=job_id,
+            on_result=on_result,
+        )
+
+    def affected_targets(self, changes, targets, depth=3, check_impact=False):
+        """바뀐 함수 [FunctionChange]를 추적 범위에 포함하는 targets를 targets 순서대로 반환
+
+        각 분석 단위는 호출 그래프에서 max(depth, 1) 홉 이내의 함수를 추적하므로, 바뀐 함수에서
+        역방향으로 같은 홉 수 안에 있는 함수들이 다시 분석할 단위다. check_impact=True 이면
+        바뀐 함수와 같은 상태 변수를 쓰는 함수도 영향 함수로 추적되므로 그 함수들에서도 역방향으로 찾는다.
+        삭제된 함수는 현재 호출 그래프에 없으므로, 그 호출이 이제 연결될 같은 이름의 남은 함수들에서 찾는다
+        (예: 재정의를 지우면 부모 컨트랙트의 함수로 연결됨).
+        """
+        seeds = OrderedDict()
+        for change in changes:
+            if change.kind == "removed" or not self.manager.has_function(change.contract_name, change.function_name):
+                for contract_name, function_name in self.manager.get_call_graph().nodes:
+                    if function_name == change.function_name:
+                        seeds[(contract_name, function_name)] = None
+                continue
+            seeds[(change.contract_name, change.function_name)] = None
+            if check_impact:
+                for state_var in self.manager.get_functions_modified_state_vars(change.contract_name, change.function_name) or []:
+                    for writer in self.manager.get_state_var_writers(change.contract_name, state_var):
+                        seeds[(change.contract_name, writer["Function Name"])] = None
+
+        affected = set(seeds)
+        for contract_name, function_name in seeds:
+            affected.update(self.tracer.trace_callers(contract_name, function_name, max(depth, 1), entry_points_only=False))
+        return [target for target in targets if tuple(target) in affected]
+
+    def audit_incremental(self, journal, changes, base_job_id=None, targets=None, job_id=None, max_workers=4,
+                          timeout=None, progress_callback=None, is_cancelled=None, on_result=None, dedup=True):
+        """이전 작업(기본: 저널의 가장 최근 작업) 대비 바뀐 함수의 영향을 받는 단위만 다시 분석
+
+        나머지 단위는 현재 추적 해시가 이전 결과의 trace_hash와 같을 때만 이전 작업의 완료 결과를 그대로
+        새 작업에 기록하므로(변경 목록이 놓친 재정의 삭제 등도 다시 분석) 새 작업은 다음 증분 분석의
+        기준이 된다. 추적 깊이와 옵션은 이전 작업의 설정을 사용하고, targets를 주지 않으면 이전 작업의
+        대상 중 남아 있는 함수와 새로 추가된 함수를 분석 대상으로 한다. 결과는 targets 순서의 AuditResult 리스트.
+        (이전 작업에 완료 기록이 없는 단위는 영향 여부와 관계없이 분석)
+        """
+        base_job_id = base_job_id or journal.latest_job()
+        jobs = {_job_id: params for _job_id, _, params, _ in journal.list_jobs()}
+        if base_job_id not in jobs:
+            raise ValueError(f"unknown base job: {base_job_id}")
+        params = jobs[base_job_id]
+        depth, check_impact, slice_context = params["depth"], params["check_impact"], params["slice_context"]
+
+        if targets is None:
+            targets = [tuple(target) for target in params["targets"] if self.manager.has_function(*target)]
+            targets.extend(
+                (change.contract_name, change.function_name) for change in changes
+                if change.kind == "added" and self.manager.has_function(change.contract_name, change.function_name)
+            )
+        targets = list(OrderedDict.fromkeys(tuple(target) for target in targets))
+        affected = set(self.affected_targets(changes, targets, depth, check_impact))
+
+        job_id = journal.start_job(job_id, {
+            "targets": targets, "depth": depth, "check_impact": check_impact, "slice_context": slice_context,
+            "base_job": base_job_id,
+        })
+        results = OrderedDict((target, None) for target in targets)
+        to_audit = []
+        stale = 0
+        for contract_name, function_name in targets:
+            completed = None
+            if (contract_name, function_name) not in affected:
+                completed = journal.get_completed(base_job_id, contract_name, function_name)
+            if completed is not None:
+                datas, impacted_function, _ = self._trace_for_audit(
+                    contract_name, function_name, depth, check_impact, slice_context
+                )
+                if completed["trace_hash"] != self._trace_hash(datas, impacted_function):
+                    stale += 1
+                    completed = None
+            if completed is None:
+                to_audit.append((contract_name, function_name))
+                continue
+            result = AuditResult(
+                contract_name, function_name, completed["status"], completed["decision"], completed["keywords"],
+                completed["review"], completed["error"], completed["elapsed"], completed["votes"], completed["trace_hash"],
+            )
+            journal.record(job_id, result)
+            results[(contract_name, function_name)] = result
+            if on_result:
+                on_result(result)
+
+        reused = len(targets) - len(to_audit)
+        self.incremental_stats = {
+            "targets": len(targets), "affected": len(affected), "stale": stale, "reused": reused,
+            "audited": len(to_audit),
+        }
+
+        def report_progress(completed, total, message):
+            if progress_callback:
+                progress_callback(reused + completed, len(targets), message)
+
+        audited = self.audit_functions(
+            to_audit, depth, check_impact, slice_context, max_workers=max_workers, timeout=timeout,
+            progress_callback=report_progress, is_cancelled=is_cancelled, journal=journal, job_id=job_id, dedup=dedup,
+            on_result=on_result,
+        )
+        for result in audited:
+            results[(result.contract_name, result.function_name)] = result
+        return list(results.values())
+
+
+
+
+
+# CLI 종료 코드
+EXIT_OK = 0           # 취약점 없음
+EXIT_FINDINGS = 1     # 하나 이상 vulnerable
+EXIT_USAGE = 2        # 잘못된 인자 / 입력 파일 없음 / 알 수 없는 컨트랙트 / 분석 대상 없음
+EXIT_INCOMPLETE = 3   # 취약점은 없지만 timeout/error/cancelled 단위가 있음
+
+
+def expand_contract_paths(patterns):
+    """파일, 디렉터리(하위 .sol 전체), glob 패턴을 중복 없는 .sol 경로 목록으로 확장"""
+    import glob
+
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.sol")
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            if os.path.isfile(path) and path.endswith(".sol"):
+                paths.append(path)
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+def build_arg_parser():
+    import argparse
+    from SelectionPolicy import POLICIES
+
+    parser = argparse.ArgumentParser(prog="Client.py", description="Headless smart contract audit (results as JSONL)")
+    parser.add_argument("paths", nargs="+", help=".sol files, directories or glob patterns (e.g. 'contracts/**/*.sol')")
+    parser.add_argument("--depth", type=int, default=3, help="trace depth (default: 3)")
+    parser.add_argument("--impact", action="store_true", help="include functions impacted through modified state variables")
+    parser.add_argument("--slice", action="store_true", help="slice traced context to state-variable data flow")
+    parser.add_argument("--endpoint", action="append", default=[],
+                        help="LLM API host or full completions URL; repeat to spread requests over several servers")
+    parser.add_argument("--model", default="deepseek-r1-distill-qwen-32b")
+    parser.add_argument("--max-tokens", type=int, default=50000)
+    parser.add_argument("--temperature", type=float, default=0.8)
+    parser.add_argument("--top-p", type=float, default=0.5)
+    parser.add_argument("--samples", type=int, default=5, help="self-consistency samples per decision")
+    parser.add_argument("--max-attempts", type=int, default=4,
+                        help="tries per LLM request, with jittered exponential backoff between them (default: 4)")
+    parser.add_argument("-j", "--concurrency", type=int, default=4, help="functions in flight at once (default: 4)")
+    parser.add_argument("--timeout", type=float, default=None, help="per-function time limit in seconds")
+    parser.add_argument("--filter", choices=list(POLICIES), default="all", help="function selection policy (default: all)")
+    parser.add_argument("--contract", action="append", default=[], help="only audit this contract (repeatable)")
+    parser.add_argument("--no-dedup", action="store_true", help="audit every function even if its traced bundle is identical")
+    parser.add_argument("--time-budget", type=float, help="finish within this many seconds (riskiest functions first, "
+                                                          "fewer samples / shallower traces when behind, skip the rest)")
+    parser.add_argument("--token-budget", type=int, help="spend at most this many prompt + completion tokens")
+    parser.add_argument("--store", help="also record results in this indexed results database (see ResultStore.py)")
+    parser.add_argument("--journal", help="SQLite job journal path (enables checkpointing)")
+    parser.add_argument("--job-id", help="job id in the journal (default: new job)")
+    parser.add_argument("--resume", action="store_true", help="resume --job-id (or the latest job) from --journal")
+    parser.add_argument("--base", help="incremental: re-audit only functions affected by changes since this git revision")
+    parser.add_argument("--head", help="incremental: compare --base with this revision instead of the working tree")
+    parser.add_argument("--changed", action="append", default=[],
+                        help="incremental: treat every function in this .sol file as changed (repeatable)")
+    parser.add_argument("--base-job", help="incremental: journal job to reuse results from (default: latest job)")
+    parser.add_argument("--profile", help="record timing spans and write them here in Chrome trace-event format "
+                                          "(a per-stage summary table goes to stderr)")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics during the run")
+    parser.add_argument("--dry-run", action="store_true", help="print the selection report as JSON and exit without LLM calls")
+    parser.add_argument("-o", "--output", help="write JSONL here instead of stdout")
+    return parser
+
+
+def _result_to_json(result):
+    return json.dumps(result._asdict(), ensure_ascii=False, default=str)
+
+
+def main(argv=None):
+    import contextlib
+    import sys
+
+    args = build_arg_parser().parse_args(argv)
+    paths = expand_contract_paths(args.paths)
+    if not paths:
+        print("no .sol files matched", file=sys.stderr)
+        return EXIT_USAGE
+    if args.resume and not args.journal:
+        print("--resume requires --journal", file=sys.stderr)
+        return EXIT_USAGE
+    incremental = bool(args.base or args.changed)
+    if incremental and not args.journal:
+        print("--base/--changed require --journal with a previous job", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.profile:
+        Profiler.enable()
+    if args.metrics_port:
+        Metrics.serve(port=args.metrics_port)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        # 분석 중 진단 출력(print)은 stderr로 보내 stdout에는 JSONL만 남김
+        with contextlib.redirect_stdout(sys.stderr):
+            client = Client()
+            auditor = client.auditor
+            auditor.model = args.model
+            auditor.set_context_length(args.max_tokens)
+            auditor.set_temperature(args.temperature)
+            auditor.set_top_p(args.top_p)
+            auditor.set_num_samples(args.samples)
+            auditor.set_max_attempts(args.max_attempts)
+            if args.endpoint:
+                client.set_endpoints(args.endpoint)
+
+            client.load_contracts(paths)
+            unknown = [name for name in args.contract if name not in client.manager.get_contract_names()]
+            if unknown:
+                print(f"unknown contract: {', '.join(unknown)}", file=sys.stderr)
+                return EXIT_USAGE
+
+            if args.dry_run:
+                report = client.selection_report(args.contract or None, policy=args.filter)
+                report["skipped_functions"] = {
+                    reason: [f"{contract}::{function}" for contract, function in functions]
+                    for reason, functions in report["skipped_functions"].items()
+                }
+                output.write(json.dumps(report, ensure_ascii=False) + "\n")
+                return EXIT_OK
+
+            targets = None
+            if not args.resume:
+                targets = client.get_audit_targets(args.contract or None, policy=args.filter)
+                if not targets:
+                    # CI 설정의 오타 등으로 아무것도 분석하지 않고 통과하지 않도록
+                    print(f"no functions selected (filter: {args.filter})", file=sys.stderr)
+                    return EXIT_USAGE
+
+            store = None
+            if args.store:
+                from ResultStore import ResultStore
+
+                store = ResultStore(args.store)
+                run_id = store.start_run(params={"paths": paths, "depth": args.depth, "policy": args.filter})
+
+            def write_result(result):
+                output.write(_result_to_json(result) + "\n")
+                output.flush()
+                if store is not None:
+                    store.add(run_id, result)
+
+            journal = AuditJournal(args.journal) if args.journal else None
+            try:
+                if incremental:
+                    from ChangeDetector import detect_git_changes, detect_file_changes
+
+                    try:
+                        unmatched = [pattern for pattern in args.changed if not expand_contract_paths([pattern])]
+                        if unmatched:
+                            raise ValueError(f"--changed matched no .sol files: {', '.join(unmatched)}")
+                        changes = detect_file_changes(expand_contract_paths(args.changed))
+                        if args.base:
+                            changes += detect_git_changes(args.base, args.head, os.path.dirname(paths[0]))
+                        results = client.audit_incremental(
+                            journal, changes, args.base_job, targets,
+                            job_id=args.job_id, max_workers=args.concurrency, timeout=args.timeout, on_result=write_result,
+                            dedup=not args.no_dedup,
+                        )
+                    except ValueError as e:
+                        print(e, file=sys.stderr)
+                        return EXIT_USAGE
+                    print(f"incremental: {client.incremental_stats}")
+                elif args.resume:
+                    results = client.resume_job(
+                        journal, args.job_id, max_workers=args.concurrency, timeout=args.timeout, on_result=write_result,
+                    )
+                elif args.time_budget is not None or args.token_budget is not None:
+                    from BudgetScheduler import BudgetScheduler, format_budget_report
+
+                    scheduler = BudgetScheduler(client, args.time_budget, args.token_budget)
+                    results = scheduler.run(
+                        targets,
+                        args.depth, args.impact, args.slice, max_workers=args.concurrency, journal=journal,
+                        job_id=args.job_id, on_result=write_result,
+                    )
+                    print(format_budget_report(scheduler.report))
+                else:
+                    results = client.audit_functions(
+                        targets, args.depth, args.impact, args.slice,
+                        max_workers=args.concurrency, timeout=args.timeout, journal=journal, job_id=args.job_id,
+                        dedup=not args.no_dedup, on_result=write_result,
+                    )
+            finally:
+                if journal is not None:
+                    journal.close()
+                if store is not None:
+                    store.close()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if args.profile:
+            Profiler.export_chrome_trace(args.profile)
+            print(Profiler.format_summary(), file=sys.stderr)
+
+    statuses = {result.status for result in results}
+    if "vulnerable" in statuses:
+        return EXIT_FINDINGS
+    if statuses - {"secure"}:
+        return EXIT_INCOMPLETE
+    return EXIT_OK
 
 
 if __name__ == "__main__":
-    # main()
-    client = Client()
-    client.load_contracts(["LiquidRon.sol", "RonHelper.sol", "LiquidProxy.sol", "ValidatorTracker.sol", "Escrow.sol"])
-    client.analyze_all_contracts_and_functions()
+    import sys
+
+    sys.exit(main())
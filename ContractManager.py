@@ -1,44 +1,377 @@
 from utils import *
+from CallGraph import CallGraph, EDGE_INTERNAL, EDGE_EXTERNAL, EDGE_VIEW_PURE
+import Profiler
 import os
+import threading
+from collections import OrderedDict
 from pprint import pprint
 
 class ContractManager:
-    def __init__(self):
+    def __init__(self, lazy=False, cache_size=64, info_dir=None):
         self.contract_paths = []
         self.contract_names = []
-        self.contracts_info = dict()
+        # 파싱한 컨트랙트 JSON(<name>_info.json)을 저장할 디렉터리 (None이면 현재 작업 디렉터리)
+        self.info_dir = info_dir
+        # lazy=True 이면 컨트랙트 레코드를 첫 접근 시 JSON에서 읽고 LRU로 최대 cache_size개만 유지
+        self.lazy = lazy
+        if lazy and cache_size < 1:
+            # 방금 적재한 레코드를 곧바로 방출해 조회가 실패하므로 최소 1개는 유지해야 함
+            raise ValueError(f"cache_size must be at least 1, got {cache_size}")
+        self.cache_size = cache_size
+        self.contracts_info = OrderedDict()
+        # 지연 로딩 모드에서 여러 분석 스레드가 공유할 때 LRU 적재/방출과 조회 사이의 경합 방지
+        self._lock = threading.RLock()
+        # contract_name -> {function_name: [function records]}  (contracts_info와 함께 로드/해제)
+        self._function_index = dict()
+        # contract_name -> {modifier_name: modifier code}  (contracts_info와 함께 로드/해제)
+        self._modifier_index = dict()
+        # 아래 인덱스는 이름만 담고 있어 항상 메모리에 유지
+        # contract_name -> {function_name: overload count}  (선언 순서, 멤버십 검사용)
+        self._function_names = dict()
+        # contract_name -> [modifier names]
+        self._modifier_names = dict()
+        # contract_name -> {state_var: [(function name, overload index) that write it]}
+        self._state_var_writers = dict()
+        # contract_name -> {function_name: (internal calls, external calls, view/pure calls,
+        #                                   external calls by receiver, typed variables)}
+        # 호출 그래프를 만들 때만 필요하므로 그래프 생성 후 비우고, 다시 만들 때 컨트랙트 정보에서 읽음
+        self._function_calls = dict()
+        # contract_name -> {function_name: set of visibilities of its overloads}
+        self._function_visibility = dict()
+        # contract_name -> {function_name: [{"Visibility", "Mutability", "Attached Modifiers", "Has Body"} per overload]}
+        self._function_attributes = dict()
+        # contract_name -> {"Inherits", "Imports", "Using For", "Typed Variables"}
+        self._type_info = dict()
+        # 프로젝트 전체 호출 그래프와 타입 -> 구현 컨트랙트 인덱스 (컨트랙트가 추가/재로딩되면 다시 생성)
+        self._call_graph = None
+        self._implementations = None
         # self.initial_save(self.contract_paths)
         # self.load_contracts_info()
 
     def initial_save(self, contract_paths):
         for contract_path in contract_paths:
-            with open(contract_path, "r") as f:
-                contract_code = f.read()
-            functions, global_value, contract_name = initial_separate(contract_code)
-            self.contract_names.append(contract_name)
-            save_to_json(contract_name, global_value, functions)
+            if contract_path not in self.contract_paths:
+                self.contract_paths.append(contract_path)
+            with Profiler.span("parse", path=contract_path) as span:
+                with open(contract_path, "r") as f:
+                    contract_code = f.read()
+                functions, global_value, contract_name = initial_separate(contract_code)
+                if contract_name not in self.contract_names:
+                    self.contract_names.append(contract_name)
+                type_info = extract_type_info(contract_code, contract_name)
+                save_to_json(contract_name, global_value, functions, type_info, self.info_dir)
+                span.set(contract=contract_name, chars=len(contract_code), chunks=len(functions))
 
     def load_contracts_info(self):
-        for contract_name in self.contract_names:
-            self.contracts_info[contract_name] = load_from_json(contract_name)
+        with Profiler.span("load", contracts=len(self.contract_names)):
+            for contract_name in self.contract_names:
+                self.add_contract(contract_name, load_from_json(contract_name, self.info_dir))
+            with Profiler.span("call_graph"):
+                self.get_call_graph()
+
+    def add_contract(self, contract_name, contract_info):
+        """컨트랙트 정보를 등록하고 조회용 인덱스를 갱신"""
+        if contract_name not in self.contract_names:
+            self.contract_names.append(contract_name)
+        self._index_names(contract_name, contract_info)
+        self._unload_contract(contract_name)
+        if not self.lazy:
+            self._store_contract(contract_name, contract_info)
+        self._call_graph = None
+        self._implementations = None
+
+    def _index_names(self, contract_name, contract_info):
+        # 재로딩 시 이전 인덱스를 통째로 교체
+        self._function_names.pop(contract_name, None)
+        self._modifier_names.pop(contract_name, None)
+        self._state_var_writers.pop(contract_name, None)
+        self._function_calls.pop(contract_name, None)
+        self._type_info.pop(contract_name, None)
+        self._function_visibility.pop(contract_name, None)
+        self._function_attributes.pop(contract_name, None)
+        if not contract_info:
+            return
+
+        overloads = {}
+        writers = {}
+        visibility = {}
+        attributes = {}
+        for function in contract_info["Functions"]:
+            function_name = function["Function Name"]
+            function_code = function["Function Code"]
+            overload = overloads.get(function_name, 0)
+            overloads[function_name] = overload + 1
+            # 가시성 정보가 없는 이전 형식의 JSON은 이름 규칙(_접두사)으로 추정
+            default_visibility = "internal" if function_name.startswith("_") else "public"
+            visibility.setdefault(function_name, set()).add(function.get("Visibility", default_visibility))
+            # 나머지 속성이 없는 이전 형식의 JSON은 함수 코드에서 다시 파싱
+            attributes.setdefault(function_name, []).append({
+                "Visibility": function.get("Visibility", default_visibility),
+                "Mutability": function.get("Mutability") or parse_function_mutability(function_code),
+                "Attached Modifiers": function["Attached Modifiers"] if "Attached Modifiers" in function
+                                      else parse_function_modifiers(function_code),
+                "Has Body": function["Has Body"] if "Has Body" in function else parse_function_has_body(function_code),
+            })
+            for state_var in set(function["Modified State Variables"]):
+                writers.setdefault(state_var, []).append((function_name, overload))
+
+        self._function_names[contract_name] = overloads
+        self._modifier_names[contract_name] = list(dict.fromkeys(
+            modifier["Modifier Name"] for modifier in contract_info["Modifiers"]
+        ))
+        self._state_var_writers[contract_name] = writers
+        self._function_calls[contract_name] = self._index_calls(contract_info)
+        self._type_info[contract_name] = contract_info.get("Type Info", {})
+        self._function_visibility[contract_name] = visibility
+        self._function_attributes[contract_name] = attributes
+
+    @staticmethod
+    def _index_calls(contract_info):
+        calls = {}
+        for function in contract_info["Functions"]:
+            # 오버로드된 함수의 호출 목록은 하나로 병합
+            function_name = function["Function Name"]
+            internal, external, view_pure, receivers, typed_variables = calls.setdefault(function_name, ([], {}, [], {}, {}))
+            function_calls = function["Function Calls"]
+            internal.extend(function_calls["Internal Functions"])
+            for interface_name, interface_functions in function_calls["External Interface Calls"].items():
+                external.setdefault(interface_name, []).extend(interface_functions)
+            view_pure.extend(function_calls["View/Pure Calls"])
+            # 타입 정보가 없는 이전 형식의 JSON은 receivers가 비어 있어 이름 추측 방식으로 처리
+            for receiver, receiver_functions in function_calls.get("External Call Receivers", {}).items():
+                receivers.setdefault(receiver, []).extend(receiver_functions)
+            typed_variables.update(function.get("Typed Variables", {}))
+        return calls
+
+    def _store_contract(self, contract_name, contract_info):
+        if not contract_info:
+            return
+
+        functions = {}
+        for function in contract_info["Functions"]:
+            functions.setdefault(function["Function Name"], []).append(function)
+
+        modifiers = {}
+        for modifier in contract_info["Modifiers"]:
+            # 기존 선형 탐색과 동일하게 같은 이름 중 첫 번째 수정자를 사용
+            modifiers.setdefault(modifier["Modifier Name"], modifier["Modifier Code"])
+
+        self.contracts_info[contract_name] = contract_info
+        self._function_index[contract_name] = functions
+        self._modifier_index[contract_name] = modifiers
+
+        if self.lazy:
+            while len(self.contracts_info) > self.cache_size:
+                evicted, _ = self.contracts_info.popitem(last=False)
+                self._function_index.pop(evicted, None)
+                self._modifier_index.pop(evicted, None)
+
+    def _unload_contract(self, contract_name):
+        self.contracts_info.pop(contract_name, None)
+        self._function_index.pop(contract_name, None)
+        self._modifier_index.pop(contract_name, None)
+
+    def _ensure_loaded(self, contract_name):
+        if contract_name in self.contracts_info:
+            if self.lazy:
+                self.contracts_info.move_to_end(contract_name)
+            return True
+
+        if not self.lazy or contract_name not in self._function_names:
+            return False
+
+        contract_info = load_from_json(contract_name, self.info_dir)
+        if not contract_info:
+            return False
+        self._store_contract(contract_name, contract_info)
+        return True
     
+    def _get_indexes(self, contract_name):
+        # (함수 인덱스, 수정자 인덱스)를 함께 반환해 조회 도중 LRU에서 방출되어도 안전하게 사용
+        if not self.lazy:
+            # 전체 로딩 모드는 방출이 없어 락 없이 조회
+            return self._function_index.get(contract_name), self._modifier_index.get(contract_name)
+        with self._lock:
+            if not self._ensure_loaded(contract_name):
+                return None, None
+            return self._function_index[contract_name], self._modifier_index[contract_name]
+
     def get_contract_names(self):
         return self.contract_names
+
+    def _get_parents(self, contract_name):
+        return self._type_info.get(contract_name, {}).get("Inherits", [])
+
+    def _get_ancestors(self, contract_name):
+        # 자기 자신부터 시작해 가장 많이 파생된(오른쪽) 부모 순으로 탐색
+        ancestors = []
+        stack = [contract_name]
+        while stack:
+            current = stack.pop()
+            if current in ancestors:
+                continue
+            ancestors.append(current)
+            stack.extend(self._get_parents(current))
+        return ancestors
+
+    def get_implementations(self, type_name):
+        """타입(컨트랙트/인터페이스)을 구현하거나 상속하는 로드된 컨트랙트 목록"""
+        if self._implementations is None:
+            implementations = {}
+            for contract_name in self.contract_names:
+                if contract_name not in self._function_names:
+                    continue
+                for ancestor in self._get_ancestors(contract_name):
+                    implementations.setdefault(ancestor, []).append(contract_name)
+            self._implementations = implementations
+        return self._implementations.get(type_name, [])
+
+    def _find_definition(self, contract_name, function_name):
+        for ancestor in self._get_ancestors(contract_name):
+            if self.has_function(ancestor, function_name):
+                return ancestor
+        return None
+
+    def _lookup_variable_type(self, contract_name, function_name, variable):
+        calls = self._function_calls.get(contract_name)
+        if calls is not None:
+            typed_variables = calls.get(function_name, (None,) * 5)[4]
+        else:
+            # 그래프 생성 밖에서 호출된 경우 함수 레코드에서 직접 조회
+            functions, _ = self._get_indexes(contract_name)
+            typed_variables = {}
+            for function in (functions or {}).get(function_name, []):
+                typed_variables.update(function.get("Typed Variables", {}))
+        if typed_variables and variable in typed_variables:
+            return typed_variables[variable]
+
+        for ancestor in self._get_ancestors(contract_name):
+            state_variables = self._type_info.get(ancestor, {}).get("Typed Variables", {})
+            if variable in state_variables:
+                return state_variables[variable]
+        return None
+
+    def resolve_external_call(self, contract_name, function_name, receiver, callee):
+        """수신자 표현식의 선언 타입과 상속 관계로 외부 호출 callee가 정의된 컨트랙트 목록을 반환"""
+        if receiver == "this":
+            definition = self._find_definition(contract_name, callee)
+            return [definition] if definition else []
+
+        if receiver == "super":
+            for parent in reversed(self._get_parents(contract_name)):
+                definition = self._find_definition(parent, callee)
+                if definition:
+                    return [definition]
+            return []
+
+        type_name = self._lookup_variable_type(contract_name, function_name, receiver)
+        if type_name is None:
+            if receiver[0] not in string.ascii_uppercase:
+                # 기본 타입(uint256 등) 수신자는 using-for 라이브러리에서 먼저 찾음
+                using_for = self._type_info.get(contract_name, {}).get("Using For", {})
+                libraries = [
+                    library
+                    for libraries in using_for.values()
+                    for library in libraries
+                    if self.has_function(library, callee)
+                ]
+                if libraries:
+                    return list(dict.fromkeys(libraries))
+                # 선언을 찾지 못한 수신자는 기존 이름 추측 방식으로 처리
+                return self._guess_contract(receiver, callee)
+            # IERC20(token).transfer(...) 또는 Library.call(...) 형태
+            type_name = receiver
+
+        targets = []
+        for implementation in self.get_implementations(type_name):
+            definition = self._find_definition(implementation, callee)
+            if definition and definition not in targets:
+                targets.append(definition)
+
+        if not targets:
+            # using Library for Type; 로 연결된 라이브러리 함수
+            using_for = self._type_info.get(contract_name, {}).get("Using For", {})
+            for library in using_for.get(type_name, []) + using_for.get("*", []):
+                if self.has_function(library, callee) and library not in targets:
+                    targets.append(library)
+
+        if not targets:
+            # IToken 타입이지만 is IToken으로 선언한 컨트랙트가 로드되지 않은 경우: 이름 추측(IToken -> Token)
+            targets = self._guess_contract(type_name, callee)
+
+        if len(targets) > 1:
+            # 구현체가 여러 개면 현재 컨트랙트가 import한 것을 우선
+            imports = set(self._type_info.get(contract_name, {}).get("Imports", []))
+            imported = [target for target in targets if target in imports]
+            if imported:
+                targets = imported
+
+        return targets
+
+    def _guess_contract(self, name, callee):
+        # 기존 이름 추측: 첫 글자를 대문자로, 인터페이스 접두사 I는 제거
+        guess = name[0].upper() + name[1:]
+        guess = guess[1:] if guess[0] == 'I' else guess
+        return [guess] if self.has_function(guess, callee) else []
+
+    def _resolve_callees(self, contract_name, function_name):
+        calls = self._function_calls[contract_name].get(function_name)
+        if calls is None:
+            return
+        internal, external, view_pure, receivers, _ = calls
+
+        for callee in internal:
+            yield contract_name, callee, EDGE_INTERNAL
+
+        if receivers:
+            for receiver, callees in receivers.items():
+                for callee in callees:
+                    for _contract_name in self.resolve_external_call(contract_name, function_name, receiver, callee):
+                        yield _contract_name, callee, EDGE_EXTERNAL
+        else:
+            for interface_name, callees in external.items():
+                _contract_name = interface_name[1:] if interface_name[0] == 'I' else interface_name
+                for callee in callees:
+                    yield _contract_name, callee, EDGE_EXTERNAL
+
+        for callee in view_pure:
+            yield contract_name, callee, EDGE_VIEW_PURE
+
+    def get_call_graph(self):
+        if self._call_graph is None:
+            with self._lock:
+                if self._call_graph is None:
+                    for contract_name in self._function_names:
+                        if contract_name not in self._function_calls:
+                            contract_info = self._read_contract_info(contract_name)
+                            self._function_calls[contract_name] = self._index_calls(contract_info) if contract_info else {}
+                    self._call_graph = CallGraph.build(self._function_names, self._resolve_callees)
+                    self._function_calls.clear()
+        return self._call_graph
+
+    def _read_contract_info(self, contract_name):
+        # 지연 로딩 모드에서는 LRU를 건드리지 않도록 JSON을 직접 읽음
+        if self.lazy:
+            return load_from_json(contract_name, self.info_dir)
+        return self.contracts_info.get(contract_name)
     
     def get_contract_info(self, contract_name):
-        return self.contracts_info.get(contract_name, None)
+        with self._lock:
+            if not self._ensure_loaded(contract_name):
+                return None
+            return self.contracts_info[contract_name]
 
     def _select_contract_function(self, contract_name, function_name):
-        contract_info = self.get_contract_info(contract_name)
-        if not contract_info:
+        if not self.has_function(contract_name, function_name):
 
             return None
 
-        matching_functions = [
-            function
-            for function in contract_info["Functions"]
-            if function["Function Name"] == function_name
-        ]
+        functions, _ = self._get_indexes(contract_name)
+        if not functions:
+
+            return None
+
+        matching_functions = functions.get(function_name)
 
         if not matching_functions:
 
@@ -46,6 +379,10 @@ class ContractManager:
 
         return matching_functions  # 여러 개의 함수 코드가 있을 수 있으므로 리스트로 반환
 
+    def has_function(self, contract_name, function_name):
+        function_names = self._function_names.get(contract_name)
+        return function_names is not None and function_name in function_names
+
     def get_function_code(self, contract_name, function_name):
         functions = self._select_contract_function(contract_name, function_name)
         if not functions:
@@ -110,16 +447,21 @@ class ContractManager:
 
         return modified_state_vars[0]
     
+    def is_entry_point(self, contract_name, function_name):
+        """외부에서 직접 호출할 수 있는(public/external) 함수인지 여부"""
+        visibility = self._function_visibility.get(contract_name, {}).get(function_name, ())
+        return "public" in visibility or "external" in visibility
+
+    def get_function_attributes(self, contract_name, function_name):
+        """오버로드별 선언 속성 [{"Visibility", "Mutability", "Attached Modifiers", "Has Body"}] (지연 로딩과 무관하게 상주)"""
+        return self._function_attributes.get(contract_name, {}).get(function_name, [])
+
     def get_function_names(self, contract_name):
-        contract_info = self.get_contract_info(contract_name)
-        if not contract_info:
+        """선언 순서의 함수 이름 리스트 (오버로드는 한 번만, 내부 인덱스와 분리된 복사본)"""
+        function_names = self._function_names.get(contract_name)
+        if function_names is None:
             return None
-        
-        function_names = [
-            function["Function Name"]
-            for function in contract_info["Functions"]
-        ]
-        return function_names
+        return list(function_names)
     
     def get_all_modifier_function(self):
         modifier_functions = []
@@ -138,57 +480,84 @@ class ContractManager:
     
 
     def get_contract_modifier_functions(self, contract_name):
-        contract_info = self.get_contract_info(contract_name)
-        if not contract_info:
+        modifier_names = self._modifier_names.get(contract_name)
+        if modifier_names is None:
             return None
         
-        modifier_functions = [
-            function["Modifier Name"]
-            for function in contract_info["Modifiers"]
-        ]
-        return modifier_functions
+        return list(modifier_names)
     
     def get_modifier_code(self, contract_name, modifier_name):
-        contract_info = self.get_contract_info(contract_name)
-        
-        if not contract_info:
+        if not modifier_name or modifier_name[0] not in self._modifier_names.get(contract_name, ()):
             return None
-        
-
-        matching_modifiers = [
-            modifier
-            for modifier in contract_info["Modifiers"]
-            if modifier["Modifier Name"] == modifier_name[0]
-        ]
 
-        if not matching_modifiers:
+        _, modifiers = self._get_indexes(contract_name)
+        if modifiers is None:
             return None
-        
-        modifier_code = matching_modifiers[0]["Modifier Code"]
-        return modifier_code
 
+        return modifiers.get(modifier_name[0])
 
-    def get_impacted_modified_state_vars(self, contract_and_state_vars: dict):
-        # find all contract function that impacted by modified state_vars
 
-        impacted_modified_state_vars = {}
+    def get_state_var_writers(self, contract_name, state_var):
+        writers = self._state_var_writers.get(contract_name, {}).get(state_var, [])
+        if not writers:
+            return []
+
+        functions, _ = self._get_indexes(contract_name)
+        if functions is None:
+            return []
+        return [functions[function_name][overload] for function_name, overload in writers]
+
+    def get_function_code_by_id(self, function_id):
+        """함수 ID (contract, function, overload index)로 코드 조회"""
+        contract_name, function_name, overload = function_id
+        functions, _ = self._get_indexes(contract_name)
+        if functions is None:
+            return None
+        functions = functions.get(function_name)
+        if not functions or overload >= len(functions):
+            return None
+        return functions[overload]["Function Code"]
 
+    def get_impacted_functions(self, contract_and_state_vars: dict):
+        """수정된 상태 변수를 쓰는 함수의 [(함수 ID, 코드)] 목록 (중복 없이 순서 유지)"""
+        impacted = []
         for contract_name in contract_and_state_vars:
-            contract_info = self.get_contract_info(contract_name)
-            if not contract_info:
+            writers = self._state_var_writers.get(contract_name)
+            if not writers:
                 continue
 
+            # 여러 상태 변수를 수정하는 함수가 중복 추가되지 않도록 처리
+            seen = dict()
             for state_var in contract_and_state_vars[contract_name]:
-                for function in contract_info["Functions"]:
-                    if state_var in function["Modified State Variables"]:
-                        if contract_name not in impacted_modified_state_vars:
-                            impacted_modified_state_vars[contract_name] = []
-                        impacted_modified_state_vars[contract_name].append(function["Function Code"])
+                for writer in writers.get(state_var, ()):
+                    seen[writer] = None
+
+            if not seen:
+                continue
+
+            functions, _ = self._get_indexes(contract_name)
+            if functions is None:
+                continue
+            for function_name, overload in seen:
+                impacted.append((
+                    (contract_name, function_name, overload),
+                    functions[function_name][overload]["Function Code"],
+                ))
+
+        return impacted
+
+    def get_impacted_modified_state_vars(self, contract_and_state_vars: dict):
+        # find all contract function that impacted by modified state_vars
+        # 역색인을 사용하므로 결과 크기에 비례하는 시간만 소요
+
+        impacted_modified_state_vars = {}
+
+        for function_id, function_code in self.get_impacted_functions(contract_and_state_vars):
+            impacted_modified_state_vars.setdefault(function_id[0], []).append(function_code)
         
         return impacted_modified_state_vars
 
 
-
 if __name__ == "__main__":
     contract_paths = ["test.sol"]
     contract_manager = ContractManager()
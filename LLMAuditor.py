@@ -1,8 +1,12 @@
-import requests
 import json
 import collections
 import re
-from reportvectordb import ReportVectorDB
+import copy
+import threading
+import time
+import Profiler
+import Metrics
+from RequestExecutor import LLMRequestError, RetryPolicy, STAGE_DEADLINES, post_completion, stage_deadline
 
 class LLMAuditor:
     def __init__(self, api_ip="localhost", model="DeepSeek-R1-Distill-Llama-32B",
@@ -19,11 +23,69 @@ class LLMAuditor:
                 "content": "You are a senior smart contract security auditor with extensive experience in Code4rena contest audits. Do not analyze Reentrancy, Race Conditions, or Integer Overflow/Underflow."
             }
         ]
-        self.vector_db = ReportVectorDB(reports_dir="reports", chunk_size=5000)
+        # 임베딩 모델/ChromaDB 로딩은 느리므로 첫 프롬프트 생성 시점까지 미룸 (CLI --help, --dry-run 빠른 시작)
+        # with_endpoint로 만든 복제본과 같은 보관소를 공유해 벡터 DB는 한 번만 로딩
+        self._vector_db_holder = {"vector_db": None, "lock": threading.Lock()}
+        # 요청 수, 토큰 사용량, 요청 시간 누적 (with_endpoint 복제본과 공유, BudgetScheduler의 비용 추정에 사용)
+        self._usage = {"lock": threading.Lock(), "requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+        # 요청별 (프롬프트 토큰 p, 생성 토큰 c, 시간 s)의 곱의 합: s = p / prefill + c / decode 최소제곱 보정용
+        self._usage.update({"prompt_sq": 0, "prompt_completion": 0, "completion_sq": 0,
+                            "prompt_seconds": 0.0, "completion_seconds": 0.0})
+        # 실패한 요청의 재시도 간격/횟수와 단계별 제한 시간 (서버별 회로 차단기는 RequestExecutor가 관리)
+        self.retry_policy = RetryPolicy()
+        self.stage_deadlines = dict(STAGE_DEADLINES)
         # self.vector_db.store_to_vector_db()
 
+    @property
+    def vector_db(self):
+        holder = self._vector_db_holder
+        if holder["vector_db"] is None:
+            with holder["lock"]:
+                if holder["vector_db"] is None:
+                    from reportvectordb import ReportVectorDB
+                    with Profiler.span("vector_db.load"):
+                        holder["vector_db"] = ReportVectorDB(reports_dir="reports", chunk_size=5000)
+        return holder["vector_db"]
+
+    def get_usage(self):
+        """누적 사용량 {"requests", "prompt_tokens", "completion_tokens", "seconds"} (+ 요청별 곱의 합 "prompt_sq" 등)"""
+        with self._usage["lock"]:
+            return {key: value for key, value in self._usage.items() if key != "lock"}
+
+    def _record_usage(self, prompt, response_json, response_text, elapsed, stage):
+        # 서버가 usage를 주지 않으면 글자 수로 추정 (약 4글자당 1토큰)
+        usage = response_json.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens") or len(prompt) // 4
+        completion_tokens = usage.get("completion_tokens") or len(response_text) // 4
+        with self._usage["lock"]:
+            self._usage["requests"] += 1
+            self._usage["prompt_tokens"] += prompt_tokens
+            self._usage["completion_tokens"] += completion_tokens
+            self._usage["seconds"] += elapsed
+            self._usage["prompt_sq"] += prompt_tokens * prompt_tokens
+            self._usage["prompt_completion"] += prompt_tokens * completion_tokens
+            self._usage["completion_sq"] += completion_tokens * completion_tokens
+            self._usage["prompt_seconds"] += prompt_tokens * elapsed
+            self._usage["completion_seconds"] += completion_tokens * elapsed
+        Metrics.LLM_REQUESTS.inc(stage=stage, outcome="ok")
+        Metrics.LLM_REQUEST_SECONDS.observe(elapsed, stage=stage)
+        Metrics.LLM_TOKENS.inc(prompt_tokens, stage=stage, kind="prompt")
+        Metrics.LLM_TOKENS.inc(completion_tokens, stage=stage, kind="completion")
+        Metrics.LLM_COMPLETION_TOKENS.observe(completion_tokens, stage=stage)
+        return prompt_tokens, completion_tokens
+
+    def with_endpoint(self, api_ip):
+        """같은 설정과 벡터 DB를 공유하고 다른 API 서버로 요청하는 복제본"""
+        auditor = copy.copy(self)
+        auditor.set_api_ip(api_ip)
+        return auditor
+
     def set_api_ip(self, api_ip):
-        self.api_url = f"http://{api_ip}:1234/v1/completions"
+        # "host" 또는 전체 URL("http://host:port/v1/completions") 모두 허용
+        if "://" in api_ip:
+            self.api_url = api_ip
+        else:
+            self.api_url = f"http://{api_ip}:1234/v1/completions"
 
     def set_context_length(self, max_tokens):
         self.max_tokens = max_tokens
@@ -37,7 +99,19 @@ class LLMAuditor:
     def set_num_samples(self, num_samples):
         self.num_samples = num_samples
 
+    def set_max_attempts(self, max_attempts):
+        self.retry_policy = RetryPolicy(max_attempts, self.retry_policy.base_delay, self.retry_policy.max_delay)
+
+    def set_stage_deadline(self, stage, seconds):
+        self.stage_deadlines = dict(self.stage_deadlines, **{stage: seconds})
+
     def formatting_datas(self, datas, impacted_functions=None):
+        with Profiler.span("prompt.format") as span:
+            formatted = self._formatting_datas(datas, impacted_functions)
+            span.set(prompt_chars=len(formatted))
+        return formatted
+
+    def _formatting_datas(self, datas, impacted_functions=None):
         
         # enumerate loop using dict
         formatted = ""
@@ -226,14 +300,23 @@ Result: Secure
     # def decision_vuln(self, contracts, modifiers):
     def decision_vuln(self, contracts, impacted_functions=None):
         """ 여러 개의 스마트 컨트랙트 최상위 함수 분석 + Self-Consistency 적용 """
+        decision, keywords, _ = self.decision_vuln_with_votes(contracts, impacted_functions)
+        return decision, keywords
+
+    def decision_vuln_with_votes(self, contracts, impacted_functions=None):
+        """ decision_vuln과 같고 샘플별 판정 집계 {decision: count}를 함께 반환 """
         decisions = []
         keywords = []
 
-        prompt = self.decision_prompt(self.formatting_datas(contracts, impacted_functions))
+        with Profiler.span("prompt.build", stage="decision") as span:
+            prompt = self.decision_prompt(self.formatting_datas(contracts, impacted_functions))
+            span.set(prompt_chars=len(prompt))
         threshold = (self.num_samples // 2) + 1
         print("Prompt: ", prompt)
-        
-        for _ in range(self.num_samples):
+        deadline = stage_deadline("decision", self.stage_deadlines)
+        last_error = None
+
+        for sample in range(self.num_samples):
             try:
                 payload = {
                     "messages": self.messages,
@@ -244,8 +327,16 @@ Result: Secure
                     "top_p": self.top_p,
                     "stop": None
                 }
-                response = requests.post(self.api_url, json=payload, timeout=60*5)
-                response_text = response.json()["choices"][0]["text"].strip()
+                started = time.monotonic()
+                with Profiler.span("llm.decision", sample=sample, prompt_chars=len(prompt)) as span:
+                    _, response_json = post_completion(
+                        self.api_url, payload, "decision", self.retry_policy, deadline
+                    )
+                    response_text = response_json["choices"][0]["text"].strip()
+                    prompt_tokens, completion_tokens = self._record_usage(
+                        prompt, response_json, response_text, time.monotonic() - started, "decision"
+                    )
+                    span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
                 
                 # decision = self._parse_results(response_text)
                 decision_result = self._parse_decision(response_text)
@@ -257,7 +348,7 @@ Result: Secure
 
                 # if "Secure" length is threshold, return Secure
                 if decisions.count("Secure") >= threshold:
-                    return "Secure", keywords
+                    return "Secure", keywords, dict(collections.Counter(decisions))
 
                 print("Decision: ", decision_result)
                 print("Keywords: ", _keywords)
@@ -269,11 +360,20 @@ Result: Secure
                 #     print(f"Threshold reached with decision: {most_common_decision}")
                 #     return most_common_decision, keywords
             
+            except LLMRequestError as e:
+                # 재시도를 다 쓴 샘플은 버리고, 단계 제한 시간을 넘겼으면 남은 샘플도 보내지 않음
+                print("Error: ", e)
+                last_error = e
+                if time.monotonic() >= deadline:
+                    break
             except Exception as e:
                 print("Error: ", e)
 
+        if not decisions:
+            raise LLMRequestError(f"no decision sample succeeded: {last_error}")
         # 최종 결과 반환 시 keywords 리스트에서 None 값 제거
-        return collections.Counter(decisions).most_common(1)[0][0], keywords
+        votes = collections.Counter(decisions)
+        return votes.most_common(1)[0][0], keywords, dict(votes)
     
     # def review_prompt(self, contracts, modifiers, result):
 
@@ -397,32 +497,32 @@ Ensure that your final report is **accurate and based on real security risks**.
 
 
     def review_vulnerabilities(self, contracts, impacted_functions, result):
-        """ 리뷰 """
-        try:
+        """ 리뷰 (재시도 후에도 실패하면 LLMRequestError) """
+        with Profiler.span("prompt.build", stage="review") as span:
             prompt = self.review_prompt(contracts, impacted_functions, result)
-            responses = []
-
-            payload = {
-                "messages": self.messages,
-                "model": self.model,
-                "prompt": prompt,
-                "max_tokens": self.max_tokens,
-                "temperature": self.temperature,
-                "top_p": self.top_p,
-                "stop": None
-            }
-            response = requests.post(self.api_url, json=payload)
-            response.raise_for_status()
-            result = response.json()["choices"][0]["text"].strip()
-
-            return result
-        except Exception as e:
-            # recall this function
-            print("Error: ", e)
-
-
-            return self.review_vulnerabilities(contracts, impacted_functions, result)
-            
+            span.set(prompt_chars=len(prompt))
+        responses = []
+
+        payload = {
+            "messages": self.messages,
+            "model": self.model,
+            "prompt": prompt,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "stop": None
+        }
+        started = time.monotonic()
+        with Profiler.span("llm.review", prompt_chars=len(prompt)) as span:
+            _, response_json = post_completion(self.api_url, payload, "review", self.retry_policy,
+                                               stage_deadline("review", self.stage_deadlines))
+            result = response_json["choices"][0]["text"].strip()
+            prompt_tokens, completion_tokens = self._record_usage(
+                prompt, response_json, result, time.monotonic() - started, "review"
+            )
+            span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+        return result
 
 
 # 🔹 실행 코드
@@ -0,0 +1,262 @@
+import bisect
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+# LLM 요청은 수 초~수 분, 벡터 검색은 수 ms~수백 ms
+LATENCY_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+TOKEN_BUCKETS = (64, 256, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+
+    def escape(value):
+        return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return {key: value for key, value in self._values.items()}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, value=1, **labels):
+        self.inc(-value, **labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # key -> [버킷별 개수(누적 아님), 합계, 개수]
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((self.name + "_bucket", key, (("le", _format_value(bound)),), cumulative))
+                samples.append((self.name + "_sum", key, (), total))
+                samples.append((self.name + "_count", key, (), count))
+        return samples
+
+    def snapshot(self):
+        """{labels: {"count", "sum", "mean", "p50", "p95"}} (분위수는 버킷 상한으로 근사)"""
+        snapshot = {}
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                snapshot[key] = {
+                    "count": count,
+                    "sum": total,
+                    "mean": total / count if count else 0.0,
+                    "p50": self._quantile(counts, count, 0.5),
+                    "p95": self._quantile(counts, count, 0.95),
+                }
+        return snapshot
+
+    def _quantile(self, counts, count, quantile):
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            if count and cumulative >= quantile * count:
+                return bound
+        return 0.0
+
+
+class Registry:
+    """이름으로 지표를 등록/조회하고 Prometheus 텍스트 형식(render)과 dict(snapshot)로 내보내는 저장소"""
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+        # 완료 시각 (최근 구간 처리율 계산용)
+        self._completions = deque()
+
+    def _get_or_create(self, cls, name, description, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, description, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, description, labelnames=()):
+        return self._get_or_create(Counter, name, description, labelnames)
+
+    def gauge(self, name, description, labelnames=()):
+        return self._get_or_create(Gauge, name, description, labelnames)
+
+    def histogram(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, description, labelnames, buckets=buckets)
+
+    def mark_completion(self, window=300):
+        now = time.monotonic()
+        with self._lock:
+            self._completions.append(now)
+            while self._completions and now - self._completions[0] > window:
+                self._completions.popleft()
+
+    def completion_rate(self, window=60):
+        """최근 window초 동안 초당 완료된 함수 수"""
+        now = time.monotonic()
+        with self._lock:
+            recent = sum(1 for completed_at in self._completions if now - completed_at <= window)
+        return recent / window
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {_format_value(value)}")
+        lines.append("# HELP audit_functions_per_second Functions completed per second over the last minute")
+        lines.append("# TYPE audit_functions_per_second gauge")
+        lines.append(f"audit_functions_per_second {_format_value(self.completion_rate())}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """GUI 등 같은 프로세스에서 읽는 값 {name: {labels: value 또는 histogram 요약}}"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = OrderedDict((metric.name, metric.snapshot()) for metric in metrics)
+        snapshot["audit_functions_per_second"] = {(): self.completion_rate()}
+        return snapshot
+
+
+REGISTRY = Registry()
+
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "llm_request_seconds", "LLM completion request latency", ("stage",)
+)
+LLM_REQUESTS = REGISTRY.counter("llm_requests_total", "LLM completion requests", ("stage", "outcome"))
+LLM_RETRIES = REGISTRY.counter("llm_retries_total", "LLM requests retried after a failure", ("stage",))
+LLM_FAILURES = REGISTRY.counter("llm_request_failures_total", "Failed LLM request attempts", ("stage", "reason"))
+LLM_GIVE_UPS = REGISTRY.counter(
+    "llm_request_give_ups_total", "LLM calls abandoned after retries or deadline", ("stage",)
+)
+LLM_CIRCUIT_STATE = REGISTRY.gauge(
+    "llm_circuit_state", "Circuit breaker state per endpoint (0 closed, 1 half-open, 2 open)", ("endpoint",)
+)
+LLM_CIRCUIT_OPENED = REGISTRY.counter("llm_circuit_opened_total", "Times a circuit breaker opened", ("endpoint",))
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "Prompt and completion tokens", ("stage", "kind"))
+LLM_COMPLETION_TOKENS = REGISTRY.histogram(
+    "llm_completion_tokens", "Tokens generated per request", ("stage",), buckets=TOKEN_BUCKETS
+)
+VECTOR_QUERY_SECONDS = REGISTRY.histogram(
+    "vector_query_seconds", "Report retrieval latency", ("phase",), buckets=FAST_BUCKETS
+)
+AUDIT_QUEUE_DEPTH = REGISTRY.gauge("audit_queue_depth", "Analysis units waiting to start")
+AUDIT_IN_FLIGHT = REGISTRY.gauge("audit_in_flight", "Analysis units currently running")
+AUDIT_COMPLETED = REGISTRY.counter("audit_functions_completed_total", "Functions finished", ("status",))
+AUDIT_SECONDS = REGISTRY.histogram("audit_function_seconds", "Wall time per audited function")
+TRACE_CACHE = REGISTRY.counter("trace_cache_lookups_total", "Tracer closure cache lookups", ("result",))
+DEDUP_SHARED = REGISTRY.counter("audit_dedup_shared_total", "Functions that reused a result with the same fingerprint")
+
+
+def format_snapshot(snapshot=None):
+    """snapshot()을 사람이 읽기 쉬운 줄 목록으로 (GUI 표시용)"""
+    snapshot = REGISTRY.snapshot() if snapshot is None else snapshot
+    lines = []
+    for name, values in snapshot.items():
+        for key, value in values.items():
+            label = f"{name}{{{','.join(key)}}}" if key else name
+            if isinstance(value, dict):
+                lines.append(f"{label}: n={value['count']} mean={value['mean']:.3f} p50<={value['p50']:g} p95<={value['p95']:g}")
+            else:
+                lines.append(f"{label}: {value:g}")
+    return "\n".join(lines)
+
+
+def serve(host="127.0.0.1", port=9108, registry=REGISTRY):
+    """GET /metrics 로 registry를 내보내는 HTTP 서버를 데몬 스레드로 시작하고 서버를 반환"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            payload = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
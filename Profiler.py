@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# 꺼져 있을 때는 span()이 공유 no-op 객체를 돌려주므로 호출 지점의 비용은 함수 호출 한 번과 분기 하나
+_enabled = False
+_events = []
+_events_lock = threading.Lock()
+_local = threading.local()
+_origin_ns = time.perf_counter_ns()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "attributes", "start_ns", "child_ns")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.child_ns = 0
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.perf_counter_ns()
+        duration_ns = end_ns - self.start_ns
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].child_ns += duration_ns
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        event = {
+            "name": self.name,
+            "ph": "X",
+            "ts": (self.start_ns - _origin_ns) / 1000,
+            "dur": duration_ns / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": self.attributes,
+            # summary()의 자기 시간 계산용 (Chrome trace로 내보낼 때는 제거)
+            "self": (duration_ns - self.child_ns) / 1000,
+        }
+        with _events_lock:
+            _events.append(event)
+        return False
+
+    def set(self, **attributes):
+        """실행 중에 알게 된 속성(토큰 수, 캐시 적중 등) 추가"""
+        self.attributes.update(attributes)
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _events_lock:
+        _events.clear()
+
+
+def span(name, **attributes):
+    """중첩 가능한 시간 구간: with span("llm.decision", sample=0) as s: ...; s.set(tokens=...)
+
+    같은 스레드의 span은 시작/종료 순서대로 중첩되고, 분석 단위별 스레드마다 별도 트랙으로 기록된다.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, attributes)
+
+
+def get_events():
+    with _events_lock:
+        return list(_events)
+
+
+def export_chrome_trace(path):
+    """Chrome trace-event 형식으로 저장 (chrome://tracing 또는 Perfetto에서 열기)"""
+    events = [{key: value for key, value in event.items() if key != "self"} for event in get_events()]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+
+def summary():
+    """span 이름별 {count, total_ms, self_ms, mean_ms, max_ms} (총 시간 내림차순)"""
+    stats = {}
+    for event in get_events():
+        entry = stats.setdefault(event["name"], {"count": 0, "total_ms": 0.0, "self_ms": 0.0, "max_ms": 0.0})
+        duration_ms = event["dur"] / 1000
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        entry["self_ms"] += event["self"] / 1000
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+    for entry in stats.values():
+        entry["mean_ms"] = entry["total_ms"] / entry["count"]
+    return OrderedDict(sorted(stats.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+def export_json(path):
+    """원본 span 목록과 요약을 하나의 JSON으로 저장"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"spans": get_events(), "summary": summary()}, f, default=str, indent=2)
+
+
+def format_summary(stats=None):
+    stats = summary() if stats is None else stats
+    lines = [f"{'span':<24} {'count':>7} {'total ms':>12} {'self ms':>12} {'mean ms':>10} {'max ms':>10}"]
+    for name, entry in stats.items():
+        lines.append(
+            f"{name:<24} {entry['count']:>7} {entry['total_ms']:>12.1f} {entry['self_ms']:>12.1f} "
+            f"{entry['mean_ms']:>10.1f} {entry['max_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
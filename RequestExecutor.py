@@ -0,0 +1,188 @@
+import random
+import threading
+import time
+
+import requests
+
+import Metrics
+
+# 단계별 전체 제한 시간(초): 재시도와 대기 시간을 모두 포함 (decision은 모든 샘플 합산)
+STAGE_DEADLINES = {"decision": 60 * 30, "review": 60 * 10}
+# 요청 한 번의 최대 시간 (남은 제한 시간이 더 짧으면 그만큼만)
+REQUEST_TIMEOUT = 60 * 5
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# 회로 상태 게이지 값
+CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN = 0, 1, 2
+
+class LLMRequestError(Exception):
+    """재시도 횟수나 단계 제한 시간을 넘겨 LLM 요청을 포기한 경우"""
+
+
+class CircuitOpenError(LLMRequestError):
+    """서버가 비정상으로 판단되어 제한 시간 안에 회로가 다시 열리지 않은 경우"""
+
+
+class RetryPolicy:
+    """최대 max_attempts번 시도, 재시도 간격은 min(max_delay, base_delay * 2^n) 범위의 full jitter"""
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            # 서버가 알려준 대기 시간을 따르되 상한은 유지
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """연속 실패가 failure_threshold번이면 회로를 열어 reset_timeout초 동안 요청을 멈추는 차단기
+
+    열린 동안 요청하는 스레드는 기다리고, 시간이 지나면 요청 하나만 시험으로 보낸다(half-open).
+    시험 요청이 성공하면 닫히고 대기하던 요청이 모두 진행되며, 실패하면 다시 reset_timeout초 동안 열린다.
+    """
+
+    def __init__(self, endpoint, failure_threshold=5, reset_timeout=30.0):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._condition = threading.Condition()
+
+    def acquire(self, deadline):
+        """요청을 보내도 될 때까지 기다림 (deadline(time.monotonic 기준)을 넘기면 CircuitOpenError)"""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self.state == CIRCUIT_CLOSED:
+                    return
+                if self.state == CIRCUIT_OPEN and now >= self.opened_at + self.reset_timeout:
+                    self._set_state(CIRCUIT_HALF_OPEN)
+                if self.state == CIRCUIT_HALF_OPEN and not self._probe_in_flight:
+                    self._probe_in_flight = True
+                    return
+                if now >= deadline:
+                    raise CircuitOpenError(f"circuit open for {self.endpoint}")
+                wake_at = self.opened_at + self.reset_timeout if self.state == CIRCUIT_OPEN else deadline
+                self._condition.wait(max(min(wake_at, deadline) - now, 0.01))
+
+    def record_success(self):
+        with self._condition:
+            self.failures = 0
+            self._probe_in_flight = False
+            if self.state != CIRCUIT_CLOSED:
+                self._set_state(CIRCUIT_CLOSED)
+                self._condition.notify_all()
+
+    def record_failure(self):
+        with self._condition:
+            self.failures += 1
+            probe_failed = self.state == CIRCUIT_HALF_OPEN
+            self._probe_in_flight = False
+            if probe_failed or (self.state == CIRCUIT_CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._set_state(CIRCUIT_OPEN)
+                Metrics.LLM_CIRCUIT_OPENED.inc(endpoint=self.endpoint)
+            self._condition.notify_all()
+
+    def release(self):
+        # 응답을 판정하지 못하고 끝난 시험 요청(4xx 등)의 자리를 반납
+        with self._condition:
+            if self._probe_in_flight:
+                self._probe_in_flight = False
+                self._condition.notify_all()
+
+    def _set_state(self, state):
+        self.state = state
+        Metrics.LLM_CIRCUIT_STATE.set(state, endpoint=self.endpoint)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint):
+    """엔드포인트별로 하나의 차단기를 공유 (with_endpoint로 만든 auditor 복제본들 사이에서도)"""
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def stage_deadline(stage, deadlines=None):
+    """단계 시작 시점에 호출해 post_completion에 넘길 마감 시각(time.monotonic 기준)을 계산"""
+    return time.monotonic() + (deadlines or STAGE_DEADLINES).get(stage, REQUEST_TIMEOUT)
+
+
+def post_completion(api_url, payload, stage, retry_policy=None, deadline=None):
+    """LLM 완성 요청을 재시도/차단기와 함께 보내고 (response, response_json)을 반환
+
+    연결 오류, 시간 초과, 429/5xx, 잘못된 응답 본문은 재시도하고, 그 밖의 4xx는 즉시 실패한다.
+    모든 시도와 대기는 deadline(기본: 지금부터 STAGE_DEADLINES[stage]초) 안에서 이루어지며,
+    넘기거나 시도 횟수를 다 쓰면 LLMRequestError를 던진다.
+    """
+    retry_policy = retry_policy or RetryPolicy()
+    deadline = deadline or stage_deadline(stage)
+    breaker = get_circuit_breaker(api_url)
+    last_error = None
+
+    for attempt in range(retry_policy.max_attempts):
+        if attempt:
+            Metrics.LLM_RETRIES.inc(stage=stage)
+        try:
+            breaker.acquire(deadline)
+        except CircuitOpenError:
+            Metrics.LLM_GIVE_UPS.inc(stage=stage)
+            raise
+
+        retry_after = None
+        try:
+            timeout = min(REQUEST_TIMEOUT, deadline - time.monotonic())
+            if timeout <= 0:
+                breaker.release()
+                break
+            response = requests.post(api_url, json=payload, timeout=timeout)
+            if response.status_code in RETRYABLE_STATUS:
+                retry_after = _retry_after(response)
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            if 400 <= response.status_code < 500:
+                # 요청 자체의 문제라 재시도해도 같은 결과이고 서버 상태와도 무관
+                breaker.release()
+                Metrics.LLM_REQUESTS.inc(stage=stage, outcome="error")
+                Metrics.LLM_FAILURES.inc(stage=stage, reason=f"http_{response.status_code}")
+                Metrics.LLM_GIVE_UPS.inc(stage=stage)
+                raise LLMRequestError(f"{stage} request rejected: HTTP {response.status_code} {response.text[:200]}")
+            response_json = response.json()
+            response_json["choices"][0]["text"]
+        except LLMRequestError:
+            raise
+        except (requests.RequestException, ValueError, KeyError, IndexError, TypeError) as e:
+            last_error = e
+            breaker.record_failure()
+            Metrics.LLM_REQUESTS.inc(stage=stage, outcome="error")
+            Metrics.LLM_FAILURES.inc(stage=stage, reason=type(e).__name__)
+            delay = retry_policy.delay(attempt, retry_after)
+            if attempt + 1 < retry_policy.max_attempts and time.monotonic() + delay < deadline:
+                time.sleep(delay)
+                continue
+            break
+        else:
+            breaker.record_success()
+            return response, response_json
+
+    Metrics.LLM_GIVE_UPS.inc(stage=stage)
+    raise LLMRequestError(f"{stage} request failed after retries: {last_error!r}")
@@ -0,0 +1,260 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    created_at  REAL NOT NULL,
+    params      TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id        TEXT NOT NULL,
+    contract_name TEXT NOT NULL,
+    function_name TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    decision      TEXT,
+    votes         TEXT,
+    keywords      TEXT,
+    review        TEXT,
+    error         TEXT,
+    elapsed       REAL,
+    trace_hash    TEXT,
+    fingerprint   TEXT,
+    shared_with   TEXT,
+    recorded_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_run ON results (run_id, status);
+CREATE INDEX IF NOT EXISTS results_function ON results (contract_name, function_name);
+CREATE INDEX IF NOT EXISTS results_fingerprint ON results (fingerprint);
+"""
+
+COLUMNS = ("id", "run_id", "contract_name", "function_name", "status", "decision", "votes", "keywords", "review",
+           "error", "elapsed", "trace_hash", "fingerprint", "shared_with", "recorded_at")
+JSON_COLUMNS = ("votes", "keywords", "shared_with")
+
+
+class ResultStore:
+    """분석 결과(AuditResult)를 실행(run)별로 쌓아 두는 색인된 SQLite 저장소
+
+    함수별 markdown 파일 대신 판정, 투표 집계, 키워드, 리뷰, 소요 시간, 추적 지문을 한 곳에 기록하고
+    query/diff_runs로 조회, export_markdown/export_jsonl로 필요할 때 보고서를 만든다.
+    add()는 메모리에 모았다가 batch_size개 또는 flush_interval초마다 한 트랜잭션으로 기록한다.
+    (close() 또는 flush()로 남은 결과를 기록)
+    """
+
+    def __init__(self, path="audit_results.db", batch_size=100, flush_interval=2.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+    def start_run(self, run_id=None, params=None):
+        run_id = run_id or uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, created_at, params) VALUES (?, ?, ?)",
+                (run_id, time.time(), json.dumps(params or {})),
+            )
+        return run_id
+
+    def add(self, run_id, result):
+        """AuditResult 하나를 기록 대기열에 추가 (가득 차거나 flush_interval이 지나면 기록)"""
+        row = (
+            run_id, result.contract_name, result.function_name, result.status, result.decision,
+            json.dumps(result.votes), json.dumps(result.keywords), result.review, result.error, result.elapsed,
+            result.trace_hash, result.fingerprint, json.dumps(result.shared_with), time.time(),
+        )
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def add_all(self, run_id, results):
+        for result in results:
+            self.add(run_id, result)
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO results (run_id, contract_name, function_name, status, decision, votes, keywords, review, "
+                "error, elapsed, trace_hash, fingerprint, shared_with, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._pending,
+            )
+        self._pending = []
+
+    def latest_run(self):
+        with self._lock:
+            row = self._conn.execute("SELECT run_id FROM runs ORDER BY created_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def list_runs(self):
+        """[(run_id, created_at, params, {status: count})] (오래된 순)"""
+        self.flush()
+        with self._lock:
+            runs = self._conn.execute("SELECT run_id, created_at, params FROM runs ORDER BY created_at").fetchall()
+            counts = self._conn.execute("SELECT run_id, status, COUNT(*) FROM results GROUP BY run_id, status").fetchall()
+        statuses = {}
+        for run_id, status, count in counts:
+            statuses.setdefault(run_id, {})[status] = count
+        return [(run_id, created_at, json.loads(params), statuses.get(run_id, {})) for run_id, created_at, params in runs]
+
+    def query(self, run_id=None, status=None, contract_name=None, function_name=None, fingerprint=None, keyword=None,
+              limit=None):
+        """조건에 맞는 결과 dict 리스트 (기록 순). keyword는 키워드와 리뷰 본문에서 찾는다 (대소문자 무시)"""
+        conditions, params = [], []
+        for column, value in (("run_id", run_id), ("status", status), ("contract_name", contract_name),
+                              ("function_name", function_name), ("fingerprint", fingerprint)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if keyword is not None:
+            conditions.append("(keywords LIKE ? OR review LIKE ?)")
+            params.extend([f"%{keyword}%"] * 2)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM results"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row):
+        record = dict(zip(COLUMNS, row))
+        for column in JSON_COLUMNS:
+            record[column] = json.loads(record[column]) if record[column] else None
+        return record
+
+    def latest_results(self, run_id):
+        """실행에서 (contract, function)별 마지막 결과 {(contract, function): dict}"""
+        return {(record["contract_name"], record["function_name"]): record for record in self.query(run_id=run_id)}
+
+    def diff_runs(self, old_run_id, new_run_id):
+        """두 실행 사이에 status/decision이 바뀐 단위 [(contract, function, 이전 dict 또는 None, 이후 dict 또는 None)]"""
+        old = self.latest_results(old_run_id)
+        new = self.latest_results(new_run_id)
+        changes = []
+        for key in list(old) + [key for key in new if key not in old]:
+            before, after = old.get(key), new.get(key)
+            if before and after and (before["status"], before["decision"]) == (after["status"], after["decision"]):
+                continue
+            changes.append(key + (before, after))
+        return changes
+
+    def export_markdown(self, directory, run_id=None, status="vulnerable"):
+        """리뷰가 있는 결과를 report_<contract>_<function>.md로 저장하고 경로 리스트를 반환 (기본: 최근 실행)"""
+        run_id = run_id or self.latest_run()
+        if run_id is None:
+            return []
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for (contract_name, function_name), record in self.latest_results(run_id).items():
+            if not record["review"] or (status is not None and record["status"] != status):
+                continue
+            path = os.path.join(directory, f"report_{contract_name}_{function_name}.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(render_markdown(record))
+            paths.append(path)
+        return paths
+
+    def export_jsonl(self, output, **conditions):
+        """query(**conditions) 결과를 한 줄에 하나씩 JSON으로 output(파일 객체)에 쓰고 줄 수를 반환"""
+        records = self.query(**conditions)
+        for record in records:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return len(records)
+
+
+def render_markdown(record):
+    # 보고서 파일 내용은 리뷰 본문 (markdown 보고서의 유일한 렌더러, GUI도 export_markdown을 거침)
+    return record["review"] or ""
+
+
+def main(argv=None):
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(prog="ResultStore.py", description="Query and export stored audit results")
+    parser.add_argument("db", help="results database (e.g. audit_results.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs", help="list runs with status counts")
+    query = commands.add_parser("query", help="print matching results as JSONL")
+    query.add_argument("--run", help="run id (default: latest run)")
+    query.add_argument("--all-runs", action="store_true")
+    query.add_argument("--status")
+    query.add_argument("--contract")
+    query.add_argument("--function")
+    query.add_argument("--fingerprint")
+    query.add_argument("--keyword")
+    query.add_argument("--limit", type=int)
+    export = commands.add_parser("export", help="render markdown reports for a run")
+    export.add_argument("directory")
+    export.add_argument("--run", help="run id (default: latest run)")
+    export.add_argument("--status", default="vulnerable")
+    diff = commands.add_parser("diff", help="units whose status or decision changed between two runs")
+    diff.add_argument("old_run")
+    diff.add_argument("new_run")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"no such database: {args.db}", file=sys.stderr)
+        return 2
+    store = ResultStore(args.db)
+    try:
+        if args.command == "runs":
+            for run_id, created_at, params, statuses in store.list_runs():
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at))
+                print(run_id, created, json.dumps(statuses), json.dumps(params))
+        elif args.command == "query":
+            store.export_jsonl(
+                sys.stdout, run_id=None if args.all_runs else args.run or store.latest_run(), status=args.status,
+                contract_name=args.contract, function_name=args.function, fingerprint=args.fingerprint,
+                keyword=args.keyword, limit=args.limit,
+            )
+        elif args.command == "export":
+            for path in store.export_markdown(args.directory, args.run, args.status or None):
+                print(path)
+        elif args.command == "diff":
+            for contract_name, function_name, before, after in store.diff_runs(args.old_run, args.new_run):
+                describe = lambda record: f"{record['status']}/{record['decision']}" if record else "-"
+                print(f"{contract_name}::{function_name}\t{describe(before)} -> {describe(after)}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+
+ALL_VISIBILITIES = ("public", "external", "internal", "private")
+
+
+class SelectionPolicy:
+    """선언 속성(가시성, 상태 변경성, 구현부 유무)으로 LLM에 보낼 함수를 고르는 정책
+
+    오버로드된 함수는 하나라도 조건을 만족하면 선택한다.
+    include_uncalled_internal=True 이면 가시성 조건에서 빠진 internal/private 함수라도
+    호출하는 함수가 없어(어떤 진입 함수의 추적에도 포함되지 않아) 따로 분석해야 하는 경우 선택한다.
+    """
+
+    def __init__(self, visibilities=ALL_VISIBILITIES, skip_view_pure=False, skip_bodyless=False,
+                 include_uncalled_internal=False):
+        self.visibilities = set(visibilities)
+        self.skip_view_pure = skip_view_pure
+        self.skip_bodyless = skip_bodyless
+        self.include_uncalled_internal = include_uncalled_internal
+
+    def _reason(self, manager, contract_name, function_name, attributes):
+        # 건너뛰는 이유 (선택하면 None)
+        if self.skip_bodyless and not attributes["Has Body"]:
+            return "no body"
+        if self.skip_view_pure and attributes["Mutability"] in ("view", "pure"):
+            return "view/pure"
+        if attributes["Visibility"] not in self.visibilities:
+            if self.include_uncalled_internal and not manager.get_call_graph().callers(contract_name, function_name):
+                return None
+            return f"{attributes['Visibility']} helper"
+        return None
+
+    def skip_reason(self, manager, contract_name, function_name):
+        reasons = [
+            self._reason(manager, contract_name, function_name, attributes)
+            for attributes in manager.get_function_attributes(contract_name, function_name)
+        ]
+        if not reasons or None in reasons:
+            return None
+        return reasons[0]
+
+    def select(self, manager, targets):
+        """targets [(contract, function)]를 (선택된 targets, {이유: [건너뛴 targets]})로 분리"""
+        selected = []
+        skipped = OrderedDict()
+        for contract_name, function_name in targets:
+            reason = self.skip_reason(manager, contract_name, function_name)
+            if reason is None:
+                selected.append((contract_name, function_name))
+            else:
+                skipped.setdefault(reason, []).append((contract_name, function_name))
+        return selected, skipped
+
+
+POLICIES = {
+    # 기존 동작: 파싱된 모든 함수
+    "all": SelectionPolicy(),
+    # 구현부 없는 선언과 view/pure 함수 제외
+    "skip-trivial": SelectionPolicy(skip_view_pure=True, skip_bodyless=True),
+    # 외부에서 호출 가능한 상태 변경 진입 함수만 (internal/private 헬퍼는 진입 함수 추적에 포함됨)
+    "entry-points": SelectionPolicy(
+        visibilities=("public", "external"), skip_view_pure=True, skip_bodyless=True, include_uncalled_internal=True
+    ),
+}
+
+
+def get_policy(policy):
+    """정책 이름 또는 SelectionPolicy 객체를 SelectionPolicy로 변환 (None이면 "all")"""
+    if policy is None:
+        return POLICIES["all"]
+    if isinstance(policy, str):
+        return POLICIES[policy]
+    return policy
+
+
+def format_selection_report(report):
+    lines = [
+        f"Policy: {report['policy']}",
+        f"Functions: {report['total']} parsed, {report['selected']} selected, {report['total'] - report['selected']} skipped",
+    ]
+    for reason, count in report["skipped"].items():
+        lines.append(f"  - {reason}: {count}")
+    lines.append(
+        f"Decision calls: {report['decision_calls']} instead of {report['decision_calls_before']} "
+        f"({report['decision_calls_saved']} saved, {report['saved_ratio']:.1%})"
+    )
+    return "\n".join(lines)
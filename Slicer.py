@@ -0,0 +1,180 @@
+import re
+from collections import OrderedDict
+
+IDENTIFIER_PATTERN = re.compile(r"\b[A-Za-z_]\w*\b")
+# "uint256 x = ...", "balances[a][b] -= ...", "info.amount += ..." 형태의 대입문 (좌변 변수, 우변)
+ASSIGNMENT_PATTERN = re.compile(
+    r"^\s*(?:[A-Za-z_][\w\.]*(?:\[\])?\s+(?:(?:memory|storage|calldata)\s+)?)?"
+    r"([A-Za-z_]\w*)(?:\[[^\]]*\])*(?:\.\w+)*\s*(?:\+|-|\*|/|%|\||&|\^|<<|>>)?=(?!=)\s*(.*)$"
+)
+INCREMENT_PATTERN = re.compile(r"^\s*(?:\+\+|--)?\s*([A-Za-z_]\w*)(?:\[[^\]]*\])*(?:\.\w+)*\s*(?:\+\+|--)?\s*;")
+
+SOLIDITY_KEYWORDS = {
+    "if", "else", "for", "while", "do", "return", "returns", "require", "revert", "assert", "emit",
+    "function", "modifier", "memory", "storage", "calldata", "public", "private", "internal", "external",
+    "view", "pure", "payable", "override", "virtual", "unchecked", "true", "false", "new", "delete",
+    "msg", "block", "tx", "this", "super", "address", "bool", "string", "bytes", "mapping",
+}
+
+
+class Slicer:
+    """진입 함수의 상태 변수/파라미터에 데이터 또는 제어 의존적인 문장만 남겨 추적 코드를 축소
+
+    잘라낸 각 줄 끝에는 함수 시작 기준 원래 줄 번호(// L<n>)를 붙이고,
+    생략된 구간은 "// ... (L<a>-L<b> omitted)" 한 줄로 표시한다.
+    """
+
+    def __init__(self, contract_manager):
+        self.contract_manager = contract_manager
+
+    def _identifiers(self, line):
+        return {name for name in IDENTIFIER_PATTERN.findall(line) if name not in SOLIDITY_KEYWORDS}
+
+    @staticmethod
+    def _header_end(function_code):
+        for i, line in enumerate(function_code):
+            if "{" in line or ";" in line:
+                return i
+        return len(function_code) - 1
+
+    def get_parameters(self, function_code):
+        return set(self.get_parameter_list(function_code))
+
+    @staticmethod
+    def get_parameter_list(function_code):
+        """함수 선언의 매개변수 이름 리스트 (선언 순서, 이름 없는 매개변수 제외)"""
+        header = " ".join(function_code[:Slicer._header_end(function_code) + 1])
+        start = header.find("(")
+        if start < 0:
+            return []
+
+        # mapping(...) 같은 타입 안의 괄호와 쉼표를 건너뛰도록 깊이를 세며 최상위 쉼표로 매개변수를 나눔
+        parameters, current, depth = [], [], 0
+        for char in header[start + 1:]:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif char == "," and depth == 0:
+                parameters.append("".join(current))
+                current = []
+                continue
+            current.append(char)
+        parameters.append("".join(current))
+
+        names = []
+        for parameter in parameters:
+            # 매개변수 이름은 선언의 마지막 식별자 (식별자가 하나뿐이면 이름 없는 매개변수의 타입)
+            identifiers = IDENTIFIER_PATTERN.findall(parameter)
+            if len(identifiers) > 1 and identifiers[-1] not in SOLIDITY_KEYWORDS:
+                names.append(identifiers[-1])
+        return names
+
+    def get_seed_state_vars(self, contract_name, function_code, modifieds):
+        """컨트랙트별 관심 상태 변수: 추적 중 수정된 변수 + 진입 함수가 읽는 상태 변수"""
+        seeds = {key: set(value) for key, value in modifieds.items()}
+        contract_info = self.contract_manager.get_contract_info(contract_name)
+        if contract_info:
+            global_variables = set(contract_info["Global Variables"])
+            read_vars = self._identifiers("\n".join(function_code)) & global_variables
+            seeds.setdefault(contract_name, set()).update(read_vars)
+        return seeds
+
+    def slice_function(self, function_code, seeds, include_parameters=True):
+        header_end = self._header_end(function_code)
+        relevant = set(seeds)
+        if include_parameters:
+            relevant |= self.get_parameters(function_code)
+
+        statements = []
+        for i in range(header_end + 1, len(function_code)):
+            line = function_code[i]
+            match = ASSIGNMENT_PATTERN.match(line) or INCREMENT_PATTERN.match(line)
+            lhs = match.group(1) if match else None
+            rhs = self._identifiers(match.group(2)) if match and match.lastindex >= 2 else set()
+            statements.append((i, self._identifiers(line), lhs, rhs))
+
+        # 데이터 의존
+        # - 관심 변수(relevant)를 사용하는 문장은 남기고 그 좌변도 관심 변수로 전파 (순방향)
+        # - 남긴 문장이 사용하는 값을 정의하는 문장도 남김 (역방향, needed)
+        kept = set()
+        needed = set()
+        changed = True
+        while changed:
+            changed = False
+            for i, identifiers, lhs, rhs in statements:
+                if i in kept:
+                    continue
+                if identifiers & relevant:
+                    if lhs:
+                        relevant.add(lhs)
+                    needed |= identifiers - {lhs}
+                elif lhs in needed:
+                    needed |= rhs
+                else:
+                    continue
+                kept.add(i)
+                changed = True
+
+        # 제어 의존: 남긴 문장을 감싸는 블록(if/for/while 등)의 시작과 끝을 함께 남김
+        enclosing = {}
+        closing = {}
+        stack = []
+        body_end = len(function_code) - 1
+        for i, line in enumerate(function_code):
+            enclosing[i] = list(stack)
+            for char in line:
+                if char == "{":
+                    stack.append(i)
+                elif char == "}" and stack:
+                    closing[stack.pop()] = i
+                    if not stack and i > header_end:
+                        body_end = min(body_end, i)
+        for i in list(kept):
+            for opener in enclosing[i]:
+                kept.add(opener)
+                if opener in closing:
+                    kept.add(closing[opener])
+        # 함수 본문을 닫는 줄은 항상 유지하고 그 뒤(다음 함수 전까지의 선언 등)는 제외
+        kept.add(body_end)
+
+        sliced = list(function_code[:header_end + 1])
+        omitted_from = None
+        for i in range(header_end + 1, body_end + 1):
+            if i in kept:
+                if omitted_from is not None:
+                    omitted = f"L{omitted_from + 1}" if omitted_from + 1 == i else f"L{omitted_from + 1}-L{i}"
+                    sliced.append(f"        // ... ({omitted} omitted)")
+                    omitted_from = None
+                sliced.append(f"{function_code[i]} // L{i + 1}")
+            elif omitted_from is None:
+                omitted_from = i
+        return sliced
+
+    def slice_trace(self, contract_name, function_name, datas, modifieds, impacted_functions=None):
+        """추적 결과(datas, impacted_functions)를 같은 구조로 축소. 진입 함수 코드는 그대로 유지"""
+        entry_code = datas[contract_name][0] if datas.get(contract_name) else []
+        seeds = self.get_seed_state_vars(contract_name, entry_code, modifieds)
+        entry_parameters = self.get_parameters(entry_code) if entry_code else set()
+
+        sliced_datas = OrderedDict()
+        for key, codes in datas.items():
+            contract_seeds = seeds.get(key, set()) | entry_parameters
+            sliced_datas[key] = [
+                code if key == contract_name and i == 0 else self.slice_function(code, contract_seeds)
+                for i, code in enumerate(codes)
+            ]
+
+        sliced_impacted = None
+        if impacted_functions is not None:
+            sliced_impacted = OrderedDict()
+            for key, codes in impacted_functions.items():
+                # 영향 함수는 같은 상태 변수를 쓰는 문장만 관심 대상
+                sliced_impacted[key] = [
+                    self.slice_function(code, seeds.get(key, set()), include_parameters=False)
+                    for code in codes
+                ]
+
+        return sliced_datas, sliced_impacted
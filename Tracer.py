@@ -1,33 +1,51 @@
 from ContractManager import *
-from collections import OrderedDict
-from copy import deepcopy
+from CallGraph import EDGE_KINDS
+from collections import OrderedDict, deque, namedtuple
+from types import MappingProxyType
+import Profiler
 import string
 
+# kind: "function" | "modifier" | "impacted"
+# edge: 진입 함수는 "entry", 호출로 도달한 함수는 호출 종류("internal", "external", "view/pure"),
+#       수정자는 "modifier", 영향 함수는 "state-write"
+TraceEvent = namedtuple("TraceEvent", ["kind", "depth", "edge", "contract_name", "name", "code"])
+
 class Tracer:
     def __init__(self, contract_manager):
         self.contract_manager = contract_manager
-
-    def _remove_duplicate_values(self, dict1, dict2):
-
-        for key in dict1:
-            dict1[key] = [value for value in dict1[key] if value not in dict2[key]]
-        return dict1
-    
-
-    def _remove_duplicates_from_list(self, seq):
-
-        new_list = []
-        for item in seq:
-            if item not in new_list:
-                new_list.append(item)
-        return new_list
-
-    def _remove_dup(self, dict_data):
-
-
-        for key in dict_data:
-            dict_data[key] = self._remove_duplicates_from_list(dict_data[key])
-        return dict_data
+        # (node id, remaining depth) -> 읽기 전용 {node id: hops} 클로저
+        self._trace_cache = dict()
+        # node id -> (function ids, modified state vars)
+        # 함수 ID (contract, function, overload index)는 컨트랙트가 재로딩되기 전까지 안정적이며
+        # 코드는 캐시하지 않고 매번 ContractManager에서 조회 (지연 로딩 LRU에서 방출된 레코드를 붙잡지 않도록)
+        self._node_cache = dict()
+        # 캐시를 만든 호출 그래프 (ContractManager가 컨트랙트를 재로딩하면 그래프가 교체되어 캐시 무효화)
+        self._cached_graph = None
+        self.cache_stats = {"hits": 0, "misses": 0}
+
+    def clear_cache(self):
+        self._trace_cache.clear()
+        self._node_cache.clear()
+        self._cached_graph = None
+
+    def get_cache_stats(self):
+        hits = self.cache_stats["hits"]
+        misses = self.cache_stats["misses"]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": len(self._trace_cache),
+        }
+
+    def _get_call_graph(self):
+        call_graph = self.contract_manager.get_call_graph()
+        if call_graph is not self._cached_graph:
+            self._trace_cache.clear()
+            self._node_cache.clear()
+            self._cached_graph = call_graph
+        return call_graph
 
     def _get_traced_contract_codes(self, dicts):
         self.contract_manager.get_contract_names()
@@ -54,15 +72,15 @@ class Tracer:
             for function in function_name:
                 modified_state_vars = self.contract_manager.get_functions_modified_state_vars(contract_name, function)
                 if contract_name not in contract_modified_state_vars:
-                    contract_modified_state_vars[contract_name] = []
+                    contract_modified_state_vars[contract_name] = {}
                 
-                for modified in modified_state_vars:
-                    contract_modified_state_vars[contract_name].append(modified)
+                # dict를 순서 있는 집합으로 사용해 중복 제거
+                contract_modified_state_vars[contract_name].update(dict.fromkeys(modified_state_vars))
 
 
                 # contract_modified_state_vars[contract_name] = modified_state_vars
 
-        return contract_modified_state_vars
+        return {key: list(value) for key, value in contract_modified_state_vars.items()}
 
     def _get_traced_contract_modifiers(self, dicts):
         contract_modifiers = {}
@@ -73,68 +91,28 @@ class Tracer:
 
 
                 if contract_name not in contract_modifiers:
-                    contract_modifiers[contract_name] = []
+                    contract_modifiers[contract_name] = {}
                 
-                for modifier in modifiers:
-                    contract_modifiers[contract_name].append(modifier)
+                contract_modifiers[contract_name].update(dict.fromkeys(modifiers or []))
 
                 # contract_modifiers[contract_name] = modifiers
 
-        return contract_modifiers
+        return {key: list(value) for key, value in contract_modifiers.items()}
 
 
     def trace_function(self, contract_name, function_name):
-
-        internal_calls = self.contract_manager.get_functions_internal_calls(contract_name, function_name)
-        external_calls = self.contract_manager.get_functions_external_calls(contract_name, function_name)
-        view_pure_calls = self.contract_manager.get_functions_view_pure_calls(contract_name, function_name)
-
-
-
-
-        # contract_names = self.contract_manager.get_contract_names()
+        # 호출 관계는 ContractManager가 로드 시 만든 호출 그래프에서 조회
 
         contracts_and_functions = OrderedDict()
 
 
         contracts_and_functions[contract_name] = [function_name]
 
-        if internal_calls:
-            for calls in internal_calls:
-                for function_name in calls:
-                    function_names = self.contract_manager.get_function_names(contract_name)
-                    if function_name in function_names:
-                        if contract_name not in contracts_and_functions:
-                            contracts_and_functions[contract_name] = []
-                        contracts_and_functions[contract_name].append(function_name)
-
-        if external_calls:
-            for external_call in external_calls:
-                for interface_name in external_call:
-
-                    _contract_name = interface_name[1:] if interface_name[0] == 'I' else interface_name
-
-                    for function_name in external_call[interface_name]:
-
-                        function_names = self.contract_manager.get_function_names(_contract_name)
-                        if function_names == None:
-                            continue
-
-                        if function_name in function_names:
-                            if _contract_name not in contracts_and_functions:
-                                contracts_and_functions[_contract_name] = []
-                            contracts_and_functions[_contract_name].append(function_name)
-
-
-
-        if view_pure_calls:
-            for view_pure_call in view_pure_calls:
-                for function_name in view_pure_call:
-                    function_names = self.contract_manager.get_function_names(contract_name)
-                    if function_name in function_names:
-                        if contract_name not in contracts_and_functions:
-                            contracts_and_functions[contract_name] = []
-                        contracts_and_functions[contract_name].append(function_name)
+        call_graph = self.contract_manager.get_call_graph()
+        for _contract_name, _function_name, _ in call_graph.callees(contract_name, function_name):
+            if _contract_name not in contracts_and_functions:
+                contracts_and_functions[_contract_name] = []
+            contracts_and_functions[_contract_name].append(_function_name)
 
         _code_dict = OrderedDict()
         _modified_state_vars = OrderedDict()
@@ -155,55 +133,69 @@ class Tracer:
 
 
 
-    def trace_function_with_depth(self, contract_name, function_name, depth=3):
-        datas, dicts, modifieds, modifiers = self.trace_function(contract_name, function_name)
-        modifieds = self._remove_dup(modifieds)
-
-        print("modifieds: ", modifieds)
-        impacted_functions = OrderedDict()
-        _impacted = self.contract_manager.get_impacted_modified_state_vars(modifieds)
-        impacted_functions.update(_impacted)
-        temp = deepcopy(dicts)
-
-        for i in range(depth - 1):
-            ret = {}
-
-            for dic in temp:
-                functions = temp[dic]
-
-                for function in functions:
-                    _data, _ret, _modified, _modifiers = self.trace_function(dic, function)
-                                    
-                    # Ensure _data is a dictionary before updating
-                    if isinstance(_data, dict):
-                        for key, value in _data.items():
-                            if key in datas:
-                                if isinstance(datas[key], list) and isinstance(value, list):
-                                    datas[key].extend(value)
-                                elif isinstance(datas[key], dict) and isinstance(value, dict):
-                                    datas[key].update(value)
-                                else:
-                                    pass
-                            else:
-                                datas[key] = value
-                    else:
-                        pass
-
-                    modifieds.update(_modified)
-                    modifiers.update(_modifiers)
-
-                    _impacted = self.contract_manager.get_impacted_modified_state_vars(modifieds)
-                    impacted_functions.update(_impacted)
-
-
-                    if _ret:
-                        for key in _ret:
-                            if key in ret:
-                                ret[key].extend(_ret[key])
-                            else:
-                                ret[key] = _ret[key]
-
-            temp = deepcopy(ret)
+    def _closure(self, call_graph, node_id, remaining):
+        # closure(n, r) = {n} ∪ closure(callee, r - 1) 을 (노드, 남은 깊이) 단위로 메모이제이션
+        key = (node_id, remaining)
+        cached = self._trace_cache.get(key)
+        if cached is not None:
+            self.cache_stats["hits"] += 1
+            return cached
+        self.cache_stats["misses"] += 1
+
+        hops = {node_id: 0}
+        if remaining > 0:
+            for target, _ in call_graph.callee_ids(node_id):
+                for _node_id, _hops in self._closure(call_graph, target, remaining - 1).items():
+                    if _hops + 1 < hops.get(_node_id, remaining + 1):
+                        hops[_node_id] = _hops + 1
+
+        closure = MappingProxyType(hops)
+        self._trace_cache[key] = closure
+        return closure
+
+    def _trace_closure(self, call_graph, contract_name, function_name, depth):
+        start = call_graph.node_id(contract_name, function_name)
+        if start is None:
+            return [], {}
+
+        # 기존 구현과 동일하게 depth가 1 이하여도 직접 호출되는 함수까지는 추적
+        closure = self._closure(call_graph, start, max(depth, 1))
+        # 최초 도달 깊이 순(BFS 순서)으로 정렬
+        return sorted(closure, key=closure.get), closure
+
+    def _get_node_data(self, call_graph, node_id):
+        node_data = self._node_cache.get(node_id)
+        if node_data is None:
+            contract_name, function_name = call_graph.nodes[node_id]
+            function_codes = self.contract_manager.get_function_code(contract_name, function_name) or ()
+            node_data = (
+                tuple((contract_name, function_name, overload) for overload in range(len(function_codes))),
+                tuple(self.contract_manager.get_functions_modified_state_vars(contract_name, function_name) or ()),
+            )
+            self._node_cache[node_id] = node_data
+        return node_data
+
+    def _materialize(self, call_graph, traced):
+        # 추적된 노드 목록(BFS 순서)을 (datas, modifieds, modifier_codes, impacted_functions)로 변환
+        traced_ids = OrderedDict()
+        modifieds = OrderedDict()
+        modifiers = OrderedDict()
+        for node_id in traced:
+            _contract_name = call_graph.nodes[node_id][0]
+            if _contract_name not in modifieds:
+                modifieds[_contract_name] = {}
+                modifiers[_contract_name] = self.contract_manager.get_contract_modifier_functions(_contract_name) or []
+
+            function_ids, modified_state_vars = self._get_node_data(call_graph, node_id)
+            traced_ids.update(dict.fromkeys(function_ids))
+            modifieds[_contract_name].update(dict.fromkeys(modified_state_vars))
+
+        datas = OrderedDict((_contract_name, []) for _contract_name in modifieds)
+        for function_id in traced_ids:
+            function_code = self.contract_manager.get_function_code_by_id(function_id)
+            if function_code is not None:
+                datas[function_id[0]].append(function_code)
+        modifieds = OrderedDict((key, list(value)) for key, value in modifieds.items())
 
         modifier_codes = {}
         for modifier in modifiers:
@@ -212,10 +204,171 @@ class Tracer:
                 continue
             modifier_codes[modifier] = modifier_code
 
-        impacted_functions = self._remove_duplicate_values(impacted_functions, datas)
-        datas = self._remove_dup(datas)
+        # 이미 추적된 함수는 ID 집합 차이로 영향 함수에서 제외
+        impacted_functions = OrderedDict()
+        for function_id, function_code in self.contract_manager.get_impacted_functions(modifieds):
+            impacted = impacted_functions.setdefault(function_id[0], [])
+            if function_id not in traced_ids:
+                impacted.append(function_code)
+
         return datas, modifieds, modifier_codes, impacted_functions
 
+    def trace_function_with_depth(self, contract_name, function_name, depth=3):
+        with Profiler.span("trace", depth=depth) as span:
+            hits = self.cache_stats["hits"]
+            call_graph = self._get_call_graph()
+            traced, _ = self._trace_closure(call_graph, contract_name, function_name, depth)
+            datas, modifieds, modifier_codes, impacted_functions = self._materialize(call_graph, traced)
+            span.set(functions=len(traced), cache_hits=self.cache_stats["hits"] - hits)
+
+        print("modifieds: ", modifieds)
+        return datas, modifieds, modifier_codes, impacted_functions
+
+    def iter_trace(self, contract_name, function_name, depth=3):
+        """추적 결과를 BFS 순서로 하나씩 생성하는 제너레이터 (TraceEvent)
+
+        함수를 방문할 때마다 해당 함수 코드, 처음 등장한 컨트랙트의 수정자,
+        새로 수정된 상태 변수를 쓰는 영향 함수를 차례로 내보낸다.
+        소비자가 중간에 멈추면 나머지 탐색 비용은 들지 않는다.
+        영향 함수로 먼저 나온 함수가 이후 호출로 도달하면 "function"으로 다시 나올 수 있다.
+        """
+        call_graph = self._get_call_graph()
+        start = call_graph.node_id(contract_name, function_name)
+        if start is None:
+            return
+
+        depth = max(depth, 1)
+        visited = {start}
+        queue = deque([(start, 0, "entry")])
+        yielded_ids = set()
+        seen_contracts = set()
+        seen_state_vars = set()
+
+        while queue:
+            node_id, level, edge = queue.popleft()
+            _contract_name, _function_name = call_graph.nodes[node_id]
+            function_ids, modified_state_vars = self._get_node_data(call_graph, node_id)
+
+            for function_id in function_ids:
+                function_code = self.contract_manager.get_function_code_by_id(function_id)
+                if function_code is None:
+                    continue
+                yielded_ids.add(function_id)
+                yield TraceEvent("function", level, edge, _contract_name, _function_name, function_code)
+
+            if _contract_name not in seen_contracts:
+                seen_contracts.add(_contract_name)
+                for modifier_name in self.contract_manager.get_contract_modifier_functions(_contract_name) or []:
+                    modifier_code = self.contract_manager.get_modifier_code(_contract_name, [modifier_name])
+                    if modifier_code:
+                        yield TraceEvent("modifier", level, "modifier", _contract_name, modifier_name, modifier_code)
+
+            new_state_vars = [
+                state_var for state_var in modified_state_vars
+                if (_contract_name, state_var) not in seen_state_vars
+            ]
+            seen_state_vars.update((_contract_name, state_var) for state_var in new_state_vars)
+            if new_state_vars:
+                impacted = self.contract_manager.get_impacted_functions({_contract_name: new_state_vars})
+                for function_id, function_code in impacted:
+                    if function_id in yielded_ids:
+                        continue
+                    yielded_ids.add(function_id)
+                    yield TraceEvent("impacted", level, "state-write", function_id[0], function_id[1], function_code)
+
+            if level >= depth:
+                continue
+            for target, kind in call_graph.callee_ids(node_id):
+                if target not in visited:
+                    visited.add(target)
+                    queue.append((target, level + 1, EDGE_KINDS[kind]))
+
+    def trace_callers(self, contract_name, function_name, max_hops=None, entry_points_only=True):
+        """역방향 호출 그래프를 따라 이 함수에 도달할 수 있는 함수와 최소 홉 수 {(contract, function): hops}
+
+        entry_points_only=True 이면 public/external 진입 함수만 반환한다 (자기 자신이 진입 함수면 0홉으로 포함).
+        """
+        call_graph = self._get_call_graph()
+        start = call_graph.node_id(contract_name, function_name)
+        if start is None:
+            return OrderedDict()
+
+        hops = {start: 0}
+        queue = deque([start])
+        while queue:
+            node_id = queue.popleft()
+            if max_hops is not None and hops[node_id] >= max_hops:
+                continue
+            for source, _ in call_graph.caller_ids(node_id):
+                if source not in hops:
+                    hops[source] = hops[node_id] + 1
+                    queue.append(source)
+
+        callers = OrderedDict()
+        for node_id, hop in hops.items():
+            node = call_graph.nodes[node_id]
+            if entry_points_only and not self.contract_manager.is_entry_point(*node):
+                continue
+            callers[node] = hop
+        return callers
+
+    def trace_functions(self, entries, depth=3):
+        """여러 진입 함수의 depth 홉 클로저를 한 번에 계산해 (contract, function), 결과 순으로 스트리밍
+
+        호출 그래프 위에서 reach_k(v) = {v} | reach_{k-1}(callees of v) 를 정수 비트셋으로
+        단계별로 계산하므로 진입 함수들이 공유하는 하위 클로저는 한 번만 계산된다.
+        같은 깊이의 함수는 노드 id 순으로 정렬된다.
+        """
+        call_graph = self._get_call_graph()
+        depth = max(depth, 1)
+        entries = list(entries)
+
+        starts = {}
+        for contract_name, function_name in entries:
+            node_id = call_graph.node_id(contract_name, function_name)
+            if node_id is not None:
+                starts[node_id] = None
+
+        # 진입 함수들로부터의 최소 거리: 거리 d인 노드는 depth - d 단계까지만 필요
+        distances = dict.fromkeys(starts, 0)
+        frontier = list(starts)
+        for level in range(1, depth + 1):
+            next_frontier = []
+            for node_id in frontier:
+                for target, _ in call_graph.callee_ids(node_id):
+                    if target not in distances:
+                        distances[target] = level
+                        next_frontier.append(target)
+            frontier = next_frontier
+
+        reach = {node_id: 1 << node_id for node_id in distances}
+        entry_levels = {node_id: [reach[node_id]] for node_id in starts}
+        for level in range(1, depth + 1):
+            next_reach = {}
+            for node_id, distance in distances.items():
+                if distance > depth - level:
+                    continue
+                bits = reach[node_id]
+                for target, _ in call_graph.callee_ids(node_id):
+                    bits |= reach[target]
+                next_reach[node_id] = bits
+            reach = next_reach
+            for node_id in starts:
+                entry_levels[node_id].append(reach[node_id])
+
+        for contract_name, function_name in entries:
+            node_id = call_graph.node_id(contract_name, function_name)
+            traced = []
+            if node_id is not None:
+                seen = 0
+                for bits in entry_levels[node_id]:
+                    new_bits = bits & ~seen
+                    seen |= bits
+                    while new_bits:
+                        lowest = new_bits & -new_bits
+                        traced.append(lowest.bit_length() - 1)
+                        new_bits ^= lowest
+            yield (contract_name, function_name), self._materialize(call_graph, traced)
 
 if __name__ == "__main__":
     contract_paths = ["test.sol"]
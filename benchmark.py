@@ -0,0 +1,300 @@
+import io
+import os
+import sys
+import random
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+
+from ContractManager import ContractManager
+from Tracer import Tracer
+
+NUM_STATE_VARS = 16
+
+
+def generate_contract(index, num_contracts, num_functions, fan_out, rng):
+    """벤치마크용 합성 컨트랙트 소스 생성"""
+    name = f"Contract{index}"
+    peer = f"Contract{(index + 1) % num_contracts}"
+    lines = [
+        "pragma solidity ^0.8.0;",
+        "",
+        f"contract {name} is I{name} {{",
+        f"    I{peer} public peer;",
+        "    mapping(address => uint256) public balances;",
+    ]
+    for v in range(NUM_STATE_VARS):
+        lines.append(f"    uint256 public state{v};")
+    lines += [
+        "",
+        "    modifier onlyOwner() {",
+        "        require(msg.sender == address(0));",
+        "        _;",
+        "    }",
+        "",
+    ]
+
+    for f in range(num_functions):
+        prefix = "_" if f % 2 else ""
+        lines.append(f"    function {prefix}fn{f}(uint256 amount) public {{")
+        lines.append(f"        state{f % NUM_STATE_VARS} += amount;")
+        for _ in range(fan_out):
+            callee = rng.randrange(num_functions)
+            callee_prefix = "_" if callee % 2 else ""
+            lines.append(f"        {callee_prefix}fn{callee}(amount);")
+        lines.append(f"        peer.fn{rng.randrange(0, num_functions, 2)}(amount);")
+        lines.append("    }")
+        lines.append("")
+
+    lines.append("}")
+    return name, "\n".join(lines)
+
+
+@contextmanager
+def synthetic_project(num_contracts=50, num_functions=100, fan_out=3, seed=0):
+    """임시 디렉터리에 합성 프로젝트를 만들고 로드된 ContractManager를 반환"""
+    rng = random.Random(seed)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            paths = []
+            for i in range(num_contracts):
+                name, source = generate_contract(i, num_contracts, num_functions, fan_out, rng)
+                path = os.path.join(workdir, f"{name}.sol")
+                with open(path, "w") as f:
+                    f.write(source)
+                paths.append(path)
+
+            manager = ContractManager()
+            manager.initial_save(paths)
+            manager.load_contracts_info()
+            yield manager
+        finally:
+            os.chdir(cwd)
+
+
+def _timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return time.perf_counter() - start
+
+
+def bench_lookups(manager, repeat=20):
+    """인덱스 조회와 기존 선형 탐색 방식 비교"""
+    queries = []
+    for contract_name in manager.get_contract_names():
+        for function in manager.get_contract_info(contract_name)["Functions"]:
+            queries.append((contract_name, function["Function Name"]))
+
+    def linear():
+        for contract_name, function_name in queries:
+            contract_info = manager.get_contract_info(contract_name)
+            [f for f in contract_info["Functions"] if f["Function Name"] == function_name]
+            function_name in [f["Function Name"] for f in contract_info["Functions"]]
+            [m for m in contract_info["Modifiers"] if m["Modifier Name"] == "onlyOwner"]
+
+    def indexed():
+        for contract_name, function_name in queries:
+            manager.get_function_code(contract_name, function_name)
+            manager.has_function(contract_name, function_name)
+            manager.get_modifier_code(contract_name, ["onlyOwner"])
+
+    linear_time = _timeit(linear, repeat)
+    indexed_time = _timeit(indexed, repeat)
+    print(f"lookups: {len(queries) * repeat} queries")
+    print(f"  linear scan : {linear_time:.4f}s")
+    print(f"  hash index  : {indexed_time:.4f}s ({linear_time / indexed_time:.1f}x)")
+
+
+def bench_impact(manager, repeat=20):
+    """상태 변수 역색인 기반 영향 함수 조회와 기존 삼중 루프 비교"""
+    queries = {
+        contract_name: ["state0", "balances"]
+        for contract_name in manager.get_contract_names()
+    }
+
+    def nested_loop():
+        impacted = {}
+        for contract_name in queries:
+            contract_info = manager.get_contract_info(contract_name)
+            for state_var in queries[contract_name]:
+                for function in contract_info["Functions"]:
+                    if state_var in function["Modified State Variables"]:
+                        impacted.setdefault(contract_name, []).append(function["Function Code"])
+        return impacted
+
+    def inverted_index():
+        return manager.get_impacted_modified_state_vars(queries)
+
+    nested_time = _timeit(nested_loop, repeat)
+    indexed_time = _timeit(inverted_index, repeat)
+    print(f"impact: {len(queries)} contracts x {len(queries[next(iter(queries))])} state vars")
+    print(f"  nested loop   : {nested_time:.4f}s")
+    print(f"  inverted index: {indexed_time:.4f}s ({nested_time / indexed_time:.1f}x)")
+
+
+def _resident_memory(build):
+    tracemalloc.start()
+    try:
+        result = build()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak
+
+
+def bench_memory(manager, cache_size=8):
+    """전체 로딩과 지연 로딩(LRU) 모드의 상주 메모리 비교"""
+    contract_names = list(manager.get_contract_names())
+
+    def build(lazy):
+        def _build():
+            _manager = ContractManager(lazy=lazy, cache_size=cache_size)
+            _manager.contract_names = list(contract_names)
+            _manager.load_contracts_info()
+            # 일부 컨트랙트에 접근해 LRU 캐시를 채움
+            for contract_name in contract_names:
+                _manager.get_function_code(contract_name, "fn0")
+            return _manager
+        return _build
+
+    _, eager_current, eager_peak = _resident_memory(build(False))
+    _, lazy_current, lazy_peak = _resident_memory(build(True))
+    print(f"memory: {len(contract_names)} contracts, lazy cache_size={cache_size}")
+    print(f"  eager: resident {eager_current / 2**20:.1f} MiB, peak {eager_peak / 2**20:.1f} MiB")
+    print(f"  lazy : resident {lazy_current / 2**20:.1f} MiB, peak {lazy_peak / 2**20:.1f} MiB")
+
+
+def bench_callgraph(manager, repeat=5):
+    """호출 그래프 생성 시간과 callee/caller/k-hop 조회 처리량"""
+    start = time.perf_counter()
+    manager._call_graph = None
+    call_graph = manager.get_call_graph()
+    build_time = time.perf_counter() - start
+
+    nodes = list(call_graph.nodes)
+
+    def callees():
+        for contract_name, function_name in nodes:
+            call_graph.callees(contract_name, function_name)
+
+    def callers():
+        for contract_name, function_name in nodes:
+            call_graph.callers(contract_name, function_name)
+
+    def neighborhoods():
+        for contract_name, function_name in nodes:
+            call_graph.neighborhood(contract_name, function_name, 3)
+
+    print(f"callgraph: {len(call_graph)} nodes, {call_graph.num_edges()} edges, built in {build_time:.4f}s")
+    print(f"  callees      : {_timeit(callees, repeat) / repeat:.4f}s per {len(nodes)} queries")
+    print(f"  callers      : {_timeit(callers, repeat) / repeat:.4f}s per {len(nodes)} queries")
+    print(f"  3-hop closure: {_timeit(neighborhoods, repeat) / repeat:.4f}s per {len(nodes)} queries")
+
+
+def _legacy_trace_with_depth(tracer, contract_name, function_name, depth):
+    # 비교용: visited 집합 없이 단계마다 frontier 전체를 다시 추적하고 마지막에 중복 제거하던 기존 방식
+    datas, frontier, _, _ = tracer.trace_function(contract_name, function_name)
+    for _ in range(depth - 1):
+        next_frontier = {}
+        for _contract_name in frontier:
+            for _function_name in frontier[_contract_name]:
+                _data, _ret, _, _ = tracer.trace_function(_contract_name, _function_name)
+                for key, value in _data.items():
+                    datas.setdefault(key, []).extend(value)
+                for key, value in _ret.items():
+                    next_frontier.setdefault(key, []).extend(value)
+        frontier = next_frontier
+    for key in datas:
+        deduped = []
+        for code in datas[key]:
+            if code not in deduped:
+                deduped.append(code)
+        datas[key] = deduped
+    return datas
+
+
+def bench_bfs(manager, depths=(2, 3, 4, 5), entries=20):
+    """깊고 연결이 많은 호출 그래프에서 기존 단계별 재추적과 visited-set BFS 비교"""
+    tracer = Tracer(manager)
+    call_graph = manager.get_call_graph()
+    starts = call_graph.nodes[:entries]
+
+    print(f"bfs: {len(starts)} entry functions, avg out-degree {call_graph.num_edges() / len(call_graph):.1f}")
+    for depth in depths:
+        legacy_time = _timeit(lambda: [_legacy_trace_with_depth(tracer, c, f, depth) for c, f in starts], 1)
+        tracer.clear_cache()
+        with redirect_stdout(io.StringIO()):
+            bfs_time = _timeit(lambda: [tracer.trace_function_with_depth(c, f, depth) for c, f in starts], 1)
+        print(f"  depth {depth}: level re-trace {legacy_time:.4f}s, visited-set BFS {bfs_time:.4f}s ({legacy_time / bfs_time:.1f}x)")
+
+
+def bench_trace_cache(manager, depth=3):
+    """프로젝트 전체 함수를 추적할 때 공유 트레이스 캐시 유무 비교"""
+    entries = list(manager.get_call_graph().nodes)
+    tracer = Tracer(manager)
+
+    def cold():
+        for contract_name, function_name in entries:
+            tracer.clear_cache()
+            tracer.trace_function_with_depth(contract_name, function_name, depth)
+
+    def warm():
+        for contract_name, function_name in entries:
+            tracer.trace_function_with_depth(contract_name, function_name, depth)
+
+    with redirect_stdout(io.StringIO()):
+        cold_time = _timeit(cold, 1)
+        tracer.clear_cache()
+        tracer.cache_stats = {"hits": 0, "misses": 0}
+        warm_time = _timeit(warm, 1)
+
+    stats = tracer.get_cache_stats()
+    print(f"trace cache: {len(entries)} entry functions, depth {depth}")
+    print(f"  no sharing  : {cold_time:.4f}s")
+    print(f"  shared cache: {warm_time:.4f}s ({cold_time / warm_time:.1f}x), hit rate {stats['hit_rate']:.1%}")
+
+
+def bench_bulk_trace(manager, depth=3):
+    """진입 함수별 개별 추적과 비트셋 기반 일괄 추적(trace_functions) 비교"""
+    entries = list(manager.get_call_graph().nodes)
+    tracer = Tracer(manager)
+
+    def per_entry():
+        for contract_name, function_name in entries:
+            tracer.trace_function_with_depth(contract_name, function_name, depth)
+
+    def bulk():
+        for _ in tracer.trace_functions(entries, depth):
+            pass
+
+    with redirect_stdout(io.StringIO()):
+        tracer.clear_cache()
+        per_entry_time = _timeit(per_entry, 1)
+        tracer.clear_cache()
+        bulk_time = _timeit(bulk, 1)
+
+    print(f"bulk trace: {len(entries)} entry functions, depth {depth}")
+    print(f"  per-entry (shared cache): {per_entry_time:.4f}s")
+    print(f"  trace_functions (bitset): {bulk_time:.4f}s ({per_entry_time / bulk_time:.1f}x)")
+
+
+BENCHMARKS = {
+    "lookups": bench_lookups,
+    "impact": bench_impact,
+    "memory": bench_memory,
+    "callgraph": bench_callgraph,
+    "bfs": bench_bfs,
+    "trace_cache": bench_trace_cache,
+    "bulk_trace": bench_bulk_trace,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    with synthetic_project() as manager:
+        for name in selected:
+            BENCHMARKS[name](manager)
@@ -10,7 +10,10 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot, Qt
 from Client import Client
-from utils import save_review_report
+from AuditJournal import AuditJournal
+from ResultStore import ResultStore
+import Metrics
+from SelectionPolicy import POLICIES, format_selection_report
 
 
 # WorkerSignals: 작업 완료, 에러, 진행 상태 전달
@@ -164,6 +167,29 @@ class SmartContractAnalyzer(QWidget):
         self.impact_checkbox = QCheckBox("Enable Impact Analysis", self)
         self.impact_checkbox.setChecked(False)
         analysis_layout.addWidget(self.impact_checkbox)
+        self.slice_checkbox = QCheckBox("Enable Context Slicing", self)
+        self.slice_checkbox.setChecked(False)
+        analysis_layout.addWidget(self.slice_checkbox)
+        concurrency_layout = QHBoxLayout()
+        concurrency_layout.addWidget(QLabel("Parallel Requests:"))
+        self.spinbox_concurrency = QSpinBox(self)
+        self.spinbox_concurrency.setMinimum(1)
+        self.spinbox_concurrency.setMaximum(32)
+        self.spinbox_concurrency.setValue(4)
+        concurrency_layout.addWidget(self.spinbox_concurrency)
+        analysis_layout.addLayout(concurrency_layout)
+        policy_layout = QHBoxLayout()
+        policy_layout.addWidget(QLabel("Function Filter:"))
+        self.policy_select = QComboBox(self)
+        self.policy_select.addItems(list(POLICIES))
+        policy_layout.addWidget(self.policy_select)
+        self.button_dry_run = QPushButton("Dry Run", self)
+        self.button_dry_run.clicked.connect(self.show_selection_report)
+        policy_layout.addWidget(self.button_dry_run)
+        analysis_layout.addLayout(policy_layout)
+        self.resume_checkbox = QCheckBox("Resume Last Job (skip completed functions)", self)
+        self.resume_checkbox.setChecked(False)
+        analysis_layout.addWidget(self.resume_checkbox)
         self.button_analyze = QPushButton("Analyze Selected Function", self)
         self.button_analyze.clicked.connect(self.analyze_selected_function)
         analysis_layout.addWidget(self.button_analyze)
@@ -173,6 +199,12 @@ class SmartContractAnalyzer(QWidget):
         self.button_analyze_all = QPushButton("Analyze All Contracts", self)
         self.button_analyze_all.clicked.connect(self.analyze_all_contracts)
         analysis_layout.addWidget(self.button_analyze_all)
+        self.button_export_reports = QPushButton("Export Reports (Last Run)", self)
+        self.button_export_reports.clicked.connect(self.export_reports)
+        analysis_layout.addWidget(self.button_export_reports)
+        self.button_metrics = QPushButton("Show Metrics", self)
+        self.button_metrics.clicked.connect(self.show_metrics)
+        analysis_layout.addWidget(self.button_metrics)
         analysis_group.setLayout(analysis_layout)
 
         # ── 전체 레이아웃 재배치 (좌우 분할 + 하단 결과 영역) ──
@@ -331,20 +363,22 @@ class SmartContractAnalyzer(QWidget):
         function_name = self.function_select.currentText()
         depth = self.spinbox_depth.value()
         check_impact = self.impact_checkbox.isChecked()
+        slice_context = self.slice_checkbox.isChecked()
         
         # 진행 상황 업데이트 (단일 작업이므로 1/1로 처리)
         progress_callback(1, 1, f"Analyzing {contract_name}::{function_name}")
         
-        # 분석 실행
-        review = self.client.analyze_and_review(contract_name, function_name, depth, check_impact=check_impact)
-        if review:
-            report_path = save_review_report(contract_name, function_name, review, self.save_path)
-            if report_path:
-                print(f"✅ Report saved at: {report_path}")
-        else:
-            review = "✅ No vulnerabilities found."
-        
-        return f"📑 Contract: {contract_name}, Function: {function_name}\n\n{review}"
+        # 분석 실행 (결과는 저장 경로의 결과 저장소에 기록, "Export Reports"로 markdown 생성)
+        result, = self.client.audit_functions(
+            [(contract_name, function_name)], depth, check_impact=check_impact, slice_context=slice_context, max_workers=1
+        )
+        store = self._open_result_store()
+        try:
+            store.add_all(store.start_run(params={"targets": [(contract_name, function_name)], "depth": depth}), [result])
+        finally:
+            store.close()
+
+        return f"📑 Contract: {contract_name}, Function: {function_name}\n\n{self._format_review(result)}"
 
     def handle_analyze_selected_function_result(self, result_text):
         self.current_worker = None
@@ -359,29 +393,84 @@ class SmartContractAnalyzer(QWidget):
         worker.signals.error.connect(self.handle_worker_error)
         self.threadpool.start(worker)
 
+    def _run_parallel_audit(self, contracts, progress_callback, is_cancelled):
+        # 선택된 컨트랙트의 함수를 병렬로 분석하고 입력 순서대로 AuditResult 리스트를 반환
+        # 결과는 저장 경로의 작업 저널에 기록되어 중단 후 "Resume Last Job"으로 이어서 실행 가능
+        # 완료된 함수는 결과 저장소에 모아서 기록 (함수별 markdown은 "Export Reports"로 필요할 때 생성)
+        journal = AuditJournal(os.path.join(self.save_path or os.getcwd(), "audit_journal.db"))
+        store = self._open_result_store()
+        try:
+            if self.resume_checkbox.isChecked() and journal.latest_job():
+                run_id = store.start_run(params={"resumed_job": journal.latest_job()})
+                results = self.client.resume_job(
+                    journal,
+                    max_workers=self.spinbox_concurrency.value(),
+                    progress_callback=progress_callback,
+                    is_cancelled=is_cancelled,
+                    on_result=lambda result: store.add(run_id, result),
+                )
+            else:
+                targets = self.client.get_audit_targets(contracts, policy=self.policy_select.currentText())
+                run_id = store.start_run(params={"targets": targets, "depth": self.spinbox_depth.value()})
+                results = self.client.audit_functions(
+                    targets,
+                    self.spinbox_depth.value(),
+                    check_impact=self.impact_checkbox.isChecked(),
+                    slice_context=self.slice_checkbox.isChecked(),
+                    max_workers=self.spinbox_concurrency.value(),
+                    progress_callback=progress_callback,
+                    is_cancelled=is_cancelled,
+                    journal=journal,
+                    on_result=lambda result: store.add(run_id, result),
+                )
+        finally:
+            journal.close()
+            store.close()
+        return results
+
+    def show_metrics(self):
+        # 같은 프로세스의 지표 (LLM 지연/토큰, 대기열, 처리율, 캐시 적중)
+        self.result_text.setText(Metrics.format_snapshot())
+
+    def _open_result_store(self):
+        return ResultStore(os.path.join(self.save_path or os.getcwd(), "audit_results.db"))
+
+    def export_reports(self):
+        # 마지막 실행에서 취약으로 확인된 함수의 리뷰를 report_<contract>_<function>.md로 저장
+        store = self._open_result_store()
+        try:
+            paths = store.export_markdown(self.save_path or os.getcwd())
+        except OSError as e:
+            QMessageBox.warning(self, "Warning", f"보고서를 저장하지 못했습니다: {e}")
+            return
+        finally:
+            store.close()
+        self.result_text.setText(f"{len(paths)} report(s) exported\n" + "\n".join(paths))
+
+    def show_selection_report(self):
+        # LLM 호출 없이 현재 필터가 건너뛰는 함수와 절약되는 호출 수를 표시
+        contracts = self.get_selected_contracts() or None
+        report = self.client.selection_report(contracts, policy=self.policy_select.currentText())
+        result_text = format_selection_report(report) + "\n"
+        for reason, functions in report["skipped_functions"].items():
+            result_text += f"\n[{reason}]\n"
+            result_text += "\n".join(f"  {contract}::{function}" for contract, function in functions) + "\n"
+        self.result_text.setText(result_text)
+
+    def _format_review(self, result):
+        if result.review:
+            return result.review
+        if result.status == "secure":
+            return "✅ No vulnerabilities found."
+        return f"⚠️ {result.status}: {result.error}" if result.error else f"⚠️ {result.status}"
+
     def _analyze_all_contracts(self, progress_callback, is_cancelled):
-        contracts = self.client.manager.get_contract_names()
-        total = sum(len(self.client.manager.get_contract_info(contract)["Functions"]) for contract in contracts)
-        current = 0
+        results = self._run_parallel_audit(self.client.manager.get_contract_names(), progress_callback, is_cancelled)
+        if is_cancelled():
+            return "작업이 취소되었습니다."
         result_text = ""
-        depth = self.spinbox_depth.value()
-        check_impact = self.impact_checkbox.isChecked()
-        for contract in contracts:
-            functions = self.client.manager.get_contract_info(contract)["Functions"]
-            for function in functions:
-                if is_cancelled():
-                    return "작업이 취소되었습니다."
-                current += 1
-                function_name = function["Function Name"]
-                progress_callback(current, total, f"Analyzing {contract}::{function_name} ({current}/{total})")
-                review = self.client.analyze_and_review(contract, function_name, depth, check_impact=check_impact)
-                if review:
-                    report_path = save_review_report(contract, function_name, review, self.save_path)
-                    if report_path:
-                        print(f"✅ Report saved at: {report_path}")
-                else:
-                    review = "✅ No vulnerabilities found."
-                result_text += f"📑 Contract: {contract}, Function: {function_name}\n{review}\n{'-' * 50}\n"
+        for result in results:
+            result_text += f"📑 Contract: {result.contract_name}, Function: {result.function_name}\n{self._format_review(result)}\n{'-' * 50}\n"
         return result_text
 
     def handle_analyze_all_contracts_result(self, result_text):
@@ -404,29 +493,19 @@ class SmartContractAnalyzer(QWidget):
         self.threadpool.start(worker)
 
     def _analyze_all_functions_in_selected_contracts(self, selected_contracts, progress_callback, is_cancelled):
-        total = sum(len(self.client.manager.get_contract_info(contract)["Functions"]) for contract in selected_contracts)
-        current = 0
+        results = self._run_parallel_audit(selected_contracts, progress_callback, is_cancelled)
+        if is_cancelled():
+            return "작업이 취소되었습니다."
         result_text = ""
-        depth = self.spinbox_depth.value()
-        check_impact = self.impact_checkbox.isChecked()
-        for contract in selected_contracts:
-            result_text += f"📑 Contract: {contract}\n\n"
-            functions = self.client.manager.get_contract_info(contract)["Functions"]
-            for function in functions:
-                if is_cancelled():
-                    return "작업이 취소되었습니다."
-                current += 1
-                function_name = function["Function Name"]
-                progress_callback(current, total, f"Analyzing {contract}::{function_name} ({current}/{total})")
-                review = self.client.analyze_and_review(contract, function_name, depth, check_impact=check_impact)
-                if review:
-                    report_path = save_review_report(contract, function_name, review, self.save_path)
-                    if report_path:
-                        print(f"✅ Report saved at: {report_path}")
-                else:
-                    review = "✅ No vulnerabilities found."
-                result_text += f"🔍 Function: {function_name}\n{review}\n{'-' * 50}\n"
-            result_text += "\n"
+        current_contract = None
+        for result in results:
+            if result.contract_name != current_contract:
+                if current_contract is not None:
+                    result_text += "\n"
+                current_contract = result.contract_name
+                result_text += f"📑 Contract: {current_contract}\n\n"
+            result_text += f"🔍 Function: {result.function_name}\n{self._format_review(result)}\n{'-' * 50}\n"
+        result_text += "\n"
         return result_text
 
     def handle_analyze_all_functions_in_selected_contracts_result(self, result_text):
@@ -1,5 +1,9 @@
 import os
 import re
+import threading
+import time
+import Profiler
+import Metrics
 from chromadb import Client
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
@@ -16,6 +20,8 @@ class ReportVectorDB:
         self.chroma_client = Client(Settings(persist_directory="./chroma_db", is_persistent=True))
         self.model = SentenceTransformer(self.embedding_model)
         self.collection = self.chroma_client.get_or_create_collection(name=self.collection_name)
+        # 임베딩 모델과 컬렉션은 여러 분석 스레드가 공유하므로 조회를 직렬화
+        self._lock = threading.Lock()
 
     def chunk_document(self, document):
         """문서를 청크로 나누기"""
@@ -160,12 +166,19 @@ class ReportVectorDB:
     #     return grouped_results
 
     def query(self, query_text, metadata_filter=None, n_results=10, min_similarity=0.0):
-        query_embedding = self.model.encode([query_text])[0]
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            where=metadata_filter,
-            n_results=n_results
-        )
+        with self._lock:
+            started = time.monotonic()
+            with Profiler.span("embed", chars=len(query_text)):
+                query_embedding = self.model.encode([query_text])[0]
+            embedded = time.monotonic()
+            with Profiler.span("chroma.query", n_results=n_results):
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    where=metadata_filter,
+                    n_results=n_results
+                )
+            Metrics.VECTOR_QUERY_SECONDS.observe(embedded - started, phase="embed")
+            Metrics.VECTOR_QUERY_SECONDS.observe(time.monotonic() - embedded, phase="query")
         
         print("검색 결과 (그룹화됨):")
         grouped_results = {}
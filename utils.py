@@ -93,6 +93,7 @@ def parse_function_calls(function_code, global_elements):
     function_calls = {
         "internal_functions": [],
         "external_interface_calls": {},
+        "external_call_receivers": {},  # 대문자 변환 전 원래 수신자 표현식 기준
         "view_pure_calls": []
     }
 
@@ -141,6 +142,7 @@ def parse_function_calls(function_code, global_elements):
         interface_matches = re.finditer(interface_regex, line)
         for match in interface_matches:
             interface_name, function_name = match.groups()
+            function_calls["external_call_receivers"].setdefault(interface_name, []).append(function_name)
             if interface_name[0] not in string.ascii_uppercase:
                         interface_name = interface_name[0].upper() + interface_name[1:]
                         
@@ -166,6 +168,9 @@ def parse_function_calls(function_code, global_elements):
     # Remove duplicates
     function_calls["internal_functions"] = list(set(function_calls["internal_functions"]))
     
+    for receiver in function_calls["external_call_receivers"]:
+        function_calls["external_call_receivers"][receiver] = list(dict.fromkeys(function_calls["external_call_receivers"][receiver]))
+
     for interface in function_calls["external_interface_calls"]:
         function_calls["external_interface_calls"][interface] = list(set(function_calls["external_interface_calls"][interface]))
         function_calls["view_pure_calls"] = [vp for vp in function_calls["view_pure_calls"] if vp not in function_calls["external_interface_calls"][interface]]
@@ -175,6 +180,127 @@ def parse_function_calls(function_code, global_elements):
     return function_calls
 
 
+def extract_type_info(contract_code, contract_name):
+    """컨트랙트 상속(is), import, using-for, 컨트랙트 타입 상태 변수 선언 추출 (외부 호출 대상 해석용)"""
+    contract_code = re.sub(r"/\*\*?[\s\S]*?\*/", "", contract_code)
+    contract_code = re.sub(r"//.*", "", contract_code)
+
+    header_pattern = r"\b(?:abstract\s+)?(?:contract|library|interface)\s+" + re.escape(contract_name) + r"\s*(?:is\s+([^{]+))?\{"
+    header = re.search(header_pattern, contract_code)
+    inherits = []
+    if header and header.group(1):
+        # 부모 생성자 인자 제거: "Ownable(msg.sender)" -> "Ownable"
+        parents = re.sub(r"\([^)]*\)", "", header.group(1))
+        inherits = [parent.strip() for parent in parents.split(",") if parent.strip()]
+
+    imports = []
+    for match in re.findall(r'import\s*\{([^}]+)\}\s*from', contract_code):
+        for imported in match.split(","):
+            # "A as B" 형태는 별칭을 사용
+            imported = imported.strip().split(" as ")[-1].strip()
+            if imported:
+                imports.append(imported)
+
+    using_for = {}
+    for library, target_type in re.findall(r"\busing\s+(\w+)\s+for\s+([\w\[\]\*]+)\s*;", contract_code):
+        using_for.setdefault(target_type, []).append(library)
+
+    # 함수 본문 밖(중괄호 깊이 1)의 선언만 상태 변수로 취급
+    typed_variables = {}
+    state_var_pattern = r"^\s*([A-Z]\w*)\s+(?:(?:public|private|internal|immutable|constant|override)\s+)*(\w+)\s*(?:=|;)"
+    depth = 0
+    for line in contract_code.split("\n"):
+        if depth == 1:
+            match = re.match(state_var_pattern, line)
+            if match:
+                typed_variables[match.group(2)] = match.group(1)
+        depth += line.count("{") - line.count("}")
+
+    return {
+        "Inherits": inherits,
+        "Imports": imports,
+        "Using For": using_for,
+        "Typed Variables": typed_variables,
+    }
+
+
+def parse_typed_declarations(function_code):
+    """함수 파라미터 및 지역 변수 중 컨트랙트/인터페이스 타입 선언 추출 {변수명: 타입}"""
+    typed_variables = {}
+    source = "\n".join(function_code)
+
+    signature = source.split("{", 1)[0]
+    param_pattern = r"\b([A-Z]\w*)\s+(?:(?:memory|calldata|storage)\s+)?(\w+)\s*[,)]"
+    for type_name, variable in re.findall(param_pattern, signature):
+        typed_variables[variable] = type_name
+
+    local_pattern = r"^\s*([A-Z]\w*)\s+(?:(?:memory|storage)\s+)?(\w+)\s*(?:=|;)"
+    for line in function_code[1:]:
+        match = re.match(local_pattern, line)
+        if match:
+            typed_variables[match.group(2)] = match.group(1)
+
+    return typed_variables
+
+
+def parse_function_visibility(function_code):
+    """함수 선언부에서 가시성(public/external/internal/private) 추출, 명시되지 않으면 public"""
+    match = re.search(r"\b(public|external|internal|private)\b", _function_signature(function_code))
+    return match.group(1) if match else "public"
+
+
+def _function_signature(function_code):
+    return "\n".join(function_code).split("{", 1)[0].split(";", 1)[0]
+
+
+def _signature_attributes(function_code):
+    # 파라미터 목록 뒤의 선언부 (가시성, 상태 변경성, 수정자, returns)에서 괄호 안의 인자를 제거한 문자열
+    signature = _function_signature(function_code)
+    match = re.search(r"\bfunction\s+\w+\s*\(", signature)
+    if not match:
+        return ""
+
+    depth = 1
+    i = match.end()
+    while i < len(signature) and depth:
+        if signature[i] == "(":
+            depth += 1
+        elif signature[i] == ")":
+            depth -= 1
+        i += 1
+
+    # returns (...), override(A, B), onlyRole(ROLE) 등
+    attributes = signature[i:]
+    while True:
+        stripped = re.sub(r"\([^()]*\)", "", attributes)
+        if stripped == attributes:
+            return attributes
+        attributes = stripped
+
+
+def parse_function_mutability(function_code):
+    """함수 선언부에서 상태 변경성(pure/view/payable) 추출, 명시되지 않으면 nonpayable"""
+    match = re.search(r"\b(pure|view|payable)\b", _signature_attributes(function_code))
+    return match.group(1) if match else "nonpayable"
+
+
+def parse_function_modifiers(function_code):
+    """함수 선언부 파라미터 목록 뒤에 붙은 수정자 이름 목록 (returns/override 등 키워드 제외)"""
+    keywords = {"public", "external", "internal", "private", "pure", "view", "payable",
+                "virtual", "override", "returns"}
+    return [
+        name for name in re.findall(r"\b[A-Za-z_]\w*\b", _signature_attributes(function_code))
+        if name not in keywords
+    ]
+
+
+def parse_function_has_body(function_code):
+    """구현부가 있는 함수인지 여부 (인터페이스/추상 함수 선언은 False)"""
+    code = "\n".join(function_code)
+    brace, semicolon = code.find("{"), code.find(";")
+    return brace != -1 and (semicolon == -1 or brace < semicolon)
+
+
 def extract_function_or_modifier_name(function_code):
     function_def_regex = r'^\s*(function|modifier)\s+([a-zA-Z0-9_]+)\s*\('
     
@@ -185,10 +311,16 @@ def extract_function_or_modifier_name(function_code):
     
     return None, "UnknownFunction"
 
-def save_to_json(contract_name, global_value, functions):
+def _info_path(contract_name, directory=None):
+    filename = f"{contract_name}_info.json"
+    return os.path.join(directory, filename) if directory else filename
+
+
+def save_to_json(contract_name, global_value, functions, type_info=None, directory=None):
     parsed_info = {
         "Contract Name": contract_name,
         "Global Variables": list(global_value),  # Convert set to list to avoid JSON serialization error
+        "Type Info": type_info or {},
         "Functions": [],
         "Modifiers": []
     }
@@ -204,10 +336,16 @@ def save_to_json(contract_name, global_value, functions):
             parsed_info["Functions"].append({
                 "Function Name": function_name,
                 "Function Code": function_lines,
+                "Visibility": parse_function_visibility(function_lines),
+                "Mutability": parse_function_mutability(function_lines),
+                "Attached Modifiers": parse_function_modifiers(function_lines),
+                "Has Body": parse_function_has_body(function_lines),
                 "Modified State Variables": parse_modified_state_vars(function, global_value),
+                "Typed Variables": parse_typed_declarations(function_lines),
                 "Function Calls": {
                     "Internal Functions": function_calls["internal_functions"],
                     "External Interface Calls": function_calls["external_interface_calls"],
+                    "External Call Receivers": function_calls["external_call_receivers"],
                     "View/Pure Calls": function_calls["view_pure_calls"]
                 }
             })
@@ -217,14 +355,14 @@ def save_to_json(contract_name, global_value, functions):
                 "Modifier Code": function_lines
             })
 
-    with open(f"{contract_name}_info.json", "w") as f:
+    with open(_info_path(contract_name, directory), "w") as f:
         json.dump(parsed_info, f, indent=4)  # JSON serialization error fixed
 
         
 
-def load_from_json(contract_name):
+def load_from_json(contract_name, directory=None):
     try:
-        with open(f"{contract_name}_info.json", "r") as f:
+        with open(_info_path(contract_name, directory), "r") as f:
             data = json.load(f)
         return data
     except FileNotFoundError:
@@ -232,26 +370,6 @@ def load_from_json(contract_name):
         return None
 
 
-def save_review_report(contract_name, function_name, review_text, save_path=None):
-
-    if save_path is None:
-        save_path = os.getcwd()
-
-    filename = f"report_{contract_name}_{function_name}.md"
-    filepath = os.path.join(save_path, filename)
-
-    try:
-        # 파일 저장
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(review_text)
-
-        return filepath
-    except Exception as e:
-
-        return None
-    
-
-
 if __name__ == "__main__":
     with open("test.sol", "r") as f:
         contract_code = f.read()
@@ -260,6 +378,6 @@ if __name__ == "__main__":
     functions, global_value, contract_name = initial_separate(contract_code)
     
     # Save parsed information to JSON
-    save_to_json(contract_name, global_value, functions)
+    save_to_json(contract_name, global_value, functions, extract_type_info(contract_code, contract_name))
     
 